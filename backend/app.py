@@ -1,30 +1,90 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import requests
 import os
 
+from ml_client import MLServiceClient, RequestCoalescer, passthrough_headers
+
 app = Flask(__name__)
 CORS(app)
 
 # ML Service URL
 ML_SERVICE_URL = os.getenv('ML_SERVICE_URL', 'http://localhost:5001')
+ML_POOL_SIZE = int(os.getenv('ML_POOL_SIZE', '10'))
+ML_CONNECT_TIMEOUT = float(os.getenv('ML_CONNECT_TIMEOUT', '3'))
+ML_READ_TIMEOUT = float(os.getenv('ML_READ_TIMEOUT', '30'))
+ML_COALESCE = os.getenv('ML_COALESCE', '1') == '1'  # Share one upstream call among identical prediction requests
+ML_RESPONSE_CACHE_TTL = float(os.getenv('ML_RESPONSE_CACHE_TTL', '5'))  # Seconds; 0 disables the gateway cache
+ML_RESPONSE_CACHE_MAX_BYTES = int(os.getenv('ML_RESPONSE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
 
-@app.route('/api/ml/predictions', methods=['POST'])
-def get_ml_predictions():
+# Shared keep-alive client so proxied calls reuse pooled connections
+ml_client = MLServiceClient(
+    ML_SERVICE_URL,
+    pool_size=ML_POOL_SIZE,
+    connect_timeout=ML_CONNECT_TIMEOUT,
+    read_timeout=ML_READ_TIMEOUT,
+    coalescer=RequestCoalescer(ML_RESPONSE_CACHE_TTL, ML_RESPONSE_CACHE_MAX_BYTES) if ML_COALESCE else None
+)
+
+def forward_to_ml_service(path, coalesce=False):
+    """Forward the current request body to the ML service and stream its response back.
+    
+    Content-Type and Accept are passed through, so clients can send and receive the
+    columnar formats as well as plain JSON; so are the ML service's X-Cache,
+    X-Precomputed and Server-Timing response headers. With `coalesce`, identical
+    requests that arrive while one is in flight, or shortly after, share its
+    response; the X-Gateway-Cache header says whether it was forwarded, coalesced
+    or cached.
+    """
     try:
-        # Forward the request to ML service
-        response = requests.post(f'{ML_SERVICE_URL}/predictions', json=request.json)
+        if coalesce and ml_client.coalescer is not None:
+            upstream, outcome = ml_client.post_coalesced(
+                path,
+                request.get_data(),
+                content_type=request.content_type or 'application/json',
+                accept=request.headers.get('Accept')
+            )
+            response = Response(upstream.body, status=upstream.status, content_type=upstream.content_type,
+                                headers=upstream.headers)
+            response.headers['X-Gateway-Cache'] = outcome.upper()
+            return response
         
-        # Check if request was successful
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({'error': response.json().get('error', 'ML service error')}), response.status_code
+        status, headers, body = ml_client.post(
+            path,
+            request.get_data(),
+            content_type=request.content_type or 'application/json',
+            accept=request.headers.get('Accept')
+        )
+        # Pass the upstream bytes through untouched; error bodies are already JSON
+        response = Response(body, status=status, content_type=headers.get('Content-Type', 'application/json'),
+                            headers=passthrough_headers(headers))
+        if 'Content-Length' in headers:
+            response.headers['Content-Length'] = headers['Content-Length']
+        return response
             
+    except requests.exceptions.Timeout as e:
+        return jsonify({'error': f'ML service timed out: {str(e)}'}), 504
     except requests.exceptions.RequestException as e:
         return jsonify({'error': f'Failed to connect to ML service: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+@app.route('/api/ml/predictions', methods=['POST'])
+def get_ml_predictions():
+    return forward_to_ml_service('/predictions', coalesce=True)
+
+@app.route('/api/ml/predictions/batch', methods=['POST'])
+def get_ml_batch_predictions():
+    return forward_to_ml_service('/predictions/batch')
+
+@app.route('/api/ml/predictions/append', methods=['POST'])
+def get_ml_append_predictions():
+    return forward_to_ml_service('/predictions/append')
+
+@app.route('/api/ml/metrics', methods=['GET'])
+def get_ml_client_metrics():
+    """Connection pool usage and upstream latency for the ML service client"""
+    return jsonify(ml_client.stats())
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000) 
\ No newline at end of file
+    app.run(debug=True, port=5000) 
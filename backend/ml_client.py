@@ -0,0 +1,308 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STREAM_CHUNK_SIZE = 64 * 1024
+# ML service headers that describe how it answered and are passed on to clients
+PASSTHROUGH_HEADERS = ('X-Cache', 'X-Precomputed', 'Server-Timing')
+
+# A fully read upstream response that can be handed to several callers
+BufferedResponse = namedtuple('BufferedResponse', ['status', 'content_type', 'headers', 'body'])
+
+
+def passthrough_headers(headers):
+    """The PASSTHROUGH_HEADERS present in upstream ``headers``, as a dict"""
+    return {name: headers[name] for name in PASSTHROUGH_HEADERS if name in headers}
+
+
+class UpstreamMetrics:
+    """Thread-safe counters and a latency histogram for upstream calls"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finished(self, elapsed, error=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_sum += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            index = next((i for i, bound in enumerate(self.buckets) if elapsed <= bound), len(self.buckets))
+            self.bucket_counts[index] += 1
+            if error is not None:
+                self.errors += 1
+                if isinstance(error, requests.exceptions.Timeout):
+                    self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            completed = sum(self.bucket_counts)
+            cumulative = 0
+            histogram = []
+            for bound, count in zip(list(self.buckets) + ['+Inf'], self.bucket_counts):
+                cumulative += count
+                histogram.append({'le': bound, 'count': cumulative})
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'inFlight': self.in_flight,
+                'maxInFlight': self.max_in_flight,
+                'latencySeconds': {
+                    'count': completed,
+                    'sum': self.latency_sum,
+                    'avg': self.latency_sum / completed if completed else 0.0,
+                    'max': self.latency_max,
+                    'buckets': histogram
+                }
+            }
+
+
+class StreamedBody:
+    """Iterable over an upstream response body that releases its connection when done.
+
+    WSGI servers call ``close`` even if the body was never iterated, so the
+    connection always goes back to the pool and the metrics are always updated.
+    """
+
+    def __init__(self, response, metrics, started):
+        self._response = response
+        self._metrics = metrics
+        self._started = started
+        self._closed = False
+        self._error = None
+
+    def __iter__(self):
+        try:
+            for chunk in self._response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            self._error = e
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._response.close()
+        self._metrics.finished(time.perf_counter() - self._started, self._error)
+
+
+class _Flight:
+    """One upstream call that concurrent identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Runs one upstream call per distinct in-flight request and briefly caches its result.
+
+    Callers passing the same key while a call is running wait for it and get
+    the same response (or exception) instead of starting their own. Successful
+    responses are then served from a byte-budgeted LRU cache for ``ttl``
+    seconds, except bodies larger than the whole budget; ``ttl=0`` keeps
+    coalescing but disables the cache.
+    """
+
+    def __init__(self, ttl=5.0, max_bytes=16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._cache = OrderedDict()
+        self._bytes = 0
+        self.forwarded = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.evictions = 0
+
+    def _drop(self, key):
+        response, _ = self._cache.pop(key)
+        self._bytes -= len(response.body)
+
+    def _store(self, key, response):
+        if key in self._cache:
+            self._drop(key)
+        if len(response.body) > self.max_bytes:
+            return  # It would evict every other entry and then itself
+        self._cache[key] = (response, time.monotonic() + self.ttl)
+        self._bytes += len(response.body)
+        while self._bytes > self.max_bytes and self._cache:
+            self._drop(next(iter(self._cache)))
+            self.evictions += 1
+
+    def run(self, key, fetch):
+        """Return ``(response, outcome)``; outcome is 'cached', 'coalesced' or 'forwarded'"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                    return entry[0], 'cached'
+                self._drop(key)
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.forwarded += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # The leader's call has bounded timeouts, so this always returns
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response, 'coalesced'
+
+        try:
+            flight.response = fetch()
+            return flight.response, 'forwarded'
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                response = flight.response
+                if response is not None and 200 <= response.status < 300 and self.ttl > 0:
+                    self._store(key, response)
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'forwarded': self.forwarded,
+                'coalesced': self.coalesced,
+                'cacheHits': self.cache_hits,
+                'inFlight': len(self._in_flight),
+                'cacheEntries': len(self._cache),
+                'cacheBytes': self._bytes,
+                'evictions': self.evictions
+            }
+
+
+class MLServiceClient:
+    """Keep-alive HTTP client for the ML service with bounded timeouts.
+
+    One ``requests.Session`` is shared by all gateway threads; its urllib3 pool
+    keeps up to ``pool_size`` connections open to the ML service so proxied
+    calls reuse them instead of opening a new TCP connection each time.
+    """
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.0, read_timeout=30.0, coalescer=None):
+        self.base_url = base_url.rstrip('/')
+        self.coalescer = coalescer
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.metrics = UpstreamMetrics()
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+
+    def post(self, path, body, content_type='application/json', accept=None):
+        """POST raw bytes and return ``(status, headers, body)`` with the body streamed.
+
+        ``accept`` is passed on as the Accept header so the ML service can
+        negotiate its response format (JSON or columnar) with the caller.
+
+        ``body`` is a ``StreamedBody`` that must be consumed or closed.
+        Raises ``requests.exceptions.RequestException`` if the call cannot be made.
+        """
+        self.metrics.started()
+        started = time.perf_counter()
+        headers = {'Content-Type': content_type}
+        if accept:
+            headers['Accept'] = accept
+        try:
+            response = self.session.post(
+                f'{self.base_url}{path}',
+                data=body,
+                headers=headers,
+                timeout=self.timeout,
+                stream=True
+            )
+        except requests.exceptions.RequestException as e:
+            self.metrics.finished(time.perf_counter() - started, e)
+            raise
+
+        return response.status_code, response.headers, StreamedBody(response, self.metrics, started)
+
+    def post_coalesced(self, path, body, content_type='application/json', accept=None):
+        """POST like ``post`` but share the call with identical concurrent or recent requests.
+
+        Requests are identical when path, Content-Type, Accept and body bytes
+        match. The body is read in full so every waiter can be given a copy;
+        returns ``(BufferedResponse, outcome)`` as RequestCoalescer.run does.
+        Only use this for calls without side effects.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (path, content_type or '', accept or ''):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        digest.update(body)
+
+        def fetch():
+            status, headers, stream = self.post(path, body, content_type=content_type, accept=accept)
+            try:
+                data = b''.join(stream)
+            finally:
+                stream.close()
+            return BufferedResponse(status, headers.get('Content-Type', 'application/json'),
+                                    passthrough_headers(headers), data)
+
+        return self.coalescer.run(digest.hexdigest(), fetch)
+
+    def pool_stats(self):
+        """Connection pool usage for every upstream host the session has talked to"""
+        pools = []
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            # urllib3 fills the queue with placeholders, so its size is the free slot count
+            available = pool.pool.qsize() if pool.pool is not None else 0
+            pools.append({
+                'host': f'{pool.scheme}://{pool.host}:{pool.port}',
+                'maxSize': self.pool_size,
+                'inUse': self.pool_size - available,
+                'connectionsOpened': pool.num_connections,
+                'requestsServed': pool.num_requests
+            })
+        return pools
+
+    def stats(self):
+        stats = {
+            'pool': self.pool_stats(),
+            'upstream': self.metrics.snapshot()
+        }
+        if self.coalescer is not None:
+            stats['coalescing'] = self.coalescer.stats()
+        return stats
@@ -1,18 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_val_score, GridSearchCV
-from sklearn.metrics import mean_squared_error, r2_score
-from datetime import datetime, timedelta
+from datetime import datetime
 import pandas as pd
-from scipy import stats
-import joblib
+import json
 import os
-from sklearn.ensemble import GradientBoostingRegressor
-from xgboost import XGBRegressor
+import time
+from model_registry import CohortModelRegistry, ModelRegistry, cohort_bucket
+from forecaster import forecast_direct, forecast_recursive
+from features import FEATURE_COLUMNS, CALENDAR_COLUMNS, build_feature_matrix
+from result_cache import ResultCache, make_cache_key
+from training_jobs import TrainingJobs
+from summary import summarize_history
+from synthetic_data import SyntheticDataGenerator
+from precompute import PrecomputeStore
+from backtest import MIN_HISTORY_DAYS, backtest_series
+from user_state import STATE_WINDOW, UserState, create_state_store
+from instrumentation import RequestInstrumentation, ServiceMetrics, record_error, record_input_size, timed
+from wire_format import (
+    COLUMNAR_BINARY_MIMETYPE, JSON_MIMETYPE, RESPONSE_MIMETYPES,
+    concat_histories, decode_frame, encode_frame, history_columns, parse_dates, to_columnar
+)
 
 app = Flask(__name__)
 CORS(app)
@@ -21,46 +29,88 @@ CORS(app)
 MODEL_PATH = 'models/model.joblib'
 SCALER_PATH = 'models/scaler.joblib'
 MIN_DATA_POINTS = 30
-ANOMALY_THRESHOLD = 2.0
+ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '2.0'))
+ANOMALY_WINDOW = 7
 MODEL_VERSION = '1.0'
-VALIDATION_SIZE = 0.2
-
-# Define feature columns globally
-FEATURE_COLUMNS = [
-    'day_of_week', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
-    'is_winter', 'is_summer', 'daily_change', 'weekly_change', 'monthly_change'
-]
-
-# Add lag features
-for lag in [1, 2, 3, 7, 14, 30]:
-    FEATURE_COLUMNS.append(f'prev_{lag}d_footprint')
-
-# Add rolling statistics
-for window in [3, 7, 14, 30]:
-    FEATURE_COLUMNS.extend([
-        f'rolling_mean_{window}d',
-        f'rolling_std_{window}d',
-        f'rolling_min_{window}d',
-        f'rolling_max_{window}d'
-    ])
+DEFAULT_FORECAST_DAYS = 5
+MAX_FORECAST_DAYS = 90
+FORECAST_MODE = os.getenv('FORECAST_MODE', 'recursive')  # Used when a request names no 'mode'
+FORECASTERS = {'recursive': forecast_recursive, 'direct': forecast_direct}
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '5'))
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE') or None  # 'r' memory-maps arrays in the artifacts
+COHORT_MODELS_DIR = os.getenv('COHORT_MODELS_DIR', 'models/cohorts')  # One <cohort>/ directory of artifacts per cohort
+COHORT_MODELS_MAX_BYTES = int(os.getenv('COHORT_MODELS_MAX_BYTES', str(256 * 1024 * 1024)))  # Memory budget for resident cohort models
+COHORT_MMAP_MODE = os.getenv('COHORT_MMAP_MODE', 'r') or None
+COHORT_HASH_BUCKETS = int(os.getenv('COHORT_HASH_BUCKETS', '0'))  # Buckets for requests that send a cohortKey
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '300'))
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR')  # Optional on-disk tier shared across restarts
+TRAINING_JOBS_DIR = os.getenv('TRAINING_JOBS_DIR', 'models/jobs')
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', '1'))
+USER_STATE_BACKEND = os.getenv('USER_STATE_BACKEND', 'memory')  # 'memory' (per process) or 'sqlite' (shared)
+USER_STATE_PATH = os.getenv('USER_STATE_PATH', 'models/user_state.sqlite3')
+USER_STATE_MAX_USERS = int(os.getenv('USER_STATE_MAX_USERS', '10000'))
+PRECOMPUTE_PATH = os.getenv('PRECOMPUTE_PATH', 'models/precomputed.sqlite3')  # Written by precompute.py
+MAX_TEST_DATA_POINTS = int(os.getenv('MAX_TEST_DATA_POINTS', '1000000'))  # User-days /test-data may generate
+MAX_BACKTEST_ORIGINS = int(os.getenv('MAX_BACKTEST_ORIGINS', '2000'))  # Most recent origins /backtest scores per request
+WARM_UP_DAYS = 60  # Synthetic history length for the warm-up forecast
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'  # Add a Server-Timing header with per-stage durations
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Fraction of requests run under cProfile
+PROFILE_SLOW_SECONDS = float(os.getenv('PROFILE_SLOW_SECONDS', '1.0'))  # Sampled requests slower than this are dumped
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+# Artifacts are loaded once per process and hot-reloaded when they change on disk
+model_registry = ModelRegistry(MODEL_PATH, SCALER_PATH, check_interval=MODEL_RELOAD_INTERVAL, mmap_mode=MODEL_MMAP_MODE)
+
+# Segment-specific models, loaded on first use; requests fall back to the global model
+cohort_registry = CohortModelRegistry(
+    COHORT_MODELS_DIR,
+    COHORT_MODELS_MAX_BYTES,
+    model_name=os.path.basename(MODEL_PATH),
+    scaler_name=os.path.basename(SCALER_PATH),
+    check_interval=MODEL_RELOAD_INTERVAL,
+    mmap_mode=COHORT_MMAP_MODE
+)
+
+# Serialized /predictions responses keyed by input content and model identity
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL, disk_dir=RESULT_CACHE_DIR)
+
+def invalidate_results(loaded):
+    """Drop cached results computed by any other model"""
+    result_cache.set_namespace(loaded.identity)
+
+model_registry.add_listener(invalidate_results)
+
+# Training runs in its own process pool so it never blocks a serving worker
+training_jobs = TrainingJobs(TRAINING_JOBS_DIR, max_workers=TRAINING_WORKERS)
+
+# Fixed-size per-user state so /predictions/append only processes new days
+user_state_store = create_state_store(USER_STATE_BACKEND, path=USER_STATE_PATH, max_users=USER_STATE_MAX_USERS)
+
+# Payloads computed off-line by precompute.py
+precompute_store = PrecomputeStore(PRECOMPUTE_PATH)
+
+# Timings of the last successful warm_up(); None until this worker is ready
+warm_up_report = None
 
 def load_or_create_model():
-    """Load existing model or create a new one"""
-    try:
-        if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
-            model_info = joblib.load(MODEL_PATH)
-            scaler = joblib.load(SCALER_PATH)
-            if model_info is not None and scaler is not None:
-                return model_info['model'], scaler, model_info['validation_score']
-    except Exception as e:
-        print(f"Error loading model: {str(e)}")
-    return None, None, None
+    """Return the cached model, scaler and validation score"""
+    loaded = model_registry.get()
+    if loaded is None:
+        return None, None, None
+    return loaded.model, loaded.scaler, loaded.validation_score
+
+def wall_dates(dates):
+    """Local calendar dates of a datetime index or column as a datetime64 array"""
+    dates = pd.DatetimeIndex(dates)
+    return (dates.tz_localize(None) if dates.tz is not None else dates).to_numpy()
 
 def prepare_data(historical_data):
     """Enhanced data preparation with validation and feature engineering"""
     try:
-        # Convert to DataFrame
-        df = pd.DataFrame(historical_data)
+        # Convert to DataFrame; columnar histories skip the per-row parse
+        df = pd.DataFrame(history_columns(historical_data))
         
         # Validate required columns
         required_columns = ['date', 'carbonFootprint']
@@ -68,7 +118,7 @@ def prepare_data(historical_data):
             raise ValueError("Missing required columns in data")
         
         # Convert and validate dates
-        df['date'] = pd.to_datetime(df['date'])
+        df['date'] = parse_dates(df['date'])
         if df['date'].isnull().any():
             raise ValueError("Invalid date format in data")
         
@@ -84,245 +134,87 @@ def prepare_data(historical_data):
         
         if df['carbonFootprint'].min() < 0:
             raise ValueError("Negative carbon footprint values detected")
+        record_input_size(len(df))
         
         # Handle missing values with interpolation
         df['carbonFootprint'] = df['carbonFootprint'].interpolate(method='time')
         
-        # Reset index to get date back as a column
-        df = df.reset_index()
-        
-        # Enhanced feature engineering
-        df['day_of_week'] = df['date'].dt.dayofweek
-        df['month'] = df['date'].dt.month
-        df['day_of_month'] = df['date'].dt.day
-        df['day_of_year'] = df['date'].dt.dayofyear
-        df['week_of_year'] = df['date'].dt.isocalendar().week
-        df['quarter'] = df['date'].dt.quarter
-        df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
-        df['is_holiday'] = df['day_of_week'].isin([0, 6]).astype(int)  # Weekend as holiday
-        
-        # Add lag features with multiple time windows
-        for lag in [1, 2, 3, 7, 14, 30]:
-            df[f'prev_{lag}d_footprint'] = df['carbonFootprint'].shift(lag)
-            # Fill NaN values for lag features using forward fill
-            df[f'prev_{lag}d_footprint'] = df[f'prev_{lag}d_footprint'].ffill()
-        
-        # Add rolling statistics with multiple windows
-        for window in [3, 7, 14, 30]:
-            df[f'rolling_mean_{window}d'] = df['carbonFootprint'].rolling(window=window, min_periods=1).mean()
-            df[f'rolling_std_{window}d'] = df['carbonFootprint'].rolling(window=window, min_periods=1).std()
-            df[f'rolling_min_{window}d'] = df['carbonFootprint'].rolling(window=window, min_periods=1).min()
-            df[f'rolling_max_{window}d'] = df['carbonFootprint'].rolling(window=window, min_periods=1).max()
-            
-            # Fill NaN values for rolling statistics
-            df[f'rolling_mean_{window}d'] = df[f'rolling_mean_{window}d'].ffill()
-            df[f'rolling_std_{window}d'] = df[f'rolling_std_{window}d'].fillna(0.0)  # No variation if only one value
-            df[f'rolling_min_{window}d'] = df[f'rolling_min_{window}d'].ffill()
-            df[f'rolling_max_{window}d'] = df[f'rolling_max_{window}d'].ffill()
-        
-        # Add trend features
-        df['daily_change'] = df['carbonFootprint'].diff()
-        df['weekly_change'] = df['carbonFootprint'].diff(7)
-        df['monthly_change'] = df['carbonFootprint'].diff(30)
-        
-        # Fill NaN values for trend features
-        df['daily_change'] = df['daily_change'].fillna(0.0)
-        df['weekly_change'] = df['weekly_change'].fillna(0.0)
-        df['monthly_change'] = df['monthly_change'].fillna(0.0)
-        
-        # Add seasonal features
-        df['is_winter'] = df['month'].isin([12, 1, 2]).astype(int)
-        df['is_summer'] = df['month'].isin([6, 7, 8]).astype(int)
-        
-        # Ensure all required features are present
-        missing_features = set(FEATURE_COLUMNS) - set(df.columns)
-        if missing_features:
-            raise ValueError(f"Missing required features: {missing_features}")
-        
-        # Select only the required features in the correct order
-        df = df[['date', 'carbonFootprint'] + FEATURE_COLUMNS]
-        
-        # Final check for any remaining NaN values
-        if df[FEATURE_COLUMNS].isnull().any().any():
-            # Fill any remaining NaN values with appropriate defaults
-            for col in FEATURE_COLUMNS:
-                if df[col].isnull().any():
-                    if col.endswith('_std'):
-                        df[col] = df[col].fillna(0.0)
-                    else:
-                        df[col] = df[col].fillna(df[col].mean())
+        # Build every feature in one pass into a float matrix in FEATURE_COLUMNS order
+        dates = df.index
+        values = df['carbonFootprint'].to_numpy(dtype=float)
+        matrix = build_feature_matrix(values, wall_dates(dates))
+        
+        df = pd.DataFrame(matrix, columns=FEATURE_COLUMNS)
+        df[CALENDAR_COLUMNS] = df[CALENDAR_COLUMNS].astype(np.int64)
+        df.insert(0, 'carbonFootprint', values)
+        df.insert(0, 'date', dates)
         
         return df
     except Exception as e:
         raise ValueError(f"Data preparation failed: {str(e)}")
 
-def select_best_model(X, y):
-    """Select the best model using cross-validation and grid search"""
-    try:
-        # Define models to try
-        models = {
-            'linear': LinearRegression(),
-            'rf': RandomForestRegressor(random_state=42)
-        }
-        
-        # Define parameter grids for grid search
-        param_grids = {
-            'rf': {
-                'n_estimators': [100, 200],
-                'max_depth': [10, 20, None],
-                'min_samples_split': [2, 5],
-                'min_samples_leaf': [1, 2]
-            }
-        }
-        
-        best_score = float('-inf')
-        best_model = None
-        
-        for name, model in models.items():
-            if name in param_grids:
-                # Use GridSearchCV for models with hyperparameters
-                grid_search = GridSearchCV(
-                    model,
-                    param_grids[name],
-                    cv=5,
-                    scoring='r2',
-                    n_jobs=-1
-                )
-                grid_search.fit(X, y)
-                score = grid_search.best_score_
-                model = grid_search.best_estimator_
-            else:
-                # Use cross-validation for simple models
-                scores = cross_val_score(model, X, y, cv=5, scoring='r2')
-                score = scores.mean()
-            
-            if score > best_score:
-                best_score = score
-                best_model = model
-        
-        return best_model, best_score
-    except Exception as e:
-        raise ValueError(f"Model selection failed: {str(e)}")
-
-def train_model(df):
-    """Enhanced model training with better feature engineering and validation"""
-    try:
-        # Define features
-        feature_columns = [
-            'day_of_week', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
-            'is_winter', 'is_summer', 'daily_change', 'weekly_change', 'monthly_change'
-        ]
-        
-        # Add lag features
-        for lag in [1, 2, 3, 7, 14, 30]:
-            feature_columns.append(f'prev_{lag}d_footprint')
-        
-        # Add rolling statistics
-        for window in [3, 7, 14, 30]:
-            feature_columns.extend([
-                f'rolling_mean_{window}d',
-                f'rolling_std_{window}d',
-                f'rolling_min_{window}d',
-                f'rolling_max_{window}d'
-            ])
-        
-        X = df[feature_columns]
-        y = df['carbonFootprint']
-        
-        # Split data into training and validation sets using a fixed random state
-        train_size = int(len(df) * (1 - VALIDATION_SIZE))
-        X_train = X[:train_size]
-        y_train = y[:train_size]
-        X_val = X[train_size:]
-        y_val = y[train_size:]
-        
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_val_scaled = scaler.transform(X_val)
-        
-        # Convert back to DataFrame to preserve feature names
-        X_train_scaled = pd.DataFrame(X_train_scaled, columns=feature_columns)
-        X_val_scaled = pd.DataFrame(X_val_scaled, columns=feature_columns)
-        
-        # Train model with fixed random state and hyperparameter tuning
-        model = GradientBoostingRegressor(
-            n_estimators=200,  # Increased number of trees
-            learning_rate=0.05,  # Reduced learning rate
-            max_depth=4,  # Slightly increased depth
-            min_samples_split=5,
-            min_samples_leaf=2,
-            subsample=0.8,  # Added subsampling
-            random_state=42
-        )
-        
-        # Fit model
-        model.fit(X_train_scaled, y_train)
-        
-        # Get validation score
-        val_score = model.score(X_val_scaled, y_val)
-        
-        # Save model and scaler with version info
-        os.makedirs('models', exist_ok=True)
-        model_info = {
-            'model': model,
-            'version': MODEL_VERSION,
-            'validation_score': val_score,
-            'training_date': datetime.now().strftime('%Y-%m-%d'),
-            'feature_columns': feature_columns,
-            'training_size': len(X_train),
-            'validation_size': len(X_val)
-        }
-        joblib.dump(model_info, 'models/model.joblib')
-        joblib.dump(scaler, 'models/scaler.joblib')
-        
-        return model, scaler, val_score
-    except Exception as e:
-        raise ValueError(f"Model training failed: {str(e)}")
+def train_model(df, search=None, report=None, cohort=None):
+    """Train, validate and publish a new model (the `cohort`'s if given); see training.train_model"""
+    # The training stack is only imported once a training run starts
+    from training import train_model as fit_and_publish
+    model_path, scaler_path = cohort_registry.artifact_paths(cohort) if cohort else (MODEL_PATH, SCALER_PATH)
+    return fit_and_publish(df, model_path, scaler_path, MODEL_VERSION, search=search, report=report)
 
-def detect_anomalies(df):
-    """Enhanced anomaly detection using multiple methods"""
+def detect_anomalies(df, threshold=ANOMALY_THRESHOLD, window=ANOMALY_WINDOW, start=0):
+    """Flag days whose rolling z-score exceeds `threshold` standard deviations.
+    
+    Rows before position `start` only provide rolling-window context and are never flagged.
+    """
     try:
-        anomalies = []
-        
         # Ensure we have enough data
-        if len(df) < 7:
-            return anomalies
+        if len(df) < window:
+            return []
         
         # Calculate rolling statistics
-        rolling_mean = df['carbonFootprint'].rolling(window=7, min_periods=1).mean()
-        rolling_std = df['carbonFootprint'].rolling(window=7, min_periods=1).std()
-        
-        # Calculate z-scores
-        z_scores = (df['carbonFootprint'] - rolling_mean) / rolling_std
-        
-        # Detect anomalies using z-score method
-        for i in range(len(df)):
-            if abs(z_scores[i]) > 2:  # More than 2 standard deviations
-                anomalies.append({
-                    'date': df['date'].iloc[i].strftime('%Y-%m-%d'),
-                    'value': float(df['carbonFootprint'].iloc[i]),
-                    'expected_range': f"{rolling_mean.iloc[i] - 2 * rolling_std.iloc[i]:.2f} - {rolling_mean.iloc[i] + 2 * rolling_std.iloc[i]:.2f}",
-                    'detection_method': 'Z-score'
-                })
-        
-        return anomalies
+        footprint = df['carbonFootprint']
+        rolling = footprint.rolling(window=window, min_periods=1)
+        rolling_mean = rolling.mean().to_numpy()
+        rolling_std = rolling.std().to_numpy()
+        values = footprint.to_numpy(dtype=float)
+        
+        # Calculate z-scores for every day at once; positions, not labels, select rows
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (values - rolling_mean) / rolling_std
+        flagged = np.flatnonzero(np.abs(z_scores[start:]) > threshold) + start
+        if len(flagged) == 0:
+            return []
+        
+        # Only flagged rows are formatted
+        lower = rolling_mean[flagged] - threshold * rolling_std[flagged]
+        upper = rolling_mean[flagged] + threshold * rolling_std[flagged]
+        dates = df['date'].iloc[flagged].dt.strftime('%Y-%m-%d')
+        return [
+            {
+                'date': date,
+                'value': float(value),
+                'expected_range': f"{low:.2f} - {high:.2f}",
+                'detection_method': 'Z-score'
+            }
+            for date, value, low, high in zip(dates, values[flagged], lower, upper)
+        ]
     except Exception as e:
         print(f"Anomaly detection error: {str(e)}")
+        record_error('detect_anomalies')
         return []
 
-def generate_insights(df):
+def generate_insights(df, summary=None):
     """Enhanced insights generation with better statistical analysis"""
     try:
         insights = []
+        summary = summary if summary is not None else summarize_history(df)
         
         # Basic statistics
-        mean_footprint = df['carbonFootprint'].mean()
-        std_footprint = df['carbonFootprint'].std()
+        mean_footprint = summary.mean
+        std_footprint = summary.std
         
         # Trend analysis with confidence interval
-        trend = df['carbonFootprint'].pct_change().mean()
-        trend_std = df['carbonFootprint'].pct_change().std()
+        trend = summary.trend
+        trend_std = summary.trend_std
         if abs(trend) > trend_std:  # Only report trend if significant
             if trend > 0:
                 insights.append(f"Your carbon footprint has been increasing by {trend*100:.1f}% per day")
@@ -330,41 +222,32 @@ def generate_insights(df):
                 insights.append(f"Your carbon footprint has been decreasing by {abs(trend)*100:.1f}% per day")
         
         # Peak analysis with context
-        peak_day = df.loc[df['carbonFootprint'].idxmax()]
-        peak_value = peak_day['carbonFootprint']
+        peak_value = summary.peak_value
         if peak_value > mean_footprint + 2 * std_footprint:  # More lenient threshold
-            insights.append(f"Highest carbon footprint ({peak_value:.1f} kg CO2) was recorded on {peak_day['date'].strftime('%Y-%m-%d')}")
-        
-        # Weekly patterns
-        weekly_avg = df.groupby('day_of_week')['carbonFootprint'].mean()
-        highest_day = weekly_avg.idxmax()
-        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+            insights.append(f"Highest carbon footprint ({peak_value:.1f} kg CO2) was recorded on {summary.peak_date.strftime('%Y-%m-%d')}")
         
         # Weekend effect
-        weekend_days = [5, 6]
-        weekday_days = [0, 1, 2, 3, 4]
-        weekend_avg = df[df['day_of_week'].isin(weekend_days)]['carbonFootprint'].mean()
-        weekday_avg = df[df['day_of_week'].isin(weekday_days)]['carbonFootprint'].mean()
+        weekend_avg = summary.weekend_mean
+        weekday_avg = summary.weekday_mean
         
         if weekend_avg > weekday_avg * 1.1:  # More lenient threshold (10% difference)
             insights.append(f"Your carbon footprint is {((weekend_avg/weekday_avg)-1)*100:.1f}% higher on weekends")
         
-        # Monthly patterns
-        monthly_avg = df.groupby('month')['carbonFootprint'].mean()
-        highest_month = monthly_avg.idxmax()
+        # Monthly patterns, over the months present in the history
+        monthly_avg = summary.month_means[~np.isnan(summary.month_means)]
+        highest_month = int(np.nanargmax(summary.month_means)) + 1
         months = ['January', 'February', 'March', 'April', 'May', 'June', 
                   'July', 'August', 'September', 'October', 'November', 'December']
         
         # Only report monthly pattern if there's significant variation
-        if monthly_avg.std() > monthly_avg.mean() * 0.05:  # More lenient threshold (5% variation)
+        monthly_std = monthly_avg.std(ddof=1) if len(monthly_avg) > 1 else np.nan
+        if monthly_std > monthly_avg.mean() * 0.05:  # More lenient threshold (5% variation)
             insights.append(f"Your carbon footprint is typically highest in {months[highest_month-1]}")
         
         # Source-specific insights if available
-        source_columns = ['transportation', 'energy', 'waste', 'food']
-        available_sources = [col for col in source_columns if col in df.columns]
+        source_impacts = summary.source_means
         
-        if available_sources:
-            source_impacts = {col: df[col].mean() for col in available_sources}
+        if source_impacts:
             max_source = max(source_impacts.items(), key=lambda x: x[1])
             
             if max_source[1] > mean_footprint * 0.3:  # More lenient threshold (30% contribution)
@@ -373,12 +256,14 @@ def generate_insights(df):
         return insights
     except Exception as e:
         print(f"Insights generation error: {str(e)}")  # Add debug logging
+        record_error('generate_insights')
         return []  # Return empty list instead of raising error
 
-def generate_recommendations(df, anomalies=None):
+def generate_recommendations(df, anomalies=None, summary=None):
     """Enhanced recommendations based on data analysis"""
     try:
         recommendations = []
+        summary = summary if summary is not None else summarize_history(df)
         
         # Analyze patterns and anomalies if provided
         if anomalies and len(anomalies) > 0:
@@ -386,38 +271,29 @@ def generate_recommendations(df, anomalies=None):
             recommendations.append(f"Investigate causes of high emissions on {', '.join(anomaly_dates[:3])}")
         
         # Calculate baseline and improvement potential
-        mean_footprint = df['carbonFootprint'].mean()
-        std_footprint = df['carbonFootprint'].std()
+        mean_footprint = summary.mean
         
         if mean_footprint > 20:
             recommendations.append(f"Your average daily carbon footprint ({mean_footprint:.1f} kg CO2) is above recommended levels")
         
         # Analyze emission sources if available
-        source_columns = ['transportation', 'energy', 'waste', 'food']
-        available_sources = [col for col in source_columns if col in df.columns]
+        source_impacts = summary.source_means
         
-        if available_sources:
-            source_impacts = {col: df[col].mean() for col in available_sources}
+        if source_impacts:
             max_source = max(source_impacts.items(), key=lambda x: x[1])
             
             if max_source[1] > mean_footprint * 0.4:  # If any source contributes >40%
                 recommendations.append(f"Focus on reducing {max_source[0]} emissions, which contributes {max_source[1]/mean_footprint*100:.1f}% of your total footprint")
         
         # Add personalized recommendations based on patterns
-        if 'transportation' in df.columns:
-            transport_impact = df['transportation'].mean()
-            if transport_impact > 10:
-                recommendations.append("Consider carpooling or using public transport more often")
+        if source_impacts.get('transportation', 0) > 10:
+            recommendations.append("Consider carpooling or using public transport more often")
         
-        if 'energy' in df.columns:
-            energy_impact = df['energy'].mean()
-            if energy_impact > 8:
-                recommendations.append("Look into energy-efficient appliances and renewable energy sources")
+        if source_impacts.get('energy', 0) > 8:
+            recommendations.append("Look into energy-efficient appliances and renewable energy sources")
         
-        if 'waste' in df.columns:
-            waste_impact = df['waste'].mean()
-            if waste_impact > 5:
-                recommendations.append("Focus on reducing waste and improving recycling habits")
+        if source_impacts.get('waste', 0) > 5:
+            recommendations.append("Focus on reducing waste and improving recycling habits")
         
         # Add general recommendations only if we don't have enough specific ones
         if len(recommendations) < 3:
@@ -432,204 +308,614 @@ def generate_recommendations(df, anomalies=None):
     except Exception as e:
         raise ValueError(f"Recommendations generation failed: {str(e)}")
 
-def predict_future(df, model, scaler, days=5):
-    """Enhanced prediction function with better feature engineering and NaN handling"""
+def format_forecast(dates, values):
+    """Format one series' forecast arrays for the response payload"""
+    return [
+        {
+            'date': str(date),
+            'predicted': round(float(pred), 2)
+        }
+        for date, pred in zip(dates, values)
+    ]
+
+def predict_future(df, model, scaler, days=DEFAULT_FORECAST_DAYS, mode='recursive'):
+    """Forecast of the next `days` days from a prepared DataFrame, recursive or direct"""
     try:
         last_date = df['date'].max()
-        future_dates = [last_date + timedelta(days=i+1) for i in range(days)]
-        
-        predictions = []
-        current_df = df.copy()
-        
-        for future_date in future_dates:
-            # Create base features first
-            new_row = {
-                'date': future_date,
-                'carbonFootprint': None,
-                'day_of_week': future_date.weekday(),
-                'month': future_date.month,
-                'day_of_month': future_date.day,
-                'is_weekend': 1 if future_date.weekday() >= 5 else 0,
-                'is_holiday': 1 if future_date.weekday() in [0, 6] else 0,
-                'is_winter': 1 if future_date.month in [12, 1, 2] else 0,
-                'is_summer': 1 if future_date.month in [6, 7, 8] else 0
-            }
-            
-            # Calculate lag features with proper NaN handling
-            for lag in [1, 2, 3, 7, 14, 30]:
-                if len(current_df) >= lag:
-                    new_row[f'prev_{lag}d_footprint'] = current_df['carbonFootprint'].iloc[-lag]
-                else:
-                    # If not enough history, use the most recent value
-                    new_row[f'prev_{lag}d_footprint'] = current_df['carbonFootprint'].iloc[-1]
-            
-            # Calculate rolling statistics with proper NaN handling
-            for window in [3, 7, 14, 30]:
-                if len(current_df) >= window:
-                    new_row[f'rolling_mean_{window}d'] = current_df['carbonFootprint'].rolling(window=window, min_periods=1).mean().iloc[-1]
-                    new_row[f'rolling_std_{window}d'] = current_df['carbonFootprint'].rolling(window=window, min_periods=1).std().iloc[-1]
-                    new_row[f'rolling_min_{window}d'] = current_df['carbonFootprint'].rolling(window=window, min_periods=1).min().iloc[-1]
-                    new_row[f'rolling_max_{window}d'] = current_df['carbonFootprint'].rolling(window=window, min_periods=1).max().iloc[-1]
-                else:
-                    # If not enough history, use the most recent value for all statistics
-                    last_value = current_df['carbonFootprint'].iloc[-1]
-                    new_row[f'rolling_mean_{window}d'] = last_value
-                    new_row[f'rolling_std_{window}d'] = 0.0  # No variation if only one value
-                    new_row[f'rolling_min_{window}d'] = last_value
-                    new_row[f'rolling_max_{window}d'] = last_value
-            
-            # Calculate trend features with proper NaN handling
-            if len(current_df) >= 2:
-                new_row['daily_change'] = current_df['carbonFootprint'].diff().iloc[-1]
-            else:
-                new_row['daily_change'] = 0.0
-            
-            if len(current_df) >= 8:  # Need 7 days for weekly change
-                new_row['weekly_change'] = current_df['carbonFootprint'].diff(7).iloc[-1]
-            else:
-                new_row['weekly_change'] = 0.0
-            
-            if len(current_df) >= 31:  # Need 30 days for monthly change
-                new_row['monthly_change'] = current_df['carbonFootprint'].diff(30).iloc[-1]
-            else:
-                new_row['monthly_change'] = 0.0
-            
-            # Convert to DataFrame
-            new_row_df = pd.DataFrame([new_row])
-            
-            # Get features for prediction
-            X_pred = new_row_df[FEATURE_COLUMNS]
-            X_pred_scaled = scaler.transform(X_pred)
-            
-            # Convert back to DataFrame to preserve feature names
-            X_pred_scaled = pd.DataFrame(X_pred_scaled, columns=FEATURE_COLUMNS)
-            
-            # Make prediction
-            pred = model.predict(X_pred_scaled)[0]
-            
-            predictions.append({
-                'date': future_date.strftime('%Y-%m-%d'),
-                'predicted': round(float(pred), 2)
-            })
-            
-            # Update the current_df with the prediction for the next iteration
-            current_df = pd.concat([
-                current_df,
-                pd.DataFrame({
-                    'date': [future_date],
-                    'carbonFootprint': [pred]
-                })
-            ], ignore_index=True)
-        
-        return predictions
+        history = df['carbonFootprint'].to_numpy(dtype=float)
+        dates, values = FORECASTERS[mode](
+            [history], [np.datetime64(last_date, 'D')], model, scaler, FEATURE_COLUMNS, days
+        )
+        return format_forecast(dates[0], values[0])
     except Exception as e:
         raise ValueError(f"Prediction failed: {str(e)}")
 
-def generate_sample_data(days=30):
-    """Generate sample carbon footprint data for testing"""
-    import numpy as np
-    from datetime import datetime, timedelta
+def predict_future_batch(dfs, model, scaler, days=DEFAULT_FORECAST_DAYS, mode='recursive'):
+    """Forecast several prepared DataFrames at once, one model call per horizon step (one in all for direct)"""
+    try:
+        histories = [df['carbonFootprint'].to_numpy(dtype=float) for df in dfs]
+        last_dates = [np.datetime64(df['date'].max(), 'D') for df in dfs]
+        dates, values = FORECASTERS[mode](
+            histories, last_dates, model, scaler, FEATURE_COLUMNS, days
+        )
+        return [format_forecast(dates[i], values[i]) for i in range(len(dfs))]
+    except Exception as e:
+        raise ValueError(f"Prediction failed: {str(e)}")
+
+def predict_from_state(state, model, scaler, days=DEFAULT_FORECAST_DAYS, mode='recursive'):
+    """Forecast from a user's stored state instead of their full history"""
+    try:
+        values, dates = state.tail(STATE_WINDOW)
+        if len(values) == 0:
+            raise ValueError("No data points stored for user")
+        forecast_dates, forecast_values = FORECASTERS[mode](
+            [values], [dates[-1]], model, scaler, FEATURE_COLUMNS, days
+        )
+        return format_forecast(forecast_dates[0], forecast_values[0])
+    except Exception as e:
+        raise ValueError(f"Prediction failed: {str(e)}")
+
+def analyze_history(df, summary=None, start=0):
+    """Anomalies, insights and recommendations for a prepared DataFrame.
     
-    # Generate dates
-    end_date = datetime.now()
-    dates = [(end_date - timedelta(days=x)).strftime('%Y-%m-%d') for x in range(days-1, -1, -1)]
+    A precomputed `summary` replaces the pass over `df`, and anomalies are only
+    reported from position `start` on.
+    """
+    with timed('detect_anomalies'):
+        anomalies = detect_anomalies(df, start=start)
+    with timed('generate_insights'):
+        # One pass over the history feeds both generators
+        summary = summary if summary is not None else summarize_history(df)
+        insights = generate_insights(df, summary)
+    with timed('generate_recommendations'):
+        recommendations = generate_recommendations(df, anomalies, summary)
     
-    # Base values for different emission sources
-    base_transport = 5.0
-    base_energy = 8.0
-    base_waste = 3.0
-    base_food = 4.0
+    # Format anomalies for frontend
+    formatted_anomalies = []
+    if anomalies:
+        for anomaly in anomalies:
+            formatted_anomalies.append({
+                'date': anomaly['date'],
+                'value': anomaly['value'],
+                'expected_range': f"{anomaly['expected_range']}"
+            })
     
-    data = []
-    for date in dates:
-        current_date = datetime.strptime(date, '%Y-%m-%d')
-        day_of_week = current_date.weekday()
-        month = current_date.month
-        
-        # Weekly pattern (higher on weekends)
-        weekend_factor = 1.4 if day_of_week >= 5 else 1.0
-        
-        # Monthly pattern (higher in winter months)
-        winter_factor = 1.2 if month in [12, 1, 2] else 1.0
-        
-        # Random variations
-        random_factor = 1 + (np.random.random() - 0.5) * 0.2  # ±10% random variation
-        
-        # Generate emission sources with realistic patterns
-        transport = base_transport * weekend_factor * random_factor
-        energy = base_energy * winter_factor * random_factor
-        waste = base_waste * random_factor
-        food = base_food * random_factor
-        
-        # Calculate total footprint
-        total_footprint = transport + energy + waste + food
-        
-        data.append({
-            'date': date,
-            'carbonFootprint': round(total_footprint, 2),
-            'transportation': round(transport, 2),
-            'energy': round(energy, 2),
-            'waste': round(waste, 2),
-            'food': round(food, 2)
-        })
+    return {
+        'insights': insights,
+        'recommendations': recommendations,
+        'anomalies': formatted_anomalies
+    }
+
+def resolve_cohort(data):
+    """Cohort a request asks for: `cohort` by name, or the hash bucket of `cohortKey`"""
+    cohort = data.get('cohort')
+    if cohort is None and data.get('cohortKey') is not None and COHORT_HASH_BUCKETS > 0:
+        cohort = cohort_bucket(data['cohortKey'], COHORT_HASH_BUCKETS)
+    return cohort
+
+def load_serving_model(cohort=None):
+    """The cohort's model if it has one, else the global model, with the cohort actually used"""
+    if cohort is not None:
+        loaded = cohort_registry.get(cohort)
+        if loaded is not None:
+            return loaded, cohort
+    return model_registry.get(), None
+
+def forecast_model(loaded, mode, days):
+    """The (model, scaler) pair that forecasts `days` days in `mode`"""
+    if mode == 'recursive':
+        return loaded.serving_model()
+    if loaded.direct_model is None:
+        raise ValueError("The loaded model was trained without direct forecasting")
+    if days > loaded.direct_horizon:
+        raise ValueError(f"'days' must be at most {loaded.direct_horizon} in direct mode")
+    return loaded.direct_model, loaded.scaler
+
+def prediction_payload(loaded, predictions, analysis, cohort=None, mode='recursive'):
+    """/predictions response body for a forecast and its analyze_history result"""
+    return {
+        'modelVersion': loaded.version or MODEL_VERSION,
+        'modelScore': loaded.validation_score,
+        'modelInfo': {**loaded.metadata(), 'cohort': cohort, 'forecastMode': mode},
+        'forecastData': predictions,  # Changed from predictions to forecastData
+        **analysis
+    }
+
+def parse_new_points(points):
+    """Validate appended data points; returns their values and local dates in date order"""
+    try:
+        df = pd.DataFrame(history_columns(points))
+        if len(df) == 0:
+            return np.empty(0), np.empty(0, dtype='datetime64[D]')
+        if not all(col in df.columns for col in ['date', 'carbonFootprint']):
+            raise ValueError("Missing required columns in data")
+        
+        dates = parse_dates(df['date'])
+        if dates.isnull().any():
+            raise ValueError("Invalid date format in data")
+        values = pd.to_numeric(df['carbonFootprint']).to_numpy(dtype=float)
+        record_input_size(len(values))
+        
+        local_dates = wall_dates(dates)
+        order = np.argsort(local_dates, kind='stable')
+        return values[order], local_dates[order]
+    except Exception as e:
+        raise ValueError(f"Data preparation failed: {str(e)}")
+
+def read_payload():
+    """Request body as a dict, from JSON or a binary columnar frame"""
+    if request.mimetype == COLUMNAR_BINARY_MIMETYPE:
+        return decode_frame(request.get_data())
+    return request.get_json()
+
+def response_format():
+    """Negotiated response mimetype; plain JSON unless the client asks for a columnar one"""
+    return request.accept_mimetypes.best_match(RESPONSE_MIMETYPES, default=JSON_MIMETYPE)
+
+def respond(payload, mimetype=JSON_MIMETYPE):
+    """Serialize a response payload in the negotiated format"""
+    if mimetype == COLUMNAR_BINARY_MIMETYPE:
+        return Response(encode_frame(to_columnar(payload, binary=True)), mimetype=mimetype)
+    if mimetype != JSON_MIMETYPE:
+        payload = to_columnar(payload)
+    response = jsonify(payload)
+    response.mimetype = mimetype
+    return response
+
+def parse_forecast_mode(value):
+    """Validate the requested forecast mode"""
+    if value not in FORECASTERS:
+        raise ValueError(f"'mode' must be one of {', '.join(FORECASTERS)}")
+    return value
+
+def parse_bounded_int(name, value, minimum=None, maximum=None):
+    """Validate an integer request parameter (an int or a numeric string) within optional bounds"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'{name}' must be an integer")
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        if minimum is None:
+            raise ValueError(f"'{name}' must be at most {maximum}")
+        if maximum is None:
+            raise ValueError(f"'{name}' must be at least {minimum}")
+        raise ValueError(f"'{name}' must be between {minimum} and {maximum}")
+    return number
+
+def parse_forecast_days(value):
+    """Validate the requested forecast horizon"""
+    return parse_bounded_int('days', value, 1, MAX_FORECAST_DAYS)
+
+def parse_query_int(name, default, minimum=None):
+    """Integer query string parameter, or `default` when it is absent"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return parse_bounded_int(name, value, minimum)
+
+def stream_users(generator, layout):
+    """A /predictions/batch payload for every generated user, encoded one user at a time"""
+    yield '{"users": ['
+    for i, (user_id, history) in enumerate(generator.histories(layout)):
+        yield (', ' if i else '') + json.dumps({'userId': user_id, 'historicalData': history})
+    yield ']}'
+
+def generate_sample_data(days=30, seed=None):
+    """Generate sample carbon footprint data for testing
+    
+    One typical user with the weekend and winter effects and ±10% daily noise.
+    Without a `seed` one is drawn from NumPy's global generator, so
+    np.random.seed() still makes the output reproducible.
+    """
+    if seed is None:
+        seed = int(np.random.randint(0, 2**31 - 1))
+    generator = SyntheticDataGenerator(
+        days=days, seed=seed, seasonality=0.0, anomaly_rate=0.0, user_spread=0.0, mix_spread=0.0
+    )
+    return next(generator.histories())[1]
+
+def warm_up():
+    """Load the model and run one synthetic forecast so the first real request is not the slow one.
+    
+    Returns the time each step took; /health reports the worker ready once this has succeeded.
+    """
+    global warm_up_report
+    timings = {}
+    
+    started = time.perf_counter()
+    loaded = model_registry.get()
+    timings['modelLoad'] = round(time.perf_counter() - started, 4)
+    if loaded is None:
+        raise RuntimeError('Model is not available')
+    
+    # A smooth deterministic series; it exercises every serving code path without touching the RNG
+    end_date = np.datetime64(datetime.now().date(), 'D')
+    dates = end_date - np.arange(WARM_UP_DAYS - 1, -1, -1)
+    values = 20 + 3 * np.sin(np.arange(WARM_UP_DAYS) * 2 * np.pi / 7)
+    history = [{'date': str(date), 'carbonFootprint': float(value)} for date, value in zip(dates, values)]
+    
+    started = time.perf_counter()
+    df = prepare_data(history)
+    model, scaler = loaded.serving_model()
+    predict_future(df, model, scaler)
+    analyze_history(df)
+    timings['firstPrediction'] = round(time.perf_counter() - started, 4)
     
-    return data
+    warm_up_report = timings
+    return timings
+
+@app.route('/health', methods=['GET'])
+def get_health():
+    """Readiness probe: 200 once warm_up() has run in this worker, 503 before"""
+    if warm_up_report is None:
+        return jsonify({'status': 'starting'}), 503
+    return jsonify({'status': 'ready', 'warmUp': warm_up_report})
 
 @app.route('/predictions', methods=['POST'])
 def get_predictions():
-    """Enhanced prediction endpoint with better error handling"""
+    """Enhanced prediction endpoint with better error handling
+    
+    With a `userId` and `dataVersion` the payload precomputed for that user
+    is served when it matches the version, the loaded model and the horizon;
+    otherwise it is computed from `historicalData`. Only precompute.py
+    writes the store, so a miss costs one indexed read.
+    """
     try:
-        data = request.get_json()
-        if not data or 'historicalData' not in data:
+        with timed('parse'):
+            data = read_payload()
+        if not data or ('historicalData' not in data and 'dataVersion' not in data):
             return jsonify({'error': 'Missing historical data'}), 400
         
-        # Prepare data
-        df = prepare_data(data['historicalData'])
-        
-        # Load or create model
-        model, scaler, validation_score = load_or_create_model()
+        days = parse_forecast_days(data.get('days', DEFAULT_FORECAST_DAYS))
+        mode = parse_forecast_mode(data.get('mode', FORECAST_MODE))
+        mimetype = response_format()
+        
+        # Take one snapshot of the cached model so a concurrent reload can't mix artifacts
+        with timed('load_model'):
+            loaded, cohort = load_serving_model(resolve_cohort(data))
+        if loaded is None:
+            return jsonify({'error': 'Model is not available'}), 503
+        
+        # A current precomputed entry answers without touching the history; only recursive forecasts are stored
+        version = data.get('dataVersion')
+        if data.get('userId') is not None and version and mode == 'recursive':
+            with timed('precomputed'):
+                stored = precompute_store.get(str(data['userId']), str(version), loaded.identity, days)
+            if stored is not None:
+                if mimetype == JSON_MIMETYPE:
+                    return Response(stored, mimetype=mimetype, headers={'X-Precomputed': 'HIT'})
+                response = respond(json.loads(stored), mimetype)
+                response.headers['X-Precomputed'] = 'HIT'
+                return response
+        if 'historicalData' not in data:
+            return jsonify({'error': 'Missing historical data'}), 400
         
-        # Get predictions
-        predictions = predict_future(df, model, scaler)
+        # Identical history on the same model gives an identical response
+        with timed('cache'):
+            cache_key = make_cache_key(loaded.identity, data['historicalData'], days=days,
+                                       model_version=MODEL_VERSION, format=mimetype, cohort=cohort, mode=mode)
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            return Response(cached, mimetype=mimetype, headers={'X-Cache': 'HIT'})
         
-        # Get anomalies
-        anomalies = detect_anomalies(df)
+        # Prepare data
+        with timed('prepare_data'):
+            df = prepare_data(data['historicalData'])
         
-        # Get insights and recommendations
-        insights = generate_insights(df)
-        recommendations = generate_recommendations(df, anomalies)
+        # Get predictions
+        with timed('predict'):
+            model, scaler = forecast_model(loaded, mode, days)
+            predictions = predict_future(df, model, scaler, days, mode)
+        
+        payload = prediction_payload(loaded, predictions, analyze_history(df), cohort, mode)
+        with timed('serialize'):
+            response = respond(payload, mimetype)
+        with timed('cache'):
+            result_cache.put(cache_key, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+
+@app.route('/predictions/batch', methods=['POST'])
+def get_batch_predictions():
+    """Predictions for many users in one call; a bad user does not fail the batch"""
+    try:
+        with timed('parse'):
+            data = read_payload()
+        if not data or not isinstance(data.get('users'), list):
+            return jsonify({'error': 'Missing users'}), 400
+        if len(data['users']) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch size exceeds {MAX_BATCH_SIZE} users'}), 400
+        
+        days = parse_forecast_days(data.get('days', DEFAULT_FORECAST_DAYS))
+        mode = parse_forecast_mode(data.get('mode', FORECAST_MODE))
+        
+        with timed('load_model'):
+            loaded = model_registry.get()
+        if loaded is None:
+            return jsonify({'error': 'Model is not available'}), 503
+        model, scaler = forecast_model(loaded, mode, days)
+        
+        results = []
+        prepared = []
+        for user in data['users']:
+            user_id = user.get('userId') if isinstance(user, dict) else None
+            result = {'userId': user_id}
+            results.append(result)
+            try:
+                if not isinstance(user, dict) or 'historicalData' not in user:
+                    raise ValueError('Missing historical data')
+                with timed('prepare_data'):
+                    prepared.append((result, prepare_data(user['historicalData'])))
+            except Exception as e:
+                result['error'] = str(e)
+        
+        # Forecast every valid series together so each horizon step is one model call
+        if prepared:
+            with timed('predict'):
+                forecasts = predict_future_batch([df for _, df in prepared], model, scaler, days, mode)
+            for (result, df), forecast in zip(prepared, forecasts):
+                try:
+                    result.update(forecastData=forecast, **analyze_history(df))
+                except Exception as e:
+                    result['error'] = str(e)
+        
+        with timed('serialize'):
+            return respond({
+                'modelVersion': loaded.version or MODEL_VERSION,
+                'modelScore': loaded.validation_score,
+                'modelInfo': {**loaded.metadata(), 'forecastMode': mode},
+                'results': results
+            }, response_format())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Batch prediction failed: {str(e)}'}), 500
+
+@app.route('/predictions/append', methods=['POST'])
+def append_predictions():
+    """Predictions from a user's stored state, updated with only their new data points"""
+    try:
+        with timed('parse'):
+            data = read_payload()
+        if not data or data.get('userId') is None:
+            return jsonify({'error': 'Missing user id'}), 400
+        user_id = str(data['userId'])
+        
+        days = parse_forecast_days(data.get('days', DEFAULT_FORECAST_DAYS))
+        mode = parse_forecast_mode(data.get('mode', FORECAST_MODE))
+        
+        with timed('load_model'):
+            loaded = model_registry.get()
+        if loaded is None:
+            return jsonify({'error': 'Model is not available'}), 503
+        model, scaler = forecast_model(loaded, mode, days)
+        
+        if 'historicalData' in data:
+            # A full history (re)initializes the user's state
+            with timed('prepare_data'):
+                history = prepare_data(concat_histories(data['historicalData'], data.get('newData', [])))
+            with timed('state_update'):
+                seeded = UserState.from_history(history['carbonFootprint'].to_numpy(dtype=float), wall_dates(history['date']))
+                state = user_state_store.update(user_id, lambda current: seeded)
+            start = 0
+        else:
+            with timed('prepare_data'):
+                values, dates = parse_new_points(data.get('newData', []))
+            context = {}
+            
+            def apply(current):
+                if current is None:
+                    raise LookupError('No stored state for user; send historicalData to initialize it')
+                # The days before the new points give the anomaly check its rolling window
+                context['values'], context['dates'] = current.tail(ANOMALY_WINDOW - 1)
+                return current.append(values, dates)
+            
+            try:
+                with timed('state_update'):
+                    state = user_state_store.update(user_id, apply)
+            except LookupError as e:
+                return jsonify({'error': str(e)}), 409
+            history = pd.DataFrame({
+                'date': np.concatenate((context['dates'], dates.astype('datetime64[D]'))),
+                'carbonFootprint': np.concatenate((context['values'], values))
+            })
+            start = len(context['values'])
+        
+        with timed('predict'):
+            predictions = predict_from_state(state, model, scaler, days, mode)
+        
+        analysis = analyze_history(history, summary=state.summary(), start=start)
+        with timed('serialize'):
+            return respond({
+                'modelVersion': loaded.version or MODEL_VERSION,
+                'modelScore': loaded.validation_score,
+                'modelInfo': {**loaded.metadata(), 'forecastMode': mode},
+                'dataPoints': state.count,
+                'forecastData': predictions,
+                **analysis
+            }, response_format())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+
+@app.route('/backtest', methods=['POST'])
+def backtest_history():
+    """Rolling-origin MAE/MAPE per horizon day of the serving model over a user's history"""
+    try:
+        with timed('parse'):
+            data = read_payload()
+        if not data or 'historicalData' not in data:
+            return jsonify({'error': 'Missing historical data'}), 400
         
-        # Format anomalies for frontend
-        formatted_anomalies = []
-        if anomalies:
-            for anomaly in anomalies:
-                formatted_anomalies.append({
-                    'date': anomaly['date'],
-                    'value': anomaly['value'],
-                    'expected_range': f"{anomaly['expected_range']}"
-                })
+        days = parse_forecast_days(data.get('days', DEFAULT_FORECAST_DAYS))
+        mode = parse_forecast_mode(data.get('mode', FORECAST_MODE))
+        step = parse_bounded_int('step', data.get('step', 1), minimum=1)
+        
+        with timed('load_model'):
+            loaded, cohort = load_serving_model(resolve_cohort(data))
+        if loaded is None:
+            return jsonify({'error': 'Model is not available'}), 503
+        model, scaler = forecast_model(loaded, mode, days)
+        
+        with timed('prepare_data'):
+            df = prepare_data(data['historicalData'])
+        
+        # Every origin is forecast in a few batched model calls, not one request each
+        with timed('backtest'):
+            started = time.perf_counter()
+            history = (df['carbonFootprint'].to_numpy(dtype=float), df['date'].to_numpy())
+            errors = backtest_series([history], FORECASTERS[mode], model, scaler, days, step,
+                                     max_origins=MAX_BACKTEST_ORIGINS)
+            seconds = time.perf_counter() - started
+        if not errors.origins:
+            return jsonify({'error': f'At least {MIN_HISTORY_DAYS + days} data points are required to backtest'}), 400
         
         return jsonify({
-            'modelVersion': MODEL_VERSION,
-            'modelScore': validation_score,
-            'forecastData': predictions,  # Changed from predictions to forecastData
-            'insights': insights,
-            'recommendations': recommendations,
-            'anomalies': formatted_anomalies
+            'modelVersion': loaded.version or MODEL_VERSION,
+            'modelScore': loaded.validation_score,
+            'modelInfo': {**loaded.metadata(), 'cohort': cohort, 'forecastMode': mode},
+            'backtest': {'days': days, 'step': step, **errors.report(), 'seconds': round(seconds, 4)}
         })
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+        return jsonify({'error': f'Backtest failed: {str(e)}'}), 500
+
+@app.route('/train', methods=['POST'])
+def start_training():
+    """Queue an asynchronous training job on the supplied history"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('historicalData'), list):
+            return jsonify({'error': 'Missing historical data'}), 400
+        
+        search = data.get('search')
+        if search is True:
+            search = 'fast'
+        if search not in (None, False, 'fast', 'grid'):
+            return jsonify({'error': "'search' must be true, 'fast' or 'grid'"}), 400
+        
+        cohort = data.get('cohort')
+        if cohort is not None:
+            cohort_registry.artifact_paths(cohort)  # Reject unusable names before queueing
+        
+        job_id = training_jobs.submit(data['historicalData'], search=search or None, cohort=cohort)
+        return jsonify({'jobId': job_id, 'job': training_jobs.status(job_id)}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to start training: {str(e)}'}), 500
+
+@app.route('/train/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """Progress, per-stage timings and validation score of a training job"""
+    status = training_jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown training job'}), 404
+    return jsonify(status)
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters and size of the prediction result cache"""
+    return jsonify(result_cache.stats())
+
+@app.route('/state/stats', methods=['GET'])
+def get_state_stats():
+    """Backend and size of the per-user state store"""
+    return jsonify(user_state_store.stats())
+
+@app.route('/cohorts/stats', methods=['GET'])
+def get_cohort_stats():
+    """Resident cohort models, memory budget and load/hit/miss/eviction counters"""
+    return jsonify(cohort_registry.stats())
+
+@app.route('/precomputed/stats', methods=['GET'])
+def get_precomputed_stats():
+    """Size and hit/miss/stale counters of the precomputed forecast store"""
+    return jsonify(precompute_store.stats())
 
 @app.route('/test-data', methods=['GET'])
 def get_test_data():
-    """Endpoint to get 30 days of sample data for testing"""
+    """Synthetic history for testing: one user's series, or a batch payload when `users` > 1
+    
+    `days` (default 30), `users` (default 1) and `seed` size and fix the data; the
+    seed used is returned in X-Seed. Multi-user JSON is streamed one user at a time.
+    """
     try:
-        test_data = generate_sample_data(days=30)
-        return jsonify(test_data)
+        days = parse_query_int('days', 30, minimum=1)
+        users = parse_query_int('users', 1, minimum=1)
+        seed = parse_query_int('seed', None, minimum=0)
+        if days * users > MAX_TEST_DATA_POINTS:
+            return jsonify({'error': f'Test data is limited to {MAX_TEST_DATA_POINTS} user-days'}), 400
+        if seed is None:
+            seed = int(np.random.randint(0, 2**31 - 1))
+        
+        generator = SyntheticDataGenerator(users=users, days=days, seed=seed)
+        mimetype = response_format()
+        headers = {'X-Seed': str(seed)}
+        if mimetype == COLUMNAR_BINARY_MIMETYPE:
+            histories = generator.histories('arrays')
+            payload = next(histories)[1] if users == 1 else {
+                'users': [{'userId': user_id, 'historicalData': history} for user_id, history in histories]
+            }
+            return Response(encode_frame(payload), mimetype=mimetype, headers=headers)
+        
+        layout = 'rows' if mimetype == JSON_MIMETYPE else 'columnar'
+        if users == 1:
+            response = jsonify(next(generator.histories(layout))[1])
+            response.mimetype = mimetype
+            response.headers.update(headers)
+            return response
+        return Response(stream_users(generator, layout), mimetype=mimetype, headers=headers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, stage latency, stage error and input size metrics in Prometheus text format"""
+    return Response(service_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Created after every route is registered so each one gets its own series; under
+# serve.py this happens before the fork, so all workers share the counters
+service_metrics = ServiceMetrics(sorted(rule.rule for rule in app.url_map.iter_rules() if rule.endpoint != 'static'))
+instrumentation = RequestInstrumentation(
+    service_metrics,
+    server_timing=SERVER_TIMING,
+    profile_sample_rate=PROFILE_SAMPLE_RATE,
+    profile_slow_seconds=PROFILE_SLOW_SECONDS,
+    profile_dir=PROFILE_DIR
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_timer = instrumentation.start(request.url_rule.rule if request.url_rule else 'other')
+
+@app.after_request
+def finish_request_timer(response):
+    timer, token = g.pop('request_timer', (None, None))
+    if timer is None:
+        return response
+    return instrumentation.finish(timer, token, response)
+
+@app.teardown_request
+def discard_request_timer(error=None):
+    # after_request is skipped when the response itself could not be built
+    timer, token = g.pop('request_timer', (None, None))
+    if timer is not None:
+        instrumentation.finish(timer, token, None)
+
 if __name__ == '__main__':
+    try:
+        print(f"Warm-up finished: {warm_up()}")
+    except Exception as e:
+        print(f"Warm-up failed, serving without it: {str(e)}")
     app.run(debug=True, port=5001) 
\ No newline at end of file
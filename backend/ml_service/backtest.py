@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from batch_pool import map_batches
+from features import FEATURE_COLUMNS
+from service_module import load_service
+
+MIN_HISTORY_DAYS = 30  # History every origin needs, as /predictions requires
+BATCH_ORIGINS = 4096  # Origins forecast together; each horizon step is one model call for all of them
+BATCH_SERIES = 64  # Series per pool task
+
+
+class HorizonErrors:
+    """Running absolute and percentage error sums for each day of the forecast horizon.
+
+    Percentage errors skip days whose actual value is zero. Instances from
+    separate batches or processes combine with ``merge``.
+    """
+
+    def __init__(self, days):
+        self.days = days
+        self.origins = 0
+        self.count = np.zeros(days, dtype=np.int64)
+        self.abs_error = np.zeros(days)
+        self.pct_count = np.zeros(days, dtype=np.int64)
+        self.pct_error = np.zeros(days)
+
+    def add(self, predicted, actual):
+        """Fold in ``(origins, days)`` arrays of forecasts and what actually happened"""
+        known = ~np.isnan(actual)
+        error = np.where(known, np.abs(predicted - actual), 0.0)
+        nonzero = known & (actual != 0)
+        self.origins += len(actual)
+        self.count += known.sum(axis=0)
+        self.abs_error += error.sum(axis=0)
+        self.pct_count += nonzero.sum(axis=0)
+        self.pct_error += np.where(nonzero, error / np.where(nonzero, np.abs(actual), 1.0), 0.0).sum(axis=0)
+
+    def merge(self, other):
+        self.origins += other.origins
+        self.count += other.count
+        self.abs_error += other.abs_error
+        self.pct_count += other.pct_count
+        self.pct_error += other.pct_error
+        return self
+
+    def report(self):
+        """MAE and MAPE (in percent) per horizon day and over all of them"""
+        def ratio(total, count, scale=1.0):
+            return round(float(total / count * scale), 4) if count else None
+
+        return {
+            'origins': self.origins,
+            'mae': ratio(self.abs_error.sum(), self.count.sum()),
+            'mape': ratio(self.pct_error.sum(), self.pct_count.sum(), 100),
+            'horizons': [
+                {'day': day + 1, 'mae': ratio(self.abs_error[day], self.count[day]),
+                 'mape': ratio(self.pct_error[day], self.pct_count[day], 100), 'count': int(self.count[day])}
+                for day in range(self.days)
+            ]
+        }
+
+
+def forecast_origins(n, days, step=1, min_history=MIN_HISTORY_DAYS, max_origins=None):
+    """History lengths to forecast from: every ``step`` days from ``min_history`` while ``days`` remain to score.
+
+    With ``max_origins`` only the most recent origins are kept.
+    """
+    origins = np.arange(max(min_history, 1), n - days + 1, step)
+    return origins[-max_origins:] if max_origins else origins
+
+
+def backtest_series(series, forecast, model, scaler, days, step=1, min_history=MIN_HISTORY_DAYS,
+                    max_origins=None, errors=None):
+    """Rolling-origin errors of ``forecast`` over ``(values, dates)`` series in date order.
+
+    Every origin's history is a view of its series, and origins from all
+    series are forecast ``BATCH_ORIGINS`` at a time, so the model sees a few
+    large batches instead of one request per origin.
+    """
+    errors = errors if errors is not None else HorizonErrors(days)
+    pending = []
+
+    def flush():
+        histories, last_dates, actual = zip(*pending)
+        _, predicted = forecast(list(histories), list(last_dates), model, scaler, FEATURE_COLUMNS, days)
+        errors.add(predicted, np.stack(actual))
+        pending.clear()
+
+    for values, dates in series:
+        values = np.asarray(values, dtype=float)
+        dates = np.asarray(dates).astype('datetime64[D]')
+        for origin in forecast_origins(len(values), days, step, min_history, max_origins):
+            pending.append((values[:origin], dates[origin - 1], values[origin:origin + days]))
+            if len(pending) >= BATCH_ORIGINS:
+                flush()
+    if pending:
+        flush()
+    return errors
+
+
+def backtest_batch(series, days, mode, step, min_history, max_origins, cohort=None):
+    """Pool entry point: HorizonErrors for a list of ``(values, dates)`` series with the serving model"""
+    app = load_service()  # Imported here so the pool workers load the model the same way the service does
+
+    loaded, _ = app.load_serving_model(cohort)
+    if loaded is None:
+        raise RuntimeError('Model is not available')
+    model, scaler = app.forecast_model(loaded, mode, days)
+    return backtest_series(series, app.FORECASTERS[mode], model, scaler, days, step, min_history, max_origins)
+
+
+def run_backtest(series, days, mode='recursive', step=1, min_history=MIN_HISTORY_DAYS, max_origins=None,
+                 cohort=None, workers=1, batch_series=BATCH_SERIES):
+    """Backtest the serving model over every ``(values, dates)`` series.
+
+    Batches of ``batch_series`` series run through map_batches in a pool of
+    ``workers`` (in this process when 0).
+    Returns the HorizonErrors report with the series count and wall time.
+    """
+    started = time.perf_counter()
+    errors = HorizonErrors(days)
+    n_series = 0
+    arguments = (days, mode, step, min_history, max_origins, cohort)
+    for batch, batch_errors in map_batches(backtest_batch, series, batch_series, workers, *arguments):
+        n_series += len(batch)
+        errors.merge(batch_errors)
+    return {'series': n_series, 'days': days, 'mode': mode, 'step': step, **errors.report(),
+            'seconds': round(time.perf_counter() - started, 3)}
+
+
+def read_series(paths):
+    """``(values, dates)`` for every usable user in history files, cleaned as for chunked training"""
+    from chunked_training import clean_series, iter_series
+
+    for _, dates, values in iter_series(paths):
+        try:
+            dates, values = clean_series(dates, values)
+        except ValueError:
+            continue
+        start = np.argmax(~np.isnan(values))  # Leading missing values are left unfilled
+        yield values[start:], dates[start:]
+
+
+def main():
+    app = load_service()
+
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the serving model')
+    parser.add_argument('paths', nargs='+', help='.jsonl/.ndjson, .csv, .parquet or .frames history files')
+    parser.add_argument('--days', type=int, default=app.DEFAULT_FORECAST_DAYS, help='forecast horizon')
+    parser.add_argument('--mode', choices=list(app.FORECASTERS), default=app.FORECAST_MODE)
+    parser.add_argument('--step', type=int, default=1, help='days between forecast origins')
+    parser.add_argument('--min-history', type=int, default=MIN_HISTORY_DAYS)
+    parser.add_argument('--max-origins', type=int, help='most recent origins kept per series')
+    parser.add_argument('--cohort')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-series', type=int, default=BATCH_SERIES)
+    args = parser.parse_args()
+
+    report = run_backtest(read_series(args.paths), args.days, args.mode, args.step, args.min_history,
+                          args.max_origins, args.cohort, workers=args.workers, batch_series=args.batch_series)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+
+def batches(items, size):
+    """Lists of up to ``size`` consecutive items, read lazily from any iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def map_batches(function, items, size, workers, *args):
+    """Yield ``(batch, function(batch, *args))`` for batches of ``size`` items.
+
+    Batches run in a process pool of ``workers`` (in this process when 0),
+    with at most two batches per worker in flight, so the input is streamed
+    rather than loaded at once. Results come back in completion order, and a
+    failed batch raises its exception here. The pool spawns rather than
+    forks, like the training pool, so workers never inherit the parent's
+    threads or open connections.
+    """
+    if workers <= 0:
+        for batch in batches(items, size):
+            yield batch, function(batch, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = {}
+        for batch in batches(items, size):
+            pending[pool.submit(function, batch, *args)] = batch
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        for future in list(pending):
+            yield pending.pop(future), future.result()
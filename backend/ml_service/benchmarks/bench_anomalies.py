@@ -0,0 +1,71 @@
+"""Benchmark detect_anomalies against the per-row loop it replaced.
+
+Run from backend/ml_service:  python benchmarks/bench_anomalies.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import detect_anomalies  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 3
+
+
+def legacy_detect_anomalies(df):
+    """The iloc-per-row implementation detect_anomalies replaced"""
+    anomalies = []
+    if len(df) < 7:
+        return anomalies
+    rolling_mean = df['carbonFootprint'].rolling(window=7, min_periods=1).mean()
+    rolling_std = df['carbonFootprint'].rolling(window=7, min_periods=1).std()
+    z_scores = (df['carbonFootprint'] - rolling_mean) / rolling_std
+    for i in range(len(df)):
+        if abs(z_scores[i]) > 2:
+            anomalies.append({
+                'date': df['date'].iloc[i].strftime('%Y-%m-%d'),
+                'value': float(df['carbonFootprint'].iloc[i]),
+                'expected_range': f"{rolling_mean.iloc[i] - 2 * rolling_std.iloc[i]:.2f} - {rolling_mean.iloc[i] + 2 * rolling_std.iloc[i]:.2f}",
+                'detection_method': 'Z-score'
+            })
+    return anomalies
+
+
+def make_history(days, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 20 + rng.normal(0, 2, days)
+    spikes = rng.random(days) < 0.02
+    values[spikes] *= 1.8
+    return pd.DataFrame({
+        'date': pd.date_range('1800-01-01', periods=days, freq='D'),
+        'carbonFootprint': values
+    })
+
+
+def best_time(fn, df):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = fn(df)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    print(f"{'points':>8} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>8} {'anomalies':>10}")
+    for days in SIZES:
+        df = make_history(days)
+        legacy_time, expected = best_time(legacy_detect_anomalies, df)
+        new_time, actual = best_time(detect_anomalies, df)
+        if actual != expected:
+            raise SystemExit(f"Results differ at {days} points")
+        print(f"{days:>8} {legacy_time:>12.4f} {new_time:>15.4f} {legacy_time / new_time:>7.1f}x {len(actual):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Latency and accuracy of recursive versus direct multi-horizon forecasting.
+
+Run from backend/ml_service:  python benchmarks/bench_forecast_modes.py [--output FILE]
+
+Trains one artifact (the recursive model plus a direct model for HORIZON days)
+on three years of synthetic history. Latency is timed for each horizon with
+1 and BATCH_SERIES series through the same model pair the service uses.
+Accuracy is the MAE per horizon over rolling forecast origins in the held-out
+final year. Results are written as JSON for benchmarks/compare.py.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from forecaster import forecast_direct, forecast_recursive  # noqa: E402
+from harness import save_results, time_call  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from synthetic_data import SyntheticDataGenerator  # noqa: E402
+from training import train_model  # noqa: E402
+
+HORIZON = 90
+TRAIN_DAYS = 3 * 365
+TEST_DAYS = 365
+HORIZONS = [1, 7, 30, 90]
+BATCH_SERIES = 100
+ORIGIN_STEP = 7
+REPEATS = 5
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(days=TRAIN_DAYS + TEST_DAYS, seed=0, end_date='2024-12-31')
+    _, history = next(generator.histories())
+    df = app.prepare_data(history)
+    values = df['carbonFootprint'].to_numpy(dtype=float)
+    dates = df['date'].to_numpy().astype('datetime64[D]')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.join(workdir, 'model.joblib')
+        scaler_path = os.path.join(workdir, 'scaler.joblib')
+        train_model(df.iloc[:TRAIN_DAYS], model_path, scaler_path, app.MODEL_VERSION, direct_horizon=HORIZON)
+        loaded = ModelRegistry(model_path, scaler_path).get()
+    modes = {
+        'recursive': (forecast_recursive, *loaded.serving_model()),
+        'direct': (forecast_direct, loaded.direct_model, loaded.scaler),
+    }
+    print(f"direct model trained for {loaded.direct_horizon} days")
+
+    results = []
+    print(f"{'mode':<10} {'days':>5} {'1 series ms':>12} {f'{BATCH_SERIES} series ms':>14}")
+    rng = np.random.default_rng(1)
+    origins = rng.integers(TRAIN_DAYS // 2, TRAIN_DAYS, BATCH_SERIES)
+    batch_histories = [values[:origin] for origin in origins]
+    batch_dates = [dates[origin - 1] for origin in origins]
+    for days in HORIZONS:
+        for mode, (forecast, model, scaler) in modes.items():
+            single = time_call(lambda: forecast([values[:TRAIN_DAYS]], [dates[TRAIN_DAYS - 1]], model, scaler,
+                                                app.FEATURE_COLUMNS, days), REPEATS)
+            batch = time_call(lambda: forecast(batch_histories, batch_dates, model, scaler,
+                                               app.FEATURE_COLUMNS, days), REPEATS)
+            results.append({'stage': f'{mode}_latency', 'days': days, **single})
+            results.append({'stage': f'{mode}_batch_latency', 'days': days, **batch})
+            print(f"{mode:<10} {days:>5} {single['min'] * 1000:>12.2f} {batch['min'] * 1000:>14.2f}")
+
+    # Every origin in the test year with a full horizon after it, forecast as one batch per mode
+    origins = np.arange(TRAIN_DAYS, len(values) - HORIZON + 1, ORIGIN_STEP)
+    actual = np.stack([values[origin:origin + HORIZON] for origin in origins])
+    print(f"\nMAE over {len(origins)} origins")
+    print(f"{'mode':<10} " + ' '.join(f'{f"day {h}":>8}' for h in HORIZONS) + f" {'mean':>8}")
+    for mode, (forecast, model, scaler) in modes.items():
+        _, predicted = forecast([values[:origin] for origin in origins], [dates[origin - 1] for origin in origins],
+                                model, scaler, app.FEATURE_COLUMNS, HORIZON)
+        errors = np.abs(predicted - actual).mean(axis=0)
+        for h in HORIZONS:
+            results.append({'stage': f'{mode}_mae', 'days': h, 'mae': float(errors[h - 1])})
+        results.append({'stage': f'{mode}_mae', 'days': 'mean', 'mae': float(errors.mean())})
+        print(f"{mode:<10} " + ' '.join(f'{errors[h - 1]:>8.3f}' for h in HORIZONS) + f" {errors.mean():>8.3f}")
+
+    config = {'horizon': HORIZON, 'trainDays': TRAIN_DAYS, 'testDays': TEST_DAYS,
+              'batchSeries': BATCH_SERIES, 'repeats': REPEATS}
+    print(f"\nResults written to {save_results('forecast_modes', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""End-to-end load test of a locally started ML service.
+
+Run from backend/ml_service:
+    python benchmarks/bench_load.py [--clients 1 4 16] [--duration 10] [--days 90] [--workers N] [--output FILE]
+
+Trains a model into a temporary directory, starts serve.py there and, for
+each client count, drives /predictions from that many concurrent keep-alive
+clients for ``--duration`` seconds after a short warm-up. Each client cycles
+through distinct histories so the result cache (disabled unless ``--cache``)
+does not answer for the model. Reports requests/s and p50/p95/p99 latency and
+writes them as JSON for benchmarks/compare.py.
+"""
+import argparse
+import os
+import signal
+import tempfile
+
+from harness import (
+    drive, history_values, latency_summary, row_history, save_results, start_server, train_into
+)
+
+CLIENTS = [1, 4, 16]
+DURATION = 10.0
+WARM_UP_SECONDS = 2.0
+HISTORY_DAYS = 90
+DISTINCT_HISTORIES = 256
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=CLIENTS)
+    parser.add_argument('--duration', type=float, default=DURATION)
+    parser.add_argument('--days', type=int, default=HISTORY_DAYS, help='history length per request')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache', action='store_true', help='keep the result cache enabled')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/)')
+    args = parser.parse_args()
+
+    payloads = [{'historicalData': row_history(history_values(args.days, seed))}
+                for seed in range(DISTINCT_HISTORIES)]
+    env = {} if args.cache else {'RESULT_CACHE_MAX_BYTES': '0'}
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        train_into(workdir)
+        server, base_url = start_server(workdir, args.workers, **env)
+        try:
+            url = f'{base_url}/predictions'
+            drive(url, max(args.clients), payloads, WARM_UP_SECONDS)
+
+            print(f"{args.workers} workers, {args.days}-day histories")
+            print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            for clients in args.clients:
+                result = {'clients': clients, **latency_summary(*drive(url, clients, payloads, args.duration))}
+                results.append(result)
+                print(f"{clients:>7} {result['rps']:>8.1f} {result.get('p50Ms', 0):>8.1f} "
+                      f"{result.get('p95Ms', 0):>8.1f} {result.get('p99Ms', 0):>8.1f} {result['errors']:>7}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    config = {'workers': args.workers, 'duration': args.duration, 'days': args.days,
+              'cache': args.cache, 'endpoint': '/predictions'}
+    print(f"Results written to {save_results('load', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Throughput of serve.py as the number of worker processes grows.
+
+Run from backend/ml_service:  python benchmarks/bench_serving.py [workers ...]
+
+Each configuration is started on a fresh port with the result cache disabled,
+then driven by 2 client threads per worker for DURATION seconds with distinct
+90-day histories. Reports requests/s, latency percentiles and scaling
+efficiency relative to one worker.
+"""
+import os
+import signal
+import sys
+import tempfile
+
+import numpy as np
+
+from harness import drive, history_values, row_history, start_server, train_into
+
+DURATION = 10.0
+CLIENTS_PER_WORKER = 2
+HISTORY_DAYS = 90
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or sorted({1, 2, cpus})
+    payloads = [{'historicalData': row_history(history_values(HISTORY_DAYS, seed))} for seed in range(256)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        train_into(workdir)
+
+        print(f"{cpus} CPUs available")
+        print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8} {'efficiency':>10}")
+        baseline = None
+        for workers in worker_counts:
+            server, base_url = start_server(workdir, workers, RESULT_CACHE_MAX_BYTES='0')
+            try:
+                latencies, errors, elapsed = drive(f'{base_url}/predictions', CLIENTS_PER_WORKER * workers,
+                                                   payloads, DURATION)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=30)
+            rps = len(latencies) / elapsed
+            if baseline is None:
+                # Per-worker throughput of the smallest configuration
+                baseline = rps / workers
+            p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+            speedup = rps / baseline
+            print(f"{workers:>7} {rps:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {errors:>7} "
+                  f"{speedup:>7.2f}x {speedup / workers:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""In-process microbenchmarks of each serving and training stage across history sizes.
+
+Run from backend/ml_service:
+    python benchmarks/bench_stages.py [--sizes 30 365 3650] [--repeats 5] [--skip-training] [--output FILE]
+
+Stages: prepare_data (from row JSON), predict_future, detect_anomalies,
+generate_insights, generate_recommendations, train_model (histories of at
+least TRAIN_MIN_DAYS) and gateway proxying (the backend gateway forwarding a
+request to a stub ML service that answers with a canned body). Every timing is the best and median of ``--repeats``
+calls; results are written as JSON for benchmarks/compare.py.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from harness import (  # noqa: E402
+    SERVICE_DIR, history_values, row_history, save_results, time_call
+)
+from model_registry import ModelRegistry  # noqa: E402
+
+SIZES = [30, 90, 365, 1825, 3650]  # One month to ten years of daily points
+REPEATS = 5
+TRAIN_REPEATS = 1
+TRAIN_DAYS = 365  # History the model used by predict_future is trained on
+TRAIN_MIN_DAYS = 60  # The 30-day lag feature is all NaN in shorter histories, which training rejects
+GATEWAY_PATH = os.path.join(os.path.dirname(SERVICE_DIR), 'app.py')
+
+
+class StubMLService(BaseHTTPRequestHandler):
+    """Answers every POST with ``server.body`` after reading the request"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Otherwise delayed ACKs add ~40 ms to every proxied call
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = self.server.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubMLService)
+    server.daemon_threads = True
+    server.body = b'{}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_gateway(ml_service_url):
+    """Import backend/app.py under its own name; it would clash with the ML service's app"""
+    os.environ['ML_SERVICE_URL'] = ml_service_url
+    # Every timed call must reach the stub rather than the gateway's response cache
+    os.environ['ML_RESPONSE_CACHE_TTL'] = '0'
+    sys.path.insert(0, os.path.dirname(GATEWAY_PATH))
+    spec = importlib.util.spec_from_file_location('gateway', GATEWAY_PATH)
+    gateway = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gateway)
+    return gateway.app.test_client()
+
+
+def bench_size(days, repeats, model, scaler, gateway, stub, skip_training):
+    history = row_history(history_values(days, seed=days))
+    df = app.prepare_data(history)
+    anomalies = app.detect_anomalies(df)
+    body = json.dumps({'historicalData': history}).encode()
+
+    # The stub replies with what the real service returns for this history
+    stub.body = json.dumps({
+        'forecastData': app.predict_future(df, model, scaler),
+        **app.analyze_history(df)
+    }).encode()
+
+    def proxy():
+        response = gateway.post('/api/ml/predictions', data=body, content_type='application/json')
+        response.get_data()
+
+    stages = [
+        ('prepare_data', lambda: app.prepare_data(history), repeats),
+        ('predict_future', lambda: app.predict_future(df, model, scaler), repeats),
+        ('detect_anomalies', lambda: app.detect_anomalies(df), repeats),
+        ('generate_insights', lambda: app.generate_insights(df), repeats),
+        ('generate_recommendations', lambda: app.generate_recommendations(df, anomalies), repeats),
+        ('gateway_proxy', proxy, repeats),
+    ]
+    if not skip_training and days >= TRAIN_MIN_DAYS:
+        stages.append(('train_model', lambda: app.train_model(df), TRAIN_REPEATS))
+
+    results = []
+    for stage, fn, stage_repeats in stages:
+        fn()  # Untimed first call: imports, pooled connections, caches
+        results.append({'stage': stage, 'days': days, **time_call(fn, stage_repeats)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--skip-training', action='store_true')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/)')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    stub = start_stub()
+    gateway = load_gateway(f'http://127.0.0.1:{stub.server_address[1]}')
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # train_model publishes to the relative models/ directory
+        os.chdir(workdir)
+        app.train_model(app.prepare_data(row_history(history_values(TRAIN_DAYS))))
+        model, scaler = ModelRegistry(app.MODEL_PATH, app.SCALER_PATH).get().serving_model()
+
+        print(f"{'stage':<26} {'days':>6} {'min ms':>10} {'median ms':>10}")
+        for days in args.sizes:
+            for result in bench_size(days, args.repeats, model, scaler, gateway, stub, args.skip_training):
+                results.append(result)
+                print(f"{result['stage']:<26} {days:>6} {result['min'] * 1000:>10.2f} {result['median'] * 1000:>10.2f}")
+        os.chdir(SERVICE_DIR)
+    stub.shutdown()
+
+    config = {'sizes': args.sizes, 'repeats': args.repeats, 'trainRepeats': TRAIN_REPEATS,
+              'skipTraining': args.skip_training}
+    print(f"Results written to {save_results('stages', config, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
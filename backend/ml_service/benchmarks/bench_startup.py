@@ -0,0 +1,71 @@
+"""Measure ML service import time and time-to-first-prediction in fresh interpreters.
+
+Run from backend/ml_service:  python benchmarks/bench_startup.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 5
+HEAVY_MODULES = ['sklearn', 'scipy', 'xgboost']
+
+# Trains a model into the working directory so the startup runs have one to load
+TRAIN_SCRIPT = """
+import sys
+sys.path.insert(0, {service_dir!r})
+import numpy as np
+import app
+np.random.seed(0)
+app.train_model(app.prepare_data(app.generate_sample_data(days=180)))
+"""
+
+# One cold start: import the service, then warm it up
+STARTUP_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {service_dir!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter() - started
+loaded_after_import = [m for m in {heavy!r} if m in sys.modules]
+timings = app.warm_up()
+ready = time.perf_counter() - started
+print(json.dumps({{
+    'import': imported,
+    'modelLoad': timings['modelLoad'],
+    'firstPrediction': timings['firstPrediction'],
+    'ready': ready,
+    'loadedAfterImport': loaded_after_import,
+    'loadedAfterWarmUp': [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run(script, cwd):
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    return result.stdout
+
+
+def main():
+    with tempfile.TemporaryDirectory() as workdir:
+        run(TRAIN_SCRIPT.format(service_dir=SERVICE_DIR), workdir)
+        samples = [
+            json.loads(run(STARTUP_SCRIPT.format(service_dir=SERVICE_DIR, heavy=HEAVY_MODULES), workdir).splitlines()[-1])
+            for _ in range(REPEATS)
+        ]
+
+    print(f"{'stage':<18} {'median (s)':>11} {'min (s)':>9}")
+    for stage in ('import', 'modelLoad', 'firstPrediction', 'ready'):
+        values = [sample[stage] for sample in samples]
+        print(f"{stage:<18} {statistics.median(values):>11.3f} {min(values):>9.3f}")
+    print(f"loaded after import:  {samples[0]['loadedAfterImport'] or 'none'}")
+    print(f"loaded after warm-up: {samples[0]['loadedAfterWarmUp'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Request decode plus prepare_data cost for row JSON, columnar JSON and binary frames.
+
+Run from backend/ml_service:  python benchmarks/bench_wire_format.py
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import prepare_data  # noqa: E402
+from wire_format import decode_frame, encode_frame  # noqa: E402
+
+SIZES = [30, 365, 3650]
+BATCH_USERS = 200
+REPEATS = 5
+
+
+def make_values(days, seed=0):
+    return np.round(20 + np.random.default_rng(seed).normal(0, 2, days), 2)
+
+
+def row_body(values):
+    dates = np.datetime64('2015-01-01') + np.arange(len(values))
+    return json.dumps({'historicalData': [
+        {'date': str(date), 'carbonFootprint': float(value)} for date, value in zip(dates, values)
+    ]}).encode()
+
+
+def columnar_json_body(values):
+    return json.dumps({'historicalData': {'start': '2015-01-01', 'carbonFootprint': values.tolist()}}).encode()
+
+
+def binary_body(values):
+    return encode_frame({'historicalData': {'start': '2015-01-01', 'carbonFootprint': values.astype(np.float32)}})
+
+
+FORMATS = [
+    ('rows json', row_body, json.loads),
+    ('columnar json', columnar_json_body, json.loads),
+    ('binary frame', binary_body, decode_frame),
+]
+
+
+def best_time(fn):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    print(f"{'days':>6} {'format':<14} {'bytes':>9} {'decode ms':>10} {'prepare ms':>11} {'total ms':>9}")
+    for days in SIZES:
+        values = make_values(days)
+        for name, encode, decode in FORMATS:
+            body = encode(values)
+            decode_time = best_time(lambda: decode(body))
+            payload = decode(body)
+            prepare_time = best_time(lambda: prepare_data(payload['historicalData']))
+            print(f"{days:>6} {name:<14} {len(body):>9} {decode_time * 1000:>10.2f} "
+                  f"{prepare_time * 1000:>11.2f} {(decode_time + prepare_time) * 1000:>9.2f}")
+
+    # A batch call decodes every user's history before any forecasting starts
+    print(f"\nbatch of {BATCH_USERS} users x 365 days")
+    histories = [make_values(365, seed) for seed in range(BATCH_USERS)]
+    for name, encode, decode in FORMATS:
+        bodies = [encode(values) for values in histories]
+        total = best_time(lambda: [prepare_data(decode(body)['historicalData']) for body in bodies])
+        print(f"{name:<14} {sum(map(len, bodies)):>10} bytes {total * 1000:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
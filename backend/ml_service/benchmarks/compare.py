@@ -0,0 +1,65 @@
+"""Compare two benchmark result files, e.g. from two commits.
+
+Run from backend/ml_service:  python benchmarks/compare.py BASELINE.json CANDIDATE.json [--threshold 0.1]
+
+Rows are matched by stage and history size (stage benchmarks) or client count
+(load benchmarks). Changes beyond ``--threshold`` in the bad direction are
+flagged, and the exit status is 1 if there are any, so the script can gate CI.
+"""
+import argparse
+import json
+import sys
+
+# Metric name -> True if a larger value is better
+METRICS = {'min': False, 'median': False, 'mae': False, 'rps': True, 'p50Ms': False, 'p95Ms': False, 'p99Ms': False}
+KEY_FIELDS = ('stage', 'days', 'clients')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def row_key(row):
+    return tuple((field, row[field]) for field in KEY_FIELDS if field in row)
+
+
+def compare(baseline, candidate, threshold):
+    """Yield (key, metric, old, new, change, regressed) for every shared metric"""
+    old_rows = {row_key(row): row for row in baseline['results']}
+    for row in candidate['results']:
+        old = old_rows.get(row_key(row))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in row or metric not in old or not old[metric]:
+                continue
+            change = row[metric] / old[metric] - 1
+            regressed = -change > threshold if higher_is_better else change > threshold
+            yield row_key(row), metric, old[metric], row[metric], change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change flagged as a regression')
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline['benchmark'] != candidate['benchmark']:
+        raise SystemExit(f"Cannot compare a {baseline['benchmark']} run with a {candidate['benchmark']} run")
+    print(f"baseline  {baseline['environment']['commit']}  {baseline['environment']['timestamp']}")
+    print(f"candidate {candidate['environment']['commit']}  {candidate['environment']['timestamp']}")
+
+    regressions = 0
+    print(f"{'case':<36} {'metric':<8} {'baseline':>11} {'candidate':>11} {'change':>8}")
+    for key, metric, old, new, change, regressed in compare(baseline, candidate, args.threshold):
+        case = ' '.join(str(value) if field == 'stage' else f'{field}={value}' for field, value in key)
+        print(f"{case:<36} {metric:<8} {old:>11.4g} {new:>11.4g} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+        regressions += regressed
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
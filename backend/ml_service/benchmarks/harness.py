@@ -0,0 +1,173 @@
+"""Shared helpers for the benchmark scripts: synthetic histories, timing,
+a locally started serve.py, a concurrent load driver and JSON result files.
+"""
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(SERVICE_DIR, 'benchmarks', 'results')
+HISTORY_START = np.datetime64('2015-01-01')
+READY_TIMEOUT = 60.0
+
+# Trains a model into the working directory so a started server has one to load
+TRAIN_SCRIPT = """
+import sys
+sys.path.insert(0, {service_dir!r})
+import numpy as np
+import app
+np.random.seed(0)
+app.train_model(app.prepare_data(app.generate_sample_data(days=180)))
+"""
+
+
+def history_values(days, seed=0):
+    """Daily footprints with a weekly cycle, noise and occasional spikes"""
+    rng = np.random.default_rng(seed)
+    values = 20 + 3 * np.sin(np.arange(days) * 2 * np.pi / 7) + rng.normal(0, 2, days)
+    values[rng.random(days) < 0.02] *= 1.8
+    return np.round(np.maximum(values, 0), 2)
+
+
+def row_history(values, start=HISTORY_START):
+    """``historicalData`` in the row layout the frontend sends"""
+    dates = start + np.arange(len(values))
+    return [{'date': str(date), 'carbonFootprint': float(value)} for date, value in zip(dates, values)]
+
+
+def time_call(fn, repeats):
+    """Best and median wall time of ``repeats`` calls, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {'min': min(timings), 'median': statistics.median(timings), 'repeats': repeats}
+
+
+def train_into(workdir):
+    """Train a model into ``workdir``/models in a fresh interpreter"""
+    subprocess.run([sys.executable, '-c', TRAIN_SCRIPT.format(service_dir=SERVICE_DIR)],
+                   cwd=workdir, check=True, capture_output=True)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, workers, **env):
+    """Start serve.py on a free port and wait until /health reports it ready"""
+    port = free_port()
+    env = dict(os.environ, ML_SERVICE_PORT=str(port), ML_WORKERS=str(workers), **env)
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(SERVICE_DIR, 'serve.py')],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + READY_TIMEOUT
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                return server, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f"Server with {workers} workers did not become ready")
+
+
+def drive(url, clients, payloads, duration):
+    """POST ``payloads`` round-robin from ``clients`` threads for ``duration`` seconds.
+
+    Returns the latencies of successful requests, the error count and the
+    elapsed wall time.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        session = requests.Session()
+        i = index
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = session.post(url, json=payloads[i % len(payloads)], timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), len(errors), time.perf_counter() - started
+
+
+def latency_summary(latencies, errors, elapsed):
+    """Throughput and latency percentiles (milliseconds) of one load run"""
+    if len(latencies) == 0:
+        return {'requests': 0, 'errors': errors, 'rps': 0.0}
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50Ms': float(p50),
+        'p95Ms': float(p95),
+        'p99Ms': float(p99),
+        'maxMs': float(latencies.max() * 1000)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def environment():
+    """What a result depends on besides the code: commit, interpreter, libraries, CPUs"""
+    import pandas as pd
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def save_results(name, config, results, output=None):
+    """Write one run to ``output`` (default ``results/<name>-<commit>-<time>.json``)"""
+    env = environment()
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{name}-{env['commit']}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'benchmark': name, 'environment': env, 'config': config, 'results': results}, f, indent=2)
+    return output
@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+
+from features import FEATURE_COLUMNS, build_feature_matrix
+from model_registry import publish_artifacts
+from synthetic_data import read_frames
+from training import VALIDATION_SIZE
+from wire_format import history_columns, parse_dates
+
+# Out-of-core counterpart of training.train_model for many users' histories in
+# local files. Nothing here holds more than one user's series and one block of
+# feature rows at a time: the scaler is fitted with partial_fit, and XGBoost
+# trains from external memory, with its quantized pages cached on disk
+
+CHUNK_ROWS = int(os.getenv('TRAIN_CHUNK_ROWS', '65536'))  # Feature rows per block handed to the scaler and XGBoost
+READ_ROWS = 100_000  # Rows read per batch from CSV and Parquet files
+MIN_SERIES_DAYS = 30  # Shorter series are skipped, as /train rejects them
+MAX_MISSING_FRACTION = 0.1  # Series with more missing values are skipped, as in prepare_data
+INPUT_FORMATS = {'.jsonl': 'ndjson', '.ndjson': 'ndjson', '.csv': 'csv', '.parquet': 'parquet', '.frames': 'frames'}
+LONG_COLUMNS = ['userId', 'date', 'carbonFootprint']  # CSV and Parquet layout: one row per user-day
+SKETCH_ROWS = 16384  # Training rows, evenly spaced, from which XGBoost's histogram bins are chosen
+BOOST_ROUNDS = 200  # Trees in the model, each fitted on every training row
+BOOST_PARAMS = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'learning_rate': 0.05,
+    'max_depth': 4,
+    'subsample': 0.8,
+    'seed': 42
+}
+
+
+def input_format(path):
+    """Input format of a history file, from its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in INPUT_FORMATS:
+        raise ValueError(f"Unknown history file format: {path}")
+    return INPUT_FORMATS[extension]
+
+
+def _ndjson_series(path):
+    # One {"userId", "historicalData"} object per line, in either history layout
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            user = json.loads(line)
+            columns = history_columns(user['historicalData'])
+            if not isinstance(columns, dict):
+                columns = {name: [row.get(name) for row in columns] for name in LONG_COLUMNS[1:]}
+            yield user['userId'], columns['date'], columns['carbonFootprint']
+
+
+def _group_users(frames):
+    """Yield ``(user_id, dates, values)`` from long-format frames.
+
+    A user's rows must be contiguous but may span frames; the trailing user of
+    each frame is carried into the next one, so at most one user's rows are
+    held beyond the current frame.
+    """
+    carry = None
+    for frame in frames:
+        frame = frame[LONG_COLUMNS]
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+        if frame.empty:
+            continue
+        user_ids = frame['userId'].to_numpy()
+        dates = frame['date'].to_numpy()
+        values = frame['carbonFootprint'].to_numpy()
+        starts = np.flatnonzero(np.concatenate(([True], user_ids[1:] != user_ids[:-1])))
+        for start, end in zip(starts[:-1], starts[1:]):
+            yield user_ids[start], dates[start:end], values[start:end]
+        carry = frame.iloc[starts[-1]:]
+    if carry is not None and not carry.empty:
+        yield carry['userId'].iloc[0], carry['date'].to_numpy(), carry['carbonFootprint'].to_numpy()
+
+
+def _csv_frames(path):
+    return pd.read_csv(path, usecols=LONG_COLUMNS, dtype={'userId': str}, chunksize=READ_ROWS)
+
+
+def _parquet_frames(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files requires pyarrow")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=READ_ROWS, columns=LONG_COLUMNS):
+        yield batch.to_pandas()
+
+
+def _frames_series(path):
+    for chunk in read_frames(path):
+        for i, user_id in enumerate(chunk.user_ids.tolist()):
+            yield user_id, chunk.dates, chunk.columns['carbonFootprint'][i]
+
+
+def iter_series(paths):
+    """Yield ``(user_id, dates, values)`` for every user in the history files, one user at a time"""
+    for path in paths:
+        kind = input_format(path)
+        if kind == 'ndjson':
+            yield from _ndjson_series(path)
+        elif kind == 'csv':
+            yield from _group_users(_csv_frames(path))
+        elif kind == 'parquet':
+            yield from _group_users(_parquet_frames(path))
+        else:
+            yield from _frames_series(path)
+
+
+def clean_series(dates, values):
+    """Dates sorted as ``datetime64[D]`` with missing values interpolated over time.
+
+    Follows prepare_data: too many missing or any negative values raise a
+    ValueError, and leading missing values stay NaN.
+    """
+    dates = parse_dates(dates).to_numpy().astype('datetime64[D]')
+    values = np.asarray(values, dtype=float)
+    order = np.argsort(dates, kind='stable')
+    dates, values = dates[order], values[order]
+    missing = np.isnan(values)
+    if missing.sum() > len(values) * MAX_MISSING_FRACTION:
+        raise ValueError("Too many missing values in carbon footprint data")
+    if (values[~missing] < 0).any():
+        raise ValueError("Negative carbon footprint values detected")
+    if missing.any():
+        days = dates.astype(np.int64)
+        first = days[~missing][0]
+        values = values.copy()
+        values[missing] = np.interp(days[missing], days[~missing], values[~missing])
+        values[missing & (days < first)] = np.nan
+    return dates, values
+
+
+def feature_blocks(paths, split='training', chunk_rows=CHUNK_ROWS, counts=None):
+    """Yield ``(X, y)`` blocks of ``chunk_rows`` feature rows from the history files.
+
+    Features are built per user, and the first ``1 - VALIDATION_SIZE`` of each
+    series is the training split and the rest the validation split, as in
+    train_model. Rows without a target are dropped. ``counts``, when given,
+    accumulates the users seen and skipped and the rows yielded.
+    """
+    if split not in ('training', 'validation'):
+        raise ValueError(f"Unknown split: {split}")
+    pending, pending_rows = [], 0
+    for _, dates, values in iter_series(paths):
+        try:
+            dates, values = clean_series(dates, values)
+        except ValueError:
+            if counts is not None and split == 'training':
+                counts['skipped'] += 1
+            continue
+        if len(values) < MIN_SERIES_DAYS:
+            if counts is not None and split == 'training':
+                counts['skipped'] += 1
+            continue
+        if counts is not None and split == 'training':
+            counts['users'] += 1
+
+        matrix = build_feature_matrix(values, dates)
+        train_size = int(len(values) * (1 - VALIDATION_SIZE))
+        rows = slice(0, train_size) if split == 'training' else slice(train_size, None)
+        X, y = matrix[rows], values[rows]
+        known = ~np.isnan(y)
+        if not known.all():
+            X, y = X[known], y[known]
+        if not len(y):
+            continue
+        pending.append((X, y))
+        pending_rows += len(y)
+
+        while pending_rows >= chunk_rows:
+            X = np.concatenate([X for X, _ in pending])
+            y = np.concatenate([y for _, y in pending])
+            pending = [(X[chunk_rows:], y[chunk_rows:])]
+            pending_rows -= chunk_rows
+            if counts is not None:
+                counts[f'{split}_rows'] += chunk_rows
+            yield X[:chunk_rows], y[:chunk_rows]
+    if pending_rows:
+        if counts is not None:
+            counts[f'{split}_rows'] += pending_rows
+        yield np.concatenate([X for X, _ in pending]), np.concatenate([y for _, y in pending])
+
+
+class RowSample:
+    """Every ``stride``-th row of the blocks added, with the stride doubled whenever more than ``size`` are kept"""
+
+    def __init__(self, size):
+        self.size = size
+        self.stride = 1
+        self.seen = 0
+        self.kept = []
+
+    def add(self, X):
+        self.kept.append(X[-self.seen % self.stride::self.stride].copy())  # A view would keep the whole block
+        self.seen += len(X)
+        while sum(len(rows) for rows in self.kept) > self.size:
+            # The rows kept sit at multiples of the stride, starting with the first row
+            self.kept = [np.concatenate(self.kept)[::2]]
+            self.stride *= 2
+
+    def rows(self):
+        return np.concatenate(self.kept)
+
+
+class ScaledBlocks(xgb.DataIter):
+    """The scaled training blocks of the history files, as an XGBoost external-memory iterator.
+
+    Given reference bins, XGBoost reads the blocks once to write quantized
+    pages to ``cache_prefix``, then boosts every round over all of those
+    pages, so no more than one block of raw features is in memory at a time.
+    """
+
+    def __init__(self, paths, scaler, chunk_rows, cache_prefix):
+        self.paths = paths
+        self.scaler = scaler
+        self.chunk_rows = chunk_rows
+        self._blocks = None
+        super().__init__(cache_prefix=cache_prefix, on_host=False)
+
+    def next(self, input_data):
+        if self._blocks is None:
+            self._blocks = feature_blocks(self.paths, 'training', self.chunk_rows)
+        block = next(self._blocks, None)
+        if block is None:
+            return False
+        X, y = block
+        input_data(data=self.scaler.transform(X), label=y)
+        return True
+
+    def reset(self):
+        self._blocks = None
+
+
+def streaming_r2(model, scaler, blocks):
+    """R² of ``model`` over ``(X, y)`` blocks, accumulated without keeping them; None without rows"""
+    n, total, squares, errors = 0, 0.0, 0.0, 0.0
+    for X, y in blocks:
+        predicted = model.predict(scaler.transform(X))
+        n += len(y)
+        total += y.sum()
+        squares += (y * y).sum()
+        errors += ((y - predicted) ** 2).sum()
+    if not n:
+        return None
+    variance = squares - total * total / n
+    return 1 - errors / variance if variance > 0 else None
+
+
+def train_model_from_files(paths, model_path, scaler_path, version, chunk_rows=CHUNK_ROWS,
+                           rounds=BOOST_ROUNDS, report=None):
+    """Train an XGBoost model on every user's history in ``paths`` with bounded memory.
+
+    The files are streamed four times: to fit the scaler, count the rows and
+    sample SKETCH_ROWS of them for the histogram bins, twice as XGBoost builds
+    its external-memory matrix from ``chunk_rows`` blocks, and for the
+    validation score. Every one of the ``rounds`` trees sees all the training
+    rows, read back from quantized pages in a temporary directory, and model
+    size and serving latency stay fixed as the data grows. Raw features are
+    held one block at a time; what still grows with the rows is XGBoost's
+    gradient and label state, tens of bytes per row. The model and scaler
+    are published like train_model's, with a recursive forecast mode only.
+    Returns ``(model, scaler, validation_score, counts)``.
+    """
+    report = report or (lambda stage: None)
+    try:
+        report('scale')
+        counts = {'users': 0, 'skipped': 0, 'training_rows': 0, 'validation_rows': 0}
+        scaler = StandardScaler()
+        sample = RowSample(SKETCH_ROWS)
+        for X, _ in feature_blocks(paths, 'training', chunk_rows, counts):
+            scaler.partial_fit(X)
+            sample.add(X)
+        if not counts['training_rows']:
+            raise ValueError("No usable training data in the history files")
+
+        report('fit')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Bins from a sample, as XGBoost's own sketch of every block grows with the rows
+            bins = xgb.QuantileDMatrix(scaler.transform(sample.rows()))
+            blocks = ScaledBlocks(paths, scaler, chunk_rows, os.path.join(cache_dir, 'blocks'))
+            matrix = xgb.ExtMemQuantileDMatrix(blocks, ref=bins)
+            del bins, sample
+            counts['boosted_rows'] = matrix.num_row()
+            booster = xgb.train(BOOST_PARAMS, matrix, num_boost_round=rounds)
+            model = xgb.XGBRegressor(n_estimators=booster.num_boosted_rounds(), **BOOST_PARAMS)
+            model.load_model(bytearray(booster.save_raw('ubj')))
+            del booster, matrix, blocks  # Releases the cache files before their directory is removed
+
+        report('validate')
+        val_score = streaming_r2(model, scaler, feature_blocks(paths, 'validation', chunk_rows, counts))
+
+        report('publish')
+        model_info = {
+            'model': model,
+            'version': version,
+            'validation_score': val_score,
+            'training_date': datetime.now().strftime('%Y-%m-%d'),
+            'feature_columns': FEATURE_COLUMNS,
+            'training_size': counts['boosted_rows'],
+            'validation_size': counts['validation_rows'],
+            'training_users': counts['users'],
+            'estimator': type(model).__name__,
+            'search_trials': None,
+            'forecast_modes': ['recursive'],
+            'direct_model': None,
+            'direct_horizon': 0,
+            'direct_validation_score': None
+        }
+        publish_artifacts(model_info, scaler, model_path, scaler_path)
+
+        return model, scaler, val_score, counts
+    except Exception as e:
+        raise ValueError(f"Chunked training failed: {str(e)}")
+
+
+def main():
+    from service_module import load_service
+    app = load_service()
+
+    parser = argparse.ArgumentParser(description='Train the forecast model from history files with bounded memory')
+    parser.add_argument('paths', nargs='+', help='.jsonl/.ndjson, .csv, .parquet or .frames history files')
+    parser.add_argument('--cohort', help='publish to this cohort instead of the default model')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--rounds', type=int, default=BOOST_ROUNDS)
+    args = parser.parse_args()
+
+    model_path, scaler_path = (app.cohort_registry.artifact_paths(args.cohort) if args.cohort
+                               else (app.MODEL_PATH, app.SCALER_PATH))
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    started = datetime.now()
+    _, _, val_score, counts = train_model_from_files(
+        args.paths, model_path, scaler_path, app.MODEL_VERSION,
+        chunk_rows=args.chunk_rows, rounds=args.rounds,
+        report=lambda stage: print(f"{stage}...", flush=True)
+    )
+    print(json.dumps({**counts, 'validationScore': val_score, 'modelPath': model_path,
+                      'seconds': round((datetime.now() - started).total_seconds(), 1)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import app
+
+
+@pytest.fixture
+def sample_data():
+    """Deterministic 90 days of sample history"""
+    np.random.seed(42)
+    return app.generate_sample_data(days=90)
+
+
+@pytest.fixture
+def trained_model(tmp_path, monkeypatch, sample_data):
+    """Train a model into a temporary models/ directory and return its paths"""
+    monkeypatch.chdir(tmp_path)
+    df = app.prepare_data(sample_data)
+    model, scaler, score = app.train_model(df)
+    return {
+        'model': model,
+        'scaler': scaler,
+        'score': score,
+        'model_path': str(tmp_path / app.MODEL_PATH),
+        'scaler_path': str(tmp_path / app.SCALER_PATH),
+    }
+
+
+@pytest.fixture
+def client(trained_model, tmp_path, monkeypatch):
+    """Flask test client serving the freshly trained model"""
+    from model_registry import CohortModelRegistry, ModelRegistry
+    from precompute import PrecomputeStore
+    from result_cache import ResultCache
+    from user_state import MemoryStateStore
+
+    cache = ResultCache(app.RESULT_CACHE_MAX_BYTES, app.RESULT_CACHE_TTL)
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'])
+    registry.add_listener(lambda loaded: cache.set_namespace(loaded.identity))
+    monkeypatch.setattr(app, 'result_cache', cache)
+    monkeypatch.setattr(app, 'model_registry', registry)
+    monkeypatch.setattr(app, 'cohort_registry', CohortModelRegistry(str(tmp_path / 'cohorts'), app.COHORT_MODELS_MAX_BYTES))
+    monkeypatch.setattr(app, 'user_state_store', MemoryStateStore(app.USER_STATE_MAX_USERS))
+    monkeypatch.setattr(app, 'precompute_store', PrecomputeStore(str(tmp_path / 'precomputed.sqlite3')))
+    return app.app.test_client()
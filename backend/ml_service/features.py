@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+LAG_DAYS = (1, 2, 3, 7, 14, 30)
+ROLLING_WINDOWS = (3, 7, 14, 30)
+TREND_PERIODS = {'daily_change': 1, 'weekly_change': 7, 'monthly_change': 30}
+CALENDAR_COLUMNS = [
+    'day_of_week', 'month', 'day_of_month', 'is_weekend', 'is_holiday',
+    'is_winter', 'is_summer'
+]
+CALENDAR_START_YEAR = int(os.getenv('CALENDAR_START_YEAR', '2000'))  # First year of the precomputed calendar table
+CALENDAR_END_YEAR = int(os.getenv('CALENDAR_END_YEAR', '2050'))  # Last year; dates outside the table are computed
+HOLIDAYS_PATH = os.getenv('HOLIDAYS_PATH')  # Holiday calendar file for is_holiday (see load_holidays)
+
+# Define feature columns globally
+FEATURE_COLUMNS = CALENDAR_COLUMNS + list(TREND_PERIODS)
+
+# Add lag features
+for lag in LAG_DAYS:
+    FEATURE_COLUMNS.append(f'prev_{lag}d_footprint')
+
+# Add rolling statistics
+for window in ROLLING_WINDOWS:
+    FEATURE_COLUMNS.extend([
+        f'rolling_mean_{window}d',
+        f'rolling_std_{window}d',
+        f'rolling_min_{window}d',
+        f'rolling_max_{window}d'
+    ])
+
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+
+def load_holidays(path):
+    """Holiday dates from a local file as sorted, unique epoch days.
+
+    A ``.json`` file holds a list of ISO dates or of objects with a ``date``;
+    anything else is read as text with the date in the first comma-separated
+    field of each line, skipping blank lines, ``#`` comments and a ``date``
+    header.
+    """
+    with open(path) as f:
+        if path.endswith('.json'):
+            entries = [entry['date'] if isinstance(entry, dict) else entry for entry in json.load(f)]
+        else:
+            entries = [line.split(',', 1)[0].strip() for line in f]
+            entries = [entry for entry in entries if entry and not entry.startswith('#') and entry != 'date']
+    try:
+        days = np.array(entries, dtype='datetime64[D]')
+    except ValueError as e:
+        raise ValueError(f"Invalid holiday calendar {path}: {str(e)}")
+    return np.unique(days.astype(np.int64))
+
+
+def holiday_calendar_id(holidays=None):
+    """Short identifier of a holiday calendar: a hash of its days, or 'weekend' for the stand-in"""
+    if holidays is None:
+        return 'weekend'
+    days = np.unique(np.asarray(holidays, dtype=np.int64))
+    return hashlib.blake2b(days.tobytes(), digest_size=8).hexdigest()
+
+
+def compute_calendar_features(dates, holidays=None):
+    """Calendar features for an array of ``datetime64`` dates, computed from the dates.
+
+    ``holidays`` are the epoch days of the holiday calendar; without one,
+    Sundays and Mondays stand in as holidays.
+    """
+    days = dates.astype('datetime64[D]')
+    epoch_days = days.astype(np.int64)
+    month_start = days.astype('datetime64[M]')
+    day_of_week = (epoch_days + 3) % 7  # 1970-01-01 was a Thursday
+    month = month_start.astype(np.int64) % 12 + 1
+    if holidays is None:
+        is_holiday = (day_of_week == 0) | (day_of_week == 6)  # Weekend as holiday
+    else:
+        is_holiday = np.isin(epoch_days, holidays)
+    return {
+        'day_of_week': day_of_week,
+        'month': month,
+        'day_of_month': (days - month_start).astype(np.int64) + 1,
+        'is_weekend': (day_of_week >= 5).astype(np.int64),
+        'is_holiday': is_holiday.astype(np.int64),
+        'is_winter': np.isin(month, (12, 1, 2)).astype(np.int64),
+        'is_summer': np.isin(month, (6, 7, 8)).astype(np.int64),
+    }
+
+
+class CalendarTable:
+    """Every calendar feature for each day from ``start_year`` to ``end_year``, indexed by epoch day.
+
+    Looking up any number of dates is one gather into a (CALENDAR_COLUMNS,
+    days) table. Dates outside the range are computed by
+    compute_calendar_features with the same holidays, so they are slower but
+    never different. ``holiday_id`` identifies the holiday calendar in use.
+    """
+
+    def __init__(self, start_year, end_year, holidays=None):
+        self.holidays = holidays
+        self.holiday_id = holiday_calendar_id(holidays)
+        self.first_day = int(np.datetime64(f'{start_year:04d}-01-01', 'D').astype(np.int64))
+        last_day = int(np.datetime64(f'{end_year + 1:04d}-01-01', 'D').astype(np.int64))
+        columns = compute_calendar_features(np.arange(self.first_day, last_day).astype('datetime64[D]'), holidays)
+        self.table = np.stack([columns[name] for name in CALENDAR_COLUMNS])
+
+    def features(self, dates):
+        """Calendar features for an array of ``datetime64`` dates"""
+        index = np.asarray(dates).astype('datetime64[D]').astype(np.int64) - self.first_day
+        if len(index) and (index.min() < 0 or index.max() >= self.table.shape[1]):
+            return compute_calendar_features(np.asarray(dates), self.holidays)
+        return dict(zip(CALENDAR_COLUMNS, self.table[:, index]))
+
+
+CALENDAR = CalendarTable(CALENDAR_START_YEAR, CALENDAR_END_YEAR, load_holidays(HOLIDAYS_PATH) if HOLIDAYS_PATH else None)
+
+
+def calendar_features(dates):
+    """Calendar features for an array of ``datetime64`` dates, looked up in the calendar table"""
+    return CALENDAR.features(dates)
+
+
+def _ffill(values):
+    """Forward-fill NaNs in a 1-D array; leading NaNs stay NaN"""
+    valid = ~np.isnan(values)
+    if valid.all():
+        return values
+    index = np.where(valid, np.arange(len(values)), 0)
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+
+def _shift(values, periods):
+    shifted = np.full(len(values), np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[:-periods]
+    return shifted
+
+
+def build_feature_matrix(values, dates):
+    """Build every model feature for a daily series in a single pass.
+
+    ``values`` are the carbon footprint readings in date order and ``dates``
+    their ``datetime64`` dates. The result is a C-contiguous float matrix with
+    one row per day in ``FEATURE_COLUMNS`` order. Windowed means and standard
+    deviations come from cumulative sums; minimums and maximums from strided
+    window views. NaN handling follows the pandas ``rolling(min_periods=1)``,
+    ``shift().ffill()`` and ``diff().fillna(0)`` pipeline this replaces.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    matrix = np.empty((n, len(FEATURE_COLUMNS)), dtype=float)
+    if n == 0:
+        return matrix
+
+    for name, column in calendar_features(np.asarray(dates)).items():
+        matrix[:, COLUMN_INDEX[name]] = column
+
+    for name, periods in TREND_PERIODS.items():
+        change = values - _shift(values, periods)
+        matrix[:, COLUMN_INDEX[name]] = np.nan_to_num(change, nan=0.0)
+
+    for lag in LAG_DAYS:
+        matrix[:, COLUMN_INDEX[f'prev_{lag}d_footprint']] = _ffill(_shift(values, lag))
+
+    # Windowed sums over values centred on their mean keep the variance
+    # computation well conditioned for long histories
+    valid = ~np.isnan(values)
+    centre = values[valid].mean() if valid.any() else 0.0
+    centred = np.where(valid, values - centre, 0.0)
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    sums = np.concatenate(([0.0], np.cumsum(centred)))
+    squares = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    ends = np.arange(1, n + 1)
+
+    for window in ROLLING_WINDOWS:
+        starts = np.maximum(ends - window, 0)
+        count = counts[ends] - counts[starts]
+        total = sums[ends] - sums[starts]
+        square_total = squares[ends] - squares[starts]
+
+        # Pad the front so the first rows see partial windows (min_periods=1)
+        padded = np.concatenate((np.full(window - 1, np.nan), values))
+        windows = sliding_window_view(padded, window)
+        minimum = np.fmin.reduce(windows, axis=1)
+        maximum = np.fmax.reduce(windows, axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count + centre, np.nan)
+            variance = (square_total - total * total / count) / (count - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        # A window of identical values has exactly zero spread
+        std[minimum == maximum] = 0.0
+        std[count < 2] = 0.0
+
+        matrix[:, COLUMN_INDEX[f'rolling_mean_{window}d']] = _ffill(mean)
+        matrix[:, COLUMN_INDEX[f'rolling_std_{window}d']] = std
+        matrix[:, COLUMN_INDEX[f'rolling_min_{window}d']] = _ffill(minimum)
+        matrix[:, COLUMN_INDEX[f'rolling_max_{window}d']] = _ffill(maximum)
+
+    # Anything still missing (leading lags) falls back to the column mean
+    missing = np.isnan(matrix)
+    if missing.any():
+        columns = np.flatnonzero(missing.any(axis=0))
+        for j in columns:
+            column = matrix[:, j]
+            observed = column[~np.isnan(column)]
+            if len(observed):
+                column[np.isnan(column)] = observed.mean()
+
+    return matrix
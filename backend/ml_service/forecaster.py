@@ -0,0 +1,165 @@
+import warnings
+
+import numpy as np
+
+from features import LAG_DAYS, ROLLING_WINDOWS, calendar_features
+
+# The longest lookback is monthly_change, which needs today and the value 30 days earlier
+HISTORY_WINDOW = 31
+
+# Models are fitted on DataFrames but fed plain arrays here in FEATURE_COLUMNS order
+warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+
+
+class HistoryRing:
+    """Fixed-size ring buffer holding the most recent values of one or more series.
+
+    Every value is written twice, at ``pos`` and ``pos + capacity``, so the
+    ``n`` most recent values are always a contiguous slice and reading a
+    window never copies. All series share the write position, which keeps
+    them right-aligned; ``lengths`` tracks how long each series really is.
+    """
+
+    def __init__(self, histories, capacity=HISTORY_WINDOW):
+        self.capacity = capacity
+        self._buf = np.full((len(histories), 2 * capacity), np.nan)
+        self._pos = capacity - 1
+        self.lengths = np.zeros(len(histories), dtype=np.int64)
+        for i, history in enumerate(histories):
+            tail = np.asarray(history, dtype=float)[-capacity:]
+            start = capacity - len(tail)
+            self._buf[i, start:capacity] = tail
+            self._buf[i, capacity + start:] = tail
+            self.lengths[i] = len(history)
+
+    def append(self, values):
+        """Push one new value per series"""
+        self._pos = (self._pos + 1) % self.capacity
+        self._buf[:, self._pos] = values
+        self._buf[:, self._pos + self.capacity] = values
+        self.lengths += 1
+
+    def last(self, n):
+        """View of the ``n`` most recent values per series, oldest first"""
+        end = self._pos + self.capacity + 1
+        return self._buf[:, end - n:end]
+
+    def ago(self, lag):
+        """Value ``lag`` steps back per series (``lag=1`` is the newest)"""
+        return self._buf[:, self._pos + self.capacity + 1 - lag]
+
+
+def history_features(ring):
+    """Lag, rolling-window and trend features for the next step of every series"""
+    lengths = ring.lengths
+    newest = ring.ago(1)
+    features = {}
+
+    for lag in LAG_DAYS:
+        # Without enough history the most recent value stands in for the lag
+        features[f'prev_{lag}d_footprint'] = np.where(lengths >= lag, ring.ago(lag), newest)
+
+    for window in ROLLING_WINDOWS:
+        values = ring.last(window)
+        full = lengths >= window
+        with np.errstate(invalid='ignore'):
+            features[f'rolling_mean_{window}d'] = np.where(full, values.mean(axis=1), newest)
+            features[f'rolling_std_{window}d'] = np.where(full, values.std(axis=1, ddof=1), 0.0)
+            features[f'rolling_min_{window}d'] = np.where(full, values.min(axis=1), newest)
+            features[f'rolling_max_{window}d'] = np.where(full, values.max(axis=1), newest)
+
+    features['daily_change'] = np.where(lengths >= 2, newest - ring.ago(2), 0.0)
+    features['weekly_change'] = np.where(lengths >= 8, newest - ring.ago(8), 0.0)
+    features['monthly_change'] = np.where(lengths >= 31, newest - ring.ago(31), 0.0)
+    return features
+
+
+def scale_in_place(scaler, X):
+    """Apply the fitted scaler to ``X`` without leaving NumPy"""
+    if scaler is None:
+        # Compiled models take raw features; the scaler is folded into their thresholds
+        return X
+    # A fitted scaler was unpickled, so sklearn is already loaded and this import is a lookup
+    from sklearn.preprocessing import StandardScaler
+    if isinstance(scaler, StandardScaler):
+        if scaler.mean_ is not None:
+            X -= scaler.mean_
+        if scaler.scale_ is not None:
+            X /= scaler.scale_
+        return X
+    return scaler.transform(X)
+
+
+def _fill_features(X, column_index, dates, ring):
+    """Write the feature row for the next step of every series into ``X``"""
+    features = calendar_features(dates)
+    features.update(history_features(ring))
+    for name, values in features.items():
+        if name in column_index:
+            X[:, column_index[name]] = values
+    return features
+
+
+def forecast_recursive(histories, last_dates, model, scaler, feature_columns, days):
+    """Recursively forecast ``days`` steps for one or more series.
+
+    ``histories`` holds each series' carbon footprint values in date order and
+    ``last_dates`` the date of each series' final value. Each step builds a
+    feature row per series from the ring buffer, runs one ``model.predict``
+    over all of them and feeds the predictions back in. Cost depends only on
+    the horizon and the number of series, not on the history length.
+
+    Returns ``(dates, predictions)``: ``datetime64[D]`` and float arrays of
+    shape ``(n_series, days)``.
+    """
+    ring = HistoryRing(histories)
+    n_series = len(histories)
+    last_dates = np.asarray(last_dates, dtype='datetime64[D]')
+    steps = np.arange(1, days + 1).astype('timedelta64[D]')
+    dates = last_dates[:, None] + steps[None, :]
+
+    column_index = {name: i for i, name in enumerate(feature_columns)}
+    X = np.empty((n_series, len(feature_columns)), dtype=float)
+    predictions = np.empty((n_series, days), dtype=float)
+
+    for step in range(days):
+        features = _fill_features(X, column_index, dates[:, step], ring)
+        if step == 0:
+            missing = set(feature_columns) - set(features)
+            if missing:
+                raise ValueError(f"Missing required features: {missing}")
+
+        X_scaled = scale_in_place(scaler, X)
+        step_predictions = model.predict(X_scaled)
+        predictions[:, step] = step_predictions
+        ring.append(step_predictions)
+
+    return dates, predictions
+
+
+def forecast_direct(histories, last_dates, model, scaler, feature_columns, days):
+    """Forecast ``days`` steps for one or more series with a multi-output model.
+
+    The model maps the feature row of the first forecast day to the values of
+    days 1..H at once, so every horizon comes from a single ``model.predict``
+    over one row per series and nothing is fed back. ``days`` must not exceed
+    the H the model was trained for. Arguments and result are as for
+    forecast_recursive.
+    """
+    ring = HistoryRing(histories)
+    n_series = len(histories)
+    last_dates = np.asarray(last_dates, dtype='datetime64[D]')
+    steps = np.arange(1, days + 1).astype('timedelta64[D]')
+    dates = last_dates[:, None] + steps[None, :]
+
+    column_index = {name: i for i, name in enumerate(feature_columns)}
+    X = np.empty((n_series, len(feature_columns)), dtype=float)
+    features = _fill_features(X, column_index, dates[:, 0], ring)
+    missing = set(feature_columns) - set(features)
+    if missing:
+        raise ValueError(f"Missing required features: {missing}")
+
+    predictions = np.asarray(model.predict(scale_in_place(scaler, X)), dtype=float).reshape(n_series, -1)
+    if predictions.shape[1] < days:
+        raise ValueError(f"Direct model only forecasts {predictions.shape[1]} days")
+    return dates, predictions[:, :days]
@@ -0,0 +1,259 @@
+import cProfile
+import contextvars
+import mmap
+import multiprocessing
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+# Stages timed inside a request, in pipeline order
+STAGES = [
+    'parse', 'load_model', 'precomputed', 'cache', 'prepare_data', 'state_update', 'predict',
+    'backtest', 'detect_anomalies', 'generate_insights', 'generate_recommendations', 'serialize'
+]
+STATUS_CLASSES = ['2xx', '3xx', '4xx', '5xx']
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INPUT_POINT_BUCKETS = (7, 30, 90, 180, 365, 730, 1825, 3650, 7300)
+
+_current_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Stage durations and errors collected while one request runs"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.errors = set()
+        self.input_points = []
+        self.profiler = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """``Server-Timing`` header value, durations in milliseconds"""
+        entries = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in self.stages.items()]
+        entries.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def timed(stage):
+    """Time a block as ``stage`` of the current request; a no-op outside requests.
+
+    An exception escaping the block is counted as an error of that stage.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        timer.errors.add(stage)
+        raise
+    finally:
+        timer.add(stage, time.perf_counter() - started)
+
+
+def record_error(stage):
+    """Count a failure that a stage handled itself instead of raising"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.errors.add(stage)
+
+
+def record_input_size(points):
+    """Count the data points of one series the current request processes"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.input_points.append(points)
+
+
+def _bucket_index(buckets, value):
+    return int(np.searchsorted(buckets, value, side='left'))
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class ServiceMetrics:
+    """Request counts, stage latency histograms, stage errors and input sizes.
+
+    The label space (endpoints x stages x buckets) is fixed up front, so every
+    counter lives in one float64 array over an anonymous shared memory mapping.
+    Created before serve.py forks, the mapping and its lock are inherited by
+    every worker, and ``/metrics`` reports totals for the whole server no
+    matter which worker answers the scrape.
+    """
+
+    def __init__(self, endpoints, latency_buckets=LATENCY_BUCKETS, input_buckets=INPUT_POINT_BUCKETS):
+        self.endpoints = list(endpoints)
+        self.latency_buckets = np.asarray(latency_buckets, dtype=float)
+        self.input_buckets = np.asarray(input_buckets, dtype=float)
+        n_endpoints = len(self.endpoints)
+        n_latency = len(latency_buckets) + 1
+        n_input = len(input_buckets) + 1
+        shapes = {
+            'requests': (n_endpoints, len(STATUS_CLASSES)),
+            'request_buckets': (n_endpoints, n_latency),
+            'request_sum': (n_endpoints,),
+            'stage_buckets': (n_endpoints, len(STAGES), n_latency),
+            'stage_sum': (n_endpoints, len(STAGES)),
+            'stage_errors': (n_endpoints, len(STAGES)),
+            'input_buckets': (n_endpoints, n_input),
+            'input_sum': (n_endpoints,),
+        }
+        size = sum(int(np.prod(shape)) for shape in shapes.values())
+        self._memory = mmap.mmap(-1, size * 8)
+        flat = np.frombuffer(self._memory, dtype=np.float64)
+        self._arrays = {}
+        offset = 0
+        for name, shape in shapes.items():
+            count = int(np.prod(shape))
+            self._arrays[name] = flat[offset:offset + count].reshape(shape)
+            offset += count
+        self._lock = multiprocessing.Lock()
+        self._endpoint_index = {endpoint: i for i, endpoint in enumerate(self.endpoints)}
+        self._stage_index = {stage: i for i, stage in enumerate(STAGES)}
+
+    def observe(self, timer, status):
+        """Fold a finished request into the shared counters"""
+        e = self._endpoint_index.get(timer.endpoint)
+        if e is None:
+            return
+        a = self._arrays
+        elapsed = timer.elapsed()
+        with self._lock:
+            a['requests'][e, min(max(status // 100 - 2, 0), 3)] += 1
+            a['request_buckets'][e, _bucket_index(self.latency_buckets, elapsed)] += 1
+            a['request_sum'][e] += elapsed
+            for stage, seconds in timer.stages.items():
+                s = self._stage_index[stage]
+                a['stage_buckets'][e, s, _bucket_index(self.latency_buckets, seconds)] += 1
+                a['stage_sum'][e, s] += seconds
+            for stage in timer.errors:
+                a['stage_errors'][e, self._stage_index[stage]] += 1
+            for points in timer.input_points:
+                a['input_buckets'][e, _bucket_index(self.input_buckets, points)] += 1
+                a['input_sum'][e] += points
+
+    def _histogram(self, lines, name, labels, counts, total, buckets):
+        cumulative = np.cumsum(counts)
+        for bound, count in zip(list(buckets) + ['+Inf'], cumulative):
+            le = bound if bound == '+Inf' else f'{bound:g}'
+            lines.append(f'{name}_bucket{{{_labels(**labels, le=le)}}} {count:g}')
+        lines.append(f'{name}_sum{{{_labels(**labels)}}} {total:.6f}')
+        lines.append(f'{name}_count{{{_labels(**labels)}}} {cumulative[-1]:g}')
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            a = {name: array.copy() for name, array in self._arrays.items()}
+
+        lines = [
+            '# HELP ml_requests_total Requests handled, by endpoint and status class',
+            '# TYPE ml_requests_total counter',
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            for c, status in enumerate(STATUS_CLASSES):
+                lines.append(f'ml_requests_total{{{_labels(endpoint=endpoint, status=status)}}} {a["requests"][e, c]:g}')
+
+        lines += [
+            '# HELP ml_request_duration_seconds Time from request start to response',
+            '# TYPE ml_request_duration_seconds histogram',
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            self._histogram(lines, 'ml_request_duration_seconds', {'endpoint': endpoint},
+                            a['request_buckets'][e], a['request_sum'][e], self.latency_buckets)
+
+        lines += [
+            '# HELP ml_stage_duration_seconds Time spent in each stage per request',
+            '# TYPE ml_stage_duration_seconds histogram',
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            for s, stage in enumerate(STAGES):
+                if a['stage_buckets'][e, s].any():
+                    self._histogram(lines, 'ml_stage_duration_seconds', {'endpoint': endpoint, 'stage': stage},
+                                    a['stage_buckets'][e, s], a['stage_sum'][e, s], self.latency_buckets)
+
+        lines += [
+            '# HELP ml_stage_errors_total Requests in which a stage failed',
+            '# TYPE ml_stage_errors_total counter',
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            for s, stage in enumerate(STAGES):
+                if a['stage_errors'][e, s]:
+                    lines.append(f'ml_stage_errors_total{{{_labels(endpoint=endpoint, stage=stage)}}} {a["stage_errors"][e, s]:g}')
+
+        lines += [
+            '# HELP ml_input_points Data points per submitted series',
+            '# TYPE ml_input_points histogram',
+        ]
+        for e, endpoint in enumerate(self.endpoints):
+            if a['input_buckets'][e].any():
+                self._histogram(lines, 'ml_input_points', {'endpoint': endpoint},
+                                a['input_buckets'][e], a['input_sum'][e], self.input_buckets)
+        return '\n'.join(lines) + '\n'
+
+
+class RequestInstrumentation:
+    """Starts and finishes a RequestTimer around each request.
+
+    ``profile_sample_rate`` of requests run under cProfile; those slower than
+    ``profile_slow_seconds`` are dumped to ``profile_dir`` as pstats files.
+    """
+
+    def __init__(self, metrics, server_timing=False, profile_sample_rate=0.0,
+                 profile_slow_seconds=1.0, profile_dir='profiles'):
+        self.metrics = metrics
+        self.server_timing = server_timing
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_slow_seconds = profile_slow_seconds
+        self.profile_dir = profile_dir
+
+    def start(self, endpoint):
+        timer = RequestTimer(endpoint)
+        if self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                timer.profiler = profiler
+            except ValueError:
+                pass  # Another profiler is already active in this process
+        return timer, _current_timer.set(timer)
+
+    def finish(self, timer, token, response):
+        """Record the request, and return the response with Server-Timing if enabled"""
+        _current_timer.reset(token)
+        if timer.profiler is not None:
+            timer.profiler.disable()
+            if timer.elapsed() >= self.profile_slow_seconds:
+                self._dump_profile(timer)
+        if response is not None:
+            self.metrics.observe(timer, response.status_code)
+            if self.server_timing:
+                response.headers['Server-Timing'] = timer.server_timing()
+        return response
+
+    def _dump_profile(self, timer):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', timer.endpoint).strip('_') or 'root'
+            stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+            name = f'{stamp}-{slug}-{os.getpid()}-{timer.elapsed() * 1000:.0f}ms.prof'
+            timer.profiler.dump_stats(os.path.join(self.profile_dir, name))
+        except Exception as e:
+            print(f"Profile dump error: {str(e)}")
@@ -0,0 +1,368 @@
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import OrderedDict
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+import features
+from tree_compiler import compile_gradient_boosting
+
+COHORT_NAME_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.=-]{0,63}')
+
+
+def file_checksum(path):
+    """blake2b digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def memory_size(obj, _seen=None):
+    """Approximate private bytes held in memory by ``obj`` and everything it references.
+
+    Counts array buffers, sklearn tree node tables and XGBoost boosters as
+    well as plain object overhead. Memory-mapped arrays live in the shared
+    page cache and count as nothing.
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (np.memmap, type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)):
+        return 0
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes if obj.flags.owndata else memory_size(obj.base, seen)
+        if obj.dtype == object:
+            size += sum(memory_size(item, seen) for item in obj.flat)
+        return size
+    if type(obj).__name__ == 'Tree' and hasattr(obj, 'node_count'):
+        # sklearn trees keep their nodes in C buffers that only __getstate__ exposes
+        state = obj.__getstate__()
+        return sys.getsizeof(obj) + state['nodes'].nbytes + state['values'].nbytes
+    if hasattr(obj, 'save_raw'):
+        # An XGBoost Booster: its trees are native memory, about the size of the raw model
+        return sys.getsizeof(obj) + len(obj.save_raw('ubj'))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(memory_size(key, seen) + memory_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(memory_size(item, seen) for item in obj)
+    elif not isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        if hasattr(obj, '__dict__'):
+            size += memory_size(vars(obj), seen)
+        slots = getattr(type(obj), '__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            size += memory_size(getattr(obj, name, None), seen)
+    return size
+
+
+def _dump_next_to(obj, path):
+    """Serialize ``obj`` to a temporary file in the destination directory"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    joblib.dump(obj, tmp_path)
+    return tmp_path
+
+
+def publish_artifacts(model_info, scaler, model_path, scaler_path):
+    """Atomically replace the serving model and scaler.
+
+    Both artifacts are written to temporary files and renamed into place. The
+    model records the checksum of the scaler it was trained with and is renamed
+    first, so a registry that catches the two renames half-way sees a checksum
+    mismatch and keeps serving the previous pair instead of mixing them. It
+    also records the holiday calendar its is_holiday feature was built with.
+    """
+    scaler_tmp = _dump_next_to(scaler, scaler_path)
+    try:
+        model_info = dict(model_info, scaler_checksum=file_checksum(scaler_tmp),
+                          holiday_calendar=features.CALENDAR.holiday_id)
+        model_tmp = _dump_next_to(model_info, model_path)
+    except Exception:
+        os.remove(scaler_tmp)
+        raise
+    os.replace(model_tmp, model_path)
+    os.replace(scaler_tmp, scaler_path)
+
+
+class LoadedModel:
+    """Immutable snapshot of a model/scaler pair loaded from disk"""
+
+    __slots__ = ('model', 'scaler', 'validation_score', 'version', 'training_date',
+                 'loaded_at', 'signature', 'compiled', 'direct_model', 'direct_horizon')
+
+    def __init__(self, model, scaler, validation_score, version, training_date, loaded_at, signature,
+                 compiled=None, direct_model=None, direct_horizon=0):
+        self.model = model
+        self.direct_model = direct_model
+        self.direct_horizon = direct_horizon if direct_model is not None else 0
+        self.compiled = compiled
+        self.scaler = scaler
+        self.validation_score = validation_score
+        self.version = version
+        self.training_date = training_date
+        self.loaded_at = loaded_at
+        self.signature = signature
+
+    @property
+    def identity(self):
+        """Identifier for this artifact that is stable across worker processes"""
+        digest = hashlib.blake2b(repr(self.signature).encode(), digest_size=8).hexdigest()
+        return f"{self.version}-{digest}"
+
+    def serving_model(self):
+        """The (model, scaler) pair to predict with: the compiled trees when available"""
+        if self.compiled is not None:
+            return self.compiled, None
+        return self.model, self.scaler
+
+    def memory_bytes(self):
+        """Private memory held by this snapshot's models, compiled trees and scaler"""
+        seen = set()
+        return sum(memory_size(part, seen) for part in (self.model, self.compiled, self.direct_model, self.scaler))
+
+    def metadata(self):
+        """Describe the loaded artifact for response payloads"""
+        return {
+            'version': self.version,
+            'trainingDate': self.training_date,
+            'loadedAt': self.loaded_at.isoformat(timespec='seconds'),
+            'forecastModes': ['recursive', 'direct'] if self.direct_model is not None else ['recursive'],
+            'directHorizon': self.direct_horizon,
+        }
+
+
+class ModelRegistry:
+    """Process-wide model cache that hot-reloads artifacts when they change on disk.
+
+    Artifacts are unpickled once and kept in memory. Every ``check_interval``
+    seconds the registry stats both files; when their mtime or size changes it
+    loads the new pair and swaps the snapshot reference in one assignment.
+    Requests that already hold the previous snapshot keep using it until they
+    finish, so a reload never interrupts in-flight work.
+
+    With ``mmap_mode='r'`` NumPy arrays inside the artifacts are memory-mapped
+    read-only, so processes loading the same file share those pages through the
+    OS cache. Tree ensembles copy their nodes while unpickling, which is why
+    serve.py loads the model once before forking its workers. A model trained
+    with a different holiday calendar than the one loaded is refused.
+    """
+
+    def __init__(self, model_path, scaler_path, check_interval=5.0, mmap_mode=None):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._current = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def _signature(self):
+        """Return the (mtime, size) of both artifacts, or None if either is missing"""
+        try:
+            model_stat = os.stat(self.model_path)
+            scaler_stat = os.stat(self.scaler_path)
+        except OSError:
+            return None
+        return (model_stat.st_mtime_ns, model_stat.st_size,
+                scaler_stat.st_mtime_ns, scaler_stat.st_size)
+
+    def _load(self, signature):
+        model_info = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+        if model_info is None:
+            raise ValueError("Model artifacts are empty")
+        expected_checksum = model_info.get('scaler_checksum')
+        if expected_checksum is not None and expected_checksum != file_checksum(self.scaler_path):
+            raise ValueError("Scaler does not match model (publish in progress)")
+        # Models published before calendars were recorded used the weekend stand-in
+        holiday_id = model_info.get('holiday_calendar', features.holiday_calendar_id())
+        if holiday_id != features.CALENDAR.holiday_id:
+            raise ValueError(f"Model was trained with holiday calendar {holiday_id}, "
+                             f"but {features.CALENDAR.holiday_id} is loaded (check HOLIDAYS_PATH)")
+        scaler = joblib.load(self.scaler_path, mmap_mode=self.mmap_mode)
+        if scaler is None:
+            raise ValueError("Model artifacts are empty")
+        try:
+            compiled = compile_gradient_boosting(model_info['model'], scaler)
+        except ValueError:
+            compiled = None  # Not a compilable estimator; serve it through sklearn
+        return LoadedModel(
+            model=model_info['model'],
+            compiled=compiled,
+            scaler=scaler,
+            validation_score=model_info.get('validation_score'),
+            version=model_info.get('version'),
+            training_date=model_info.get('training_date'),
+            loaded_at=datetime.now(),
+            signature=signature,
+            direct_model=model_info.get('direct_model'),
+            direct_horizon=model_info.get('direct_horizon') or 0
+        )
+
+    def add_listener(self, callback):
+        """Register ``callback(snapshot)`` to run after a new model is swapped in"""
+        self._listeners.append(callback)
+
+    def get(self):
+        """Return the current snapshot, reloading it first if the files changed"""
+        now = time.monotonic()
+        if self._current is not None and now - self._last_check < self.check_interval:
+            return self._current
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._current is not None and now - self._last_check < self.check_interval:
+                return self._current
+            self._last_check = now
+
+            signature = self._signature()
+            if signature is None or (self._current is not None and signature == self._current.signature):
+                return self._current
+
+            try:
+                snapshot = self._load(signature)
+            except Exception as e:
+                # Keep serving the previous model if the new artifact is unreadable
+                # (for example while it is still being written)
+                print(f"Error loading model: {str(e)}")
+                return self._current
+
+            self._current = snapshot
+
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Model reload listener error: {str(e)}")
+        return snapshot
+
+    def reload(self):
+        """Force a stat of the artifacts on the next ``get`` call"""
+        self._last_check = 0.0
+        return self.get()
+
+
+def cohort_bucket(key, buckets):
+    """Stable ``bucket-<n>`` cohort name for an arbitrary key, such as a user id"""
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return f"bucket-{int.from_bytes(digest, 'big') % buckets}"
+
+
+class _ResidentCohort:
+    __slots__ = ('registry', 'signature', 'size')
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.signature = None
+        self.size = 0
+
+
+class CohortModelRegistry:
+    """Lazily loaded per-cohort models under a resident memory budget.
+
+    A cohort's artifacts live in ``<directory>/<cohort>/`` under the same file
+    names as the global model, and are loaded on first use through their own
+    ModelRegistry, so they hot-reload the same way. Loading memory-maps the
+    arrays read-only by default, letting workers share them through the page
+    cache. A resident model is charged the private memory it holds (see
+    ``LoadedModel.memory_bytes``): unpickled trees, compiled arrays and the
+    direct model, but not memory-mapped arrays. When the total exceeds
+    ``max_bytes`` the least recently used cohorts are dropped (the most
+    recent one always stays). Requests holding an evicted snapshot keep
+    using it until they finish.
+    """
+
+    def __init__(self, directory, max_bytes, model_name='model.joblib', scaler_name='scaler.joblib',
+                 check_interval=5.0, mmap_mode='r'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.model_name = model_name
+        self.scaler_name = scaler_name
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._resident = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def artifact_paths(self, cohort):
+        """Model and scaler paths of ``cohort``; raises ValueError for unsafe names"""
+        if not isinstance(cohort, str) or not COHORT_NAME_PATTERN.fullmatch(cohort):
+            raise ValueError(f"Invalid cohort name: {cohort!r}")
+        cohort_dir = os.path.join(self.directory, cohort)
+        return os.path.join(cohort_dir, self.model_name), os.path.join(cohort_dir, self.scaler_name)
+
+    def get(self, cohort):
+        """The cohort's current LoadedModel, or None if it has no usable artifacts"""
+        model_path, scaler_path = self.artifact_paths(cohort)
+        with self._lock:
+            entry = self._resident.get(cohort)
+            if entry is not None:
+                self._resident.move_to_end(cohort)
+        if entry is None:
+            if not os.path.exists(model_path):
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry = _ResidentCohort(ModelRegistry(model_path, scaler_path, check_interval=self.check_interval,
+                                                  mmap_mode=self.mmap_mode))
+            with self._lock:
+                # Another thread may have started loading the same cohort meanwhile
+                entry = self._resident.setdefault(cohort, entry)
+
+        loaded = entry.registry.get()
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+                if self._resident.get(cohort) is entry and entry.signature is None:
+                    del self._resident[cohort]
+                return None
+            if loaded.signature == entry.signature:
+                self.hits += 1
+                return loaded
+            # First load or hot reload: charge the new snapshot's memory
+            self.loads += 1
+            size = loaded.memory_bytes()
+            if self._resident.get(cohort) is entry:
+                self._bytes += size - entry.size
+                entry.size = size
+            entry.signature = loaded.signature
+            self._evict()
+        return loaded
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._resident) > 1:
+            _, entry = self._resident.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'maxBytes': self.max_bytes,
+                'residentBytes': self._bytes,
+                'resident': {cohort: entry.size for cohort, entry in self._resident.items()},
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,177 @@
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from xgboost import XGBRegressor
+
+# Each round keeps the best 1/HALVING_FACTOR of the candidates and gives them
+# HALVING_FACTOR times more samples and trees
+HALVING_FACTOR = 3
+MAX_SPLITS = 5
+MIN_ROWS_PER_SPLIT = 10
+LATENCY_PROBES = 7
+
+
+def default_candidates():
+    """Candidate estimators compared by the budgeted search.
+
+    Ensembles are listed at their full ``n_estimators``; earlier rounds scale
+    that down. The GradientBoosting entry mirrors the one in train_model.
+    """
+    return [
+        ('linear', LinearRegression()),
+        ('rf_depth10', RandomForestRegressor(n_estimators=200, max_depth=10, min_samples_leaf=2, random_state=42)),
+        ('rf_full', RandomForestRegressor(n_estimators=200, max_depth=None, min_samples_leaf=1, random_state=42)),
+        ('gbr', GradientBoostingRegressor(
+            n_estimators=200, learning_rate=0.05, max_depth=4, min_samples_split=5,
+            min_samples_leaf=2, subsample=0.8, random_state=42
+        )),
+        ('gbr_shallow', GradientBoostingRegressor(
+            n_estimators=200, learning_rate=0.1, max_depth=2, subsample=0.8, random_state=42
+        )),
+        ('xgb', XGBRegressor(n_estimators=200, learning_rate=0.05, max_depth=4, subsample=0.8,
+                             n_jobs=1, random_state=42)),
+        ('xgb_shallow', XGBRegressor(n_estimators=200, learning_rate=0.1, max_depth=2, subsample=0.8,
+                                     n_jobs=1, random_state=42)),
+    ]
+
+
+def _tail(data, rows):
+    """The most recent ``rows`` rows, keeping time order"""
+    return data.iloc[-rows:] if hasattr(data, 'iloc') else data[-rows:]
+
+
+def _rows(data, index):
+    return data.iloc[index] if hasattr(data, 'iloc') else data[index]
+
+
+def _with_resources(estimator, fraction):
+    """Clone ``estimator`` with its tree count scaled to ``fraction`` of the full amount"""
+    candidate = clone(estimator)
+    params = candidate.get_params()
+    if 'n_estimators' in params and params['n_estimators']:
+        candidate.set_params(n_estimators=max(10, int(round(params['n_estimators'] * fraction))))
+    return candidate
+
+
+def single_row_latency(model, X):
+    """Median seconds for a one-row predict, the call pattern of recursive forecasting"""
+    row = _rows(X, slice(-1, None))
+    timings = []
+    for _ in range(LATENCY_PROBES):
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def evaluate_candidate(estimator, X, y, n_splits, measure_latency=single_row_latency):
+    """Time-ordered cross-validation of one configuration.
+
+    ``measure_latency(model, X)`` gives the single-row prediction seconds of
+    the model fitted on the last fold.
+    """
+    scores = []
+    fit_time = 0.0
+    predict_time = 0.0
+    predicted_rows = 0
+    model = None
+    for train_index, test_index in TimeSeriesSplit(n_splits=n_splits).split(X):
+        model = clone(estimator)
+        started = time.perf_counter()
+        model.fit(_rows(X, train_index), _rows(y, train_index))
+        fit_time += time.perf_counter() - started
+
+        X_test = _rows(X, test_index)
+        started = time.perf_counter()
+        predictions = model.predict(X_test)
+        predict_time += time.perf_counter() - started
+        predicted_rows += len(test_index)
+        scores.append(r2_score(_rows(y, test_index), predictions))
+
+    return {
+        'score': float(np.mean(scores)),
+        'fit_seconds': fit_time,
+        'batch_latency_per_row_ms': predict_time / predicted_rows * 1000,
+        'single_row_latency_ms': measure_latency(model, X) * 1000,
+    }
+
+
+class _Budget:
+    def __init__(self, seconds, kind):
+        if kind not in ('wall', 'cpu'):
+            raise ValueError("Budget kind must be 'wall' or 'cpu'")
+        self.seconds = seconds
+        self.clock = time.perf_counter if kind == 'wall' else time.process_time
+        self.started = self.clock()
+
+    def used(self):
+        return self.clock() - self.started
+
+    def exhausted(self):
+        return self.seconds is not None and self.used() >= self.seconds
+
+
+def budgeted_model_search(X, y, candidates=None, budget_seconds=None, budget_kind='wall',
+                          latency_weight=0.0, factor=HALVING_FACTOR, measure_latency=single_row_latency):
+    """Successive-halving model search with time-ordered folds and a time budget.
+
+    Every candidate starts on the most recent slice of the data with a
+    fraction of its trees. After each round only the best ``1/factor`` by
+    objective survive, and the next round gives them ``factor`` times more
+    samples and trees, until one candidate remains or the full data is used.
+    The objective is the mean ``TimeSeriesSplit`` R² minus ``latency_weight``
+    times the single-row prediction latency in milliseconds, as measured by
+    ``measure_latency(model, X)`` in seconds. Once
+    ``budget_seconds`` of wall or CPU time is spent no new evaluations start,
+    and the best candidate at the largest resource level reached wins.
+
+    Returns ``(estimator, score, trials)``. The estimator is an unfitted clone
+    of the winner at full size; ``trials`` records every evaluation.
+    """
+    try:
+        candidates = candidates if candidates is not None else default_candidates()
+        budget = _Budget(budget_seconds, budget_kind)
+        n_rows = len(y)
+        n_rounds = max(1, int(np.ceil(np.log(len(candidates)) / np.log(factor))) + 1)
+        min_rows = MIN_ROWS_PER_SPLIT * 3
+
+        survivors = list(candidates)
+        trials = []
+        best = None
+        for round_index in range(n_rounds):
+            fraction = factor ** (round_index - n_rounds + 1)
+            rows = n_rows if round_index == n_rounds - 1 else max(min_rows, int(n_rows * fraction))
+            rows = min(rows, n_rows)
+            n_splits = max(2, min(MAX_SPLITS, rows // MIN_ROWS_PER_SPLIT - 1))
+            X_round, y_round = _tail(X, rows), _tail(y, rows)
+
+            results = []
+            for name, estimator in survivors:
+                if budget.exhausted():
+                    break
+                sized = _with_resources(estimator, fraction)
+                metrics = evaluate_candidate(sized, X_round, y_round, n_splits, measure_latency)
+                metrics['objective'] = metrics['score'] - latency_weight * metrics['single_row_latency_ms']
+                trials.append(dict(metrics, model=name, round=round_index, rows=rows,
+                                   n_estimators=sized.get_params().get('n_estimators')))
+                results.append((metrics['objective'], metrics['score'], name, estimator))
+
+            if results:
+                results.sort(key=lambda result: result[0], reverse=True)
+                best = results[0]
+            if budget.exhausted() or len(results) <= 1 or rows >= n_rows:
+                break
+            keep = max(1, len(results) // factor)
+            survivors = [(name, estimator) for _, _, name, estimator in results[:keep]]
+
+        if best is None:
+            raise ValueError("Search budget exhausted before any candidate was evaluated")
+        _, score, name, estimator = best
+        return clone(estimator), score, trials
+    except Exception as e:
+        raise ValueError(f"Model search failed: {str(e)}")
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from batch_pool import map_batches
+from result_cache import make_cache_key
+from service_module import load_service
+
+BATCH_USERS = 256  # Users per pool task; each batch is forecast with one model call per horizon step
+
+
+def data_version(historical_data):
+    """Content hash of a user's history, the version of users listed without a ``dataVersion``"""
+    return make_cache_key('history', historical_data)
+
+
+class PrecomputeStore:
+    """Precomputed /predictions payloads in a SQLite file, one row per user.
+
+    A row records the data version, model identity and horizon it was computed
+    for, and is only served when all three match the request. The file is
+    created by the first write, so a worker that has never seen a precompute
+    run pays one ``stat`` per lookup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS forecasts ('
+                'user_id TEXT PRIMARY KEY, data_version TEXT NOT NULL, model_identity TEXT NOT NULL, '
+                'days INTEGER NOT NULL, payload BLOB NOT NULL, computed_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def get(self, user_id, version, model_identity, days):
+        """Stored JSON payload bytes if the user's entry is current, else None"""
+        row = None
+        if getattr(self._local, 'conn', None) is not None or os.path.exists(self.path):
+            row = self._connection().execute(
+                'SELECT data_version, model_identity, days, payload FROM forecasts WHERE user_id = ?',
+                (user_id,)
+            ).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        if tuple(row[:3]) != (version, model_identity, days):
+            self._count('stale')
+            return None
+        self._count('hits')
+        return bytes(row[3])
+
+    def put_many(self, entries):
+        """Store ``(user_id, version, model_identity, days, payload)`` entries in one transaction"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO forecasts '
+                '(user_id, data_version, model_identity, days, payload, computed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                [(*entry, now) for entry in entries]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def put(self, user_id, version, model_identity, days, payload):
+        self.put_many([(user_id, version, model_identity, days, payload)])
+
+    def stats(self):
+        entries = 0
+        if os.path.exists(self.path):
+            entries = self._connection().execute('SELECT COUNT(*) FROM forecasts').fetchone()[0]
+        return {'path': self.path, 'entries': entries, 'hits': self.hits,
+                'misses': self.misses, 'stale': self.stale}
+
+
+def compute_batch(users, days):
+    """Pool entry point: payloads for ``(user_id, historicalData, version)`` tuples.
+
+    Returns the store entries and ``(user_id, error)`` for users whose history
+    could not be used.
+    """
+    app = load_service()  # Imported here so the pool workers load the service the same way it serves
+
+    loaded = app.model_registry.get()
+    if loaded is None:
+        raise RuntimeError('Model is not available')
+    model, scaler = loaded.serving_model()
+
+    prepared = []
+    failures = []
+    for user_id, history, version in users:
+        try:
+            prepared.append((user_id, version or data_version(history), app.prepare_data(history)))
+        except Exception as e:
+            failures.append((user_id, str(e)))
+    if not prepared:
+        return [], failures
+
+    forecasts = app.predict_future_batch([df for _, _, df in prepared], model, scaler, days)
+    entries = []
+    for (user_id, version, df), forecast in zip(prepared, forecasts):
+        try:
+            payload = app.prediction_payload(loaded, forecast, app.analyze_history(df))
+            entries.append((user_id, version, loaded.identity, days, app.app.json.dumps(payload).encode()))
+        except Exception as e:
+            failures.append((user_id, str(e)))
+    return entries, failures
+
+
+def precompute_forecasts(histories, store, days, workers=1, batch_users=BATCH_USERS):
+    """Compute and store payloads for every ``(user_id, historicalData, version)``.
+
+    Batches of ``batch_users`` run through map_batches in a pool of
+    ``workers`` (in this process when 0), so the input is streamed rather
+    than loaded at once. The parent is the only writer to ``store``.
+    """
+    started = time.perf_counter()
+    report = {'users': 0, 'stored': 0, 'failed': 0, 'errors': []}
+    for batch, (entries, failures) in map_batches(compute_batch, histories, batch_users, workers, days):
+        store.put_many([(str(user_id), *rest) for user_id, *rest in entries])
+        report['users'] += len(batch)
+        report['stored'] += len(entries)
+        report['failed'] += len(failures)
+        report['errors'].extend(failures[:10 - len(report['errors'])])
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def read_users(path):
+    """``(userId, historicalData, dataVersion)`` from JSON Lines, one user per line"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                user = json.loads(line)
+                yield user['userId'], user['historicalData'], user.get('dataVersion')
+
+
+def main():
+    app = load_service()
+
+    parser = argparse.ArgumentParser(description='Precompute /predictions payloads for every user')
+    parser.add_argument('users', help='JSON Lines file of {"userId", "historicalData", "dataVersion"?} objects')
+    parser.add_argument('--days', type=int, default=app.DEFAULT_FORECAST_DAYS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-users', type=int, default=BATCH_USERS)
+    parser.add_argument('--store', default=app.PRECOMPUTE_PATH)
+    args = parser.parse_args()
+
+    report = precompute_forecasts(read_users(args.users), PrecomputeStore(args.store), args.days,
+                                  workers=args.workers, batch_users=args.batch_users)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def _encode_value(value):
+    """JSON stand-in for values json can't encode; arrays are hashed by content"""
+    if hasattr(value, 'tobytes') and hasattr(value, 'dtype'):
+        digest = hashlib.blake2b(value.tobytes(), digest_size=20).hexdigest()
+        return {'array': str(value.dtype), 'shape': list(value.shape), 'digest': digest}
+    return str(value)
+
+
+def make_cache_key(namespace, historical_data, **params):
+    """Content hash of the normalized request inputs within a model namespace"""
+    normalized = json.dumps(
+        {'historicalData': historical_data, 'params': params},
+        sort_keys=True,
+        separators=(',', ':'),
+        default=_encode_value
+    )
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(namespace.encode())
+    digest.update(b'\0')
+    digest.update(normalized.encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Byte-budgeted LRU cache of serialized responses with a TTL and optional disk tier.
+
+    Entries live in a namespace, normally the identity of the loaded model.
+    ``set_namespace`` drops every in-memory entry and removes the on-disk
+    entries of other namespaces, so switching models invalidates stale results
+    while a worker restarting on the same model keeps its disk entries.
+    """
+
+    def __init__(self, max_bytes, ttl, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.namespace = ''
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, self.namespace or 'default', f'{key}.json')
+
+    def _drop(self, key):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def _store(self, key, value, stored_at):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, stored_at)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached bytes for ``key`` or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop(key)
+                self.expirations += 1
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            if len(value) <= self.max_bytes:
+                self._store(key, value, now)
+        return value
+
+    def put(self, key, value):
+        """Cache serialized bytes for ``key``"""
+        now = time.time()
+        with self._lock:
+            if len(value) <= self.max_bytes:
+                self._store(key, value, now)
+        self._write_disk(key, value)
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so other workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Result cache write error: {str(e)}")
+
+    def set_namespace(self, namespace):
+        """Switch to a new namespace and invalidate everything cached under others"""
+        with self._lock:
+            self.namespace = namespace
+            self._entries.clear()
+            self._bytes = 0
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return
+        for name in os.listdir(self.disk_dir):
+            if name != namespace:
+                shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'ttlSeconds': self.ttl,
+                'diskEnabled': bool(self.disk_dir)
+            }
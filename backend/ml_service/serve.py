@@ -0,0 +1,111 @@
+import gc
+import os
+import signal
+import socket
+import time
+
+from werkzeug.serving import make_server
+
+import app as service
+from user_state import create_state_store
+
+HOST = os.getenv('ML_SERVICE_HOST', '127.0.0.1')
+PORT = int(os.getenv('ML_SERVICE_PORT', '5001'))
+WORKERS = int(os.getenv('ML_WORKERS', str(os.cpu_count() or 1)))
+LISTEN_BACKLOG = 1024
+RESTART_DELAY = 1.0  # Seconds to wait before replacing a worker that died
+
+
+def bind_socket(host, port):
+    """Listening socket created once in the supervisor and inherited by every worker"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, host, port):
+    """Serve requests from the shared socket until terminated"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Threads keep the gateway's pooled keep-alive connections from pinning a worker
+    server = make_server(host, port, service.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def spawn_worker(sock, host, port):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, host, port)
+        finally:
+            # Never fall back into the supervisor loop in the child
+            os._exit(0)
+    return pid
+
+
+def serve(host=HOST, port=PORT, workers=WORKERS):
+    """Pre-fork server: load once, then run ``workers`` processes on one socket.
+
+    The supervisor imports the service, loads and compiles the model and runs
+    the warm-up forecast before forking, so every worker starts ready and
+    shares those pages copy-on-write instead of unpickling its own copy.
+    Requests for one user can reach any worker, so the per-process memory
+    user state store is replaced with the SQLite one they all share.
+    ``gc.freeze`` moves everything allocated so far out of the collector's
+    reach, which stops collections in the workers from dirtying shared pages.
+    The kernel spreads connections across the workers' ``accept`` calls, so
+    CPU-bound requests run in parallel on separate cores. Workers that die
+    are replaced; SIGTERM or SIGINT stops them all.
+    """
+    try:
+        print(f"Warm-up finished: {service.warm_up()}")
+    except Exception as e:
+        print(f"Warm-up failed, serving without it: {str(e)}")
+
+    sock = bind_socket(host, port)
+    if workers <= 1 or not hasattr(os, 'fork'):
+        make_server(host, port, service.app, threaded=True, fd=sock.fileno()).serve_forever()
+        return
+
+    if service.USER_STATE_BACKEND == 'memory':
+        print(f"USER_STATE_BACKEND=memory is per process; sharing {service.USER_STATE_PATH} "
+              f"between the {workers} workers instead")
+        service.user_state_store = create_state_store('sqlite', path=service.USER_STATE_PATH)
+
+    gc.freeze()
+    children = {spawn_worker(sock, host, port) for _ in range(workers)}
+    print(f"Serving on {host}:{port} with {workers} workers")
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                children.add(spawn_worker(sock, host, port))
+    sock.close()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,46 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.realpath(__file__))
+SERVICE_PATH = os.path.join(SERVICE_DIR, 'app.py')
+FALLBACK_NAME = 'ml_service_app'  # Module name used when ``app`` on sys.path is another file, such as the gateway's
+
+
+def _is_service(module):
+    path = getattr(module, '__file__', None)
+    return path is not None and os.path.realpath(path) == SERVICE_PATH
+
+
+def load_service():
+    """The ML service's app module, whatever else is called ``app`` on sys.path.
+
+    Pool workers and command line tools import the service lazily, and a bare
+    ``import app`` picks the first ``app.py`` on sys.path, which is the
+    gateway's when backend/ is on it. A service module that is already
+    imported is reused, so in-process callers share its state; otherwise it
+    is imported as ``app`` when that resolves to this directory, or loaded
+    from its file as ``ml_service_app``.
+    """
+    for name in ('app', FALLBACK_NAME):
+        module = sys.modules.get(name)
+        if module is not None and _is_service(module):
+            return module
+
+    if SERVICE_DIR not in sys.path:
+        sys.path.append(SERVICE_DIR)  # For the service's own imports of its sibling modules
+    if 'app' not in sys.modules:
+        spec = importlib.util.find_spec('app')
+        if spec is not None and spec.origin and os.path.realpath(spec.origin) == SERVICE_PATH:
+            return importlib.import_module('app')
+
+    spec = importlib.util.spec_from_file_location(FALLBACK_NAME, SERVICE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[FALLBACK_NAME] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[FALLBACK_NAME]
+        raise
+    return module
@@ -0,0 +1,113 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+SOURCE_COLUMNS = ('transportation', 'energy', 'waste', 'food')
+WEEKEND_DAYS = (5, 6)
+
+HistorySummary = namedtuple('HistorySummary', [
+    'count',            # number of non-missing footprint values
+    'mean',             # mean daily footprint
+    'std',              # sample standard deviation of the daily footprint
+    'trend',            # mean day-over-day percentage change
+    'trend_std',        # sample standard deviation of the percentage change
+    'peak_value',       # highest daily footprint
+    'peak_date',        # Timestamp of the first day with peak_value
+    'weekday_means',    # read-only array of 7 means indexed by day of week (NaN if no data)
+    'weekend_mean',     # mean over Saturdays and Sundays
+    'weekday_mean',     # mean over Monday to Friday
+    'month_means',      # read-only array of 12 means indexed by month - 1 (NaN if no data)
+    'source_means',     # read-only mapping of available source column to its mean
+])
+
+
+def _mean(values):
+    return float(values.mean()) if len(values) else float('nan')
+
+
+def _std(values):
+    return float(values.std(ddof=1)) if len(values) > 1 else float('nan')
+
+
+def _divide(sums, counts):
+    """Means from sums and counts; NaN where a count is zero"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.asarray(sums, dtype=float) / counts
+
+
+def summary_from_aggregates(count, mean, std, trend, trend_std, peak_value, peak_date,
+                            day_sums, day_counts, month_sums, month_counts, source_means):
+    """Assemble a HistorySummary from per-day-of-week and per-month sums and counts"""
+    day_sums = np.asarray(day_sums, dtype=float)
+    day_counts = np.asarray(day_counts)
+    weekend = list(WEEKEND_DAYS)
+    weekdays = [day for day in range(7) if day not in WEEKEND_DAYS]
+
+    weekday_means = _divide(day_sums, day_counts)
+    month_means = _divide(month_sums, month_counts)
+    weekday_means.flags.writeable = False
+    month_means.flags.writeable = False
+
+    return HistorySummary(
+        count=count,
+        mean=mean,
+        std=std,
+        trend=trend,
+        trend_std=trend_std,
+        peak_value=peak_value,
+        peak_date=peak_date,
+        weekday_means=weekday_means,
+        weekend_mean=float(_divide(day_sums[weekend].sum(), day_counts[weekend].sum())),
+        weekday_mean=float(_divide(day_sums[weekdays].sum(), day_counts[weekdays].sum())),
+        month_means=month_means,
+        source_means=MappingProxyType(dict(source_means)),
+    )
+
+
+def summarize_history(df):
+    """Every statistic the insight and recommendation generators need, in one pass.
+
+    ``df`` is a prepared DataFrame. Missing footprint values are skipped, as
+    pandas does, and day-of-week and month aggregates come from ``bincount``
+    instead of ``groupby``.
+    """
+    values = df['carbonFootprint'].to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    observed = values[valid] if not valid.all() else values
+
+    # Day-over-day percentage change, computed the way pandas' pct_change does
+    with np.errstate(invalid='ignore', divide='ignore'):
+        changes = values[1:] / values[:-1] - 1
+    changes = changes[~np.isnan(changes)]
+
+    if len(observed):
+        peak_position = int(np.nanargmax(values))
+        peak_value = float(values[peak_position])
+        peak_date = df['date'].iloc[peak_position]
+    else:
+        peak_value, peak_date = float('nan'), None
+
+    day_of_week = df['day_of_week'].to_numpy()[valid].astype(np.intp)
+    month = df['month'].to_numpy()[valid].astype(np.intp) - 1
+
+    source_means = {}
+    for column in SOURCE_COLUMNS:
+        if column in df.columns:
+            source = df[column].to_numpy(dtype=float)
+            source_means[column] = _mean(source[~np.isnan(source)])
+
+    return summary_from_aggregates(
+        count=len(observed),
+        mean=_mean(observed),
+        std=_std(observed),
+        trend=_mean(changes),
+        trend_std=_std(changes),
+        peak_value=peak_value,
+        peak_date=peak_date,
+        day_sums=np.bincount(day_of_week, weights=observed, minlength=7),
+        day_counts=np.bincount(day_of_week, minlength=7),
+        month_sums=np.bincount(month, weights=observed, minlength=12),
+        month_counts=np.bincount(month, minlength=12),
+        source_means=source_means,
+    )
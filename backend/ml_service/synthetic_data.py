@@ -0,0 +1,224 @@
+import argparse
+import csv
+import json
+import mmap
+import struct
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from features import calendar_features
+from summary import SOURCE_COLUMNS
+from wire_format import decode_frame, encode_frame
+
+# Mean daily kg CO2 per source for a typical user
+SOURCE_BASES = {'transportation': 5.0, 'energy': 8.0, 'waste': 3.0, 'food': 4.0}
+WEEKEND_EFFECTS = {'transportation': 1.4}  # Source multipliers on Saturdays and Sundays
+WINTER_EFFECTS = {'energy': 1.2}  # Source multipliers from December to February
+SEASONAL_SOURCES = ('energy',)  # Sources following the smooth annual cycle, peaking mid-January
+ANOMALY_SOURCE = 'transportation'
+
+BLOCK_USERS = 64  # Users per random stream; chunks are made of whole blocks
+CHUNK_USERS = 1024
+FORMATS = ['json', 'columnar', 'csv', 'frames']
+FRAME_LENGTH = struct.Struct('<Q')
+
+# One block of users: ``columns`` maps each of carbonFootprint and the sources
+# to a (users, days) array; every user shares the same ``dates``
+SyntheticChunk = namedtuple('SyntheticChunk', ['user_ids', 'dates', 'columns'])
+
+
+class SyntheticDataGenerator:
+    """Seeded, vectorized daily footprints for a population of synthetic users.
+
+    Each source starts from ``source_bases``, scaled per user by a log-normal
+    size (``user_spread``) and a log-normal per-source mix (``mix_spread``).
+    Weekend and winter multipliers, a cosine annual cycle of amplitude
+    ``seasonality`` and a shared ±``noise`` daily factor are applied on top,
+    and ``anomaly_rate`` of user-days get a spike of up to ``anomaly_scale``.
+    Users are drawn in blocks of BLOCK_USERS from a stream seeded by
+    ``(seed, block)``, so a user's series depends only on the seed, their id
+    and ``days``, never on how the output is chunked.
+    """
+
+    def __init__(self, users=1, days=30, seed=0, end_date=None, source_bases=SOURCE_BASES,
+                 weekend_effects=WEEKEND_EFFECTS, winter_effects=WINTER_EFFECTS, seasonality=0.1,
+                 noise=0.1, anomaly_rate=0.02, anomaly_scale=0.5, user_spread=0.3, mix_spread=0.2):
+        if users < 1 or days < 1:
+            raise ValueError("users and days must be positive")
+        self.users = users
+        self.days = days
+        self.seed = seed
+        end_date = np.datetime64(end_date or datetime.now().date(), 'D')
+        self.dates = end_date - np.arange(days - 1, -1, -1)
+        self.sources = [source for source in SOURCE_COLUMNS if source in source_bases]
+        self.seasonality = seasonality
+        self.noise = noise
+        self.anomaly_rate = anomaly_rate
+        self.anomaly_scale = anomaly_scale
+        self.user_spread = user_spread
+        self.mix_spread = mix_spread
+
+        # Everything that only depends on the date is computed once for all users
+        calendar = calendar_features(self.dates)
+        weekend = calendar['is_weekend'].astype(bool)
+        winter = calendar['is_winter'].astype(bool)
+        day_of_year = (self.dates - self.dates.astype('datetime64[Y]')).astype(np.int64)
+        annual = 1 + seasonality * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+        self._profiles = {}
+        for source in self.sources:
+            profile = np.full(days, float(source_bases[source]))
+            profile[weekend] *= weekend_effects.get(source, 1.0)
+            profile[winter] *= winter_effects.get(source, 1.0)
+            if source in SEASONAL_SOURCES:
+                profile *= annual
+            self._profiles[source] = profile
+
+    @property
+    def size(self):
+        """Number of user-days generated"""
+        return self.users * self.days
+
+    def _block(self, block):
+        first = block * BLOCK_USERS
+        count = min(BLOCK_USERS, self.users - first)
+        rng = np.random.default_rng([self.seed, block])
+        # Draws are always BLOCK_USERS wide so a user's values don't depend on the total user count
+        scale = rng.lognormal(0.0, self.user_spread, BLOCK_USERS)[:count, None]
+        mix = rng.lognormal(0.0, self.mix_spread, (BLOCK_USERS, len(self.sources)))[:count]
+        factor = 1 + (rng.random((BLOCK_USERS, self.days))[:count] - 0.5) * 2 * self.noise
+        spikes = rng.random((BLOCK_USERS, self.days))[:count] < self.anomaly_rate
+        spike_sizes = rng.random((BLOCK_USERS, self.days))[:count] * self.anomaly_scale
+
+        columns = {}
+        total = np.zeros((count, self.days))
+        for i, source in enumerate(self.sources):
+            values = self._profiles[source] * (scale * mix[:, i:i + 1]) * factor
+            if source == ANOMALY_SOURCE:
+                values = np.where(spikes, values * (1 + spike_sizes), values)
+            total += values
+            columns[source] = np.round(values, 2)
+        columns = {'carbonFootprint': np.round(total, 2), **columns}
+        return columns, np.arange(first, first + count, dtype=np.int64)
+
+    def chunks(self, users_per_chunk=CHUNK_USERS):
+        """Yield SyntheticChunks of about ``users_per_chunk`` users, rounded to whole blocks"""
+        blocks_per_chunk = max(1, -(-users_per_chunk // BLOCK_USERS))
+        n_blocks = -(-self.users // BLOCK_USERS)
+        for start in range(0, n_blocks, blocks_per_chunk):
+            parts = [self._block(block) for block in range(start, min(start + blocks_per_chunk, n_blocks))]
+            columns = {name: np.concatenate([part[0][name] for part in parts]) for name in parts[0][0]}
+            yield SyntheticChunk(np.concatenate([part[1] for part in parts]), self.dates, columns)
+
+    def histories(self, layout='rows', users_per_chunk=CHUNK_USERS):
+        """Yield ``(user_id, historicalData)`` per user in the row or columnar layout"""
+        for chunk in self.chunks(users_per_chunk):
+            for i, user_id in enumerate(chunk.user_ids.tolist()):
+                yield user_id, user_history(chunk, i, layout)
+
+
+def user_history(chunk, index, layout='rows'):
+    """One user's series from a chunk as ``historicalData`` in the given layout"""
+    if layout == 'columnar':
+        return {'start': str(chunk.dates[0]),
+                **{name: values[index].tolist() for name, values in chunk.columns.items()}}
+    if layout == 'arrays':
+        return {'start': str(chunk.dates[0]), **{name: values[index] for name, values in chunk.columns.items()}}
+    if layout != 'rows':
+        raise ValueError(f"Unknown history layout: {layout}")
+    names = list(chunk.columns)
+    columns = [chunk.columns[name][index].tolist() for name in names]
+    return [
+        {'date': date, **dict(zip(names, values))}
+        for date, *values in zip(chunk.dates.astype(str).tolist(), *columns)
+    ]
+
+
+def write_dataset(generator, path, format='json', users_per_chunk=CHUNK_USERS):
+    """Stream a generator's output to ``path`` one chunk at a time.
+
+    ``json`` and ``columnar`` write JSON Lines with one ``{"userId",
+    "historicalData"}`` object per user, ready to post to /predictions;
+    ``csv`` writes one row per user-day; ``frames`` writes each chunk as a
+    length-prefixed binary frame (see read_frames). Returns the user-days written.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown output format: {format}")
+    written = 0
+    with open(path, 'wb' if format == 'frames' else 'w', newline='' if format == 'csv' else None) as f:
+        writer = None
+        for chunk in generator.chunks(users_per_chunk):
+            if format in ('json', 'columnar'):
+                layout = 'rows' if format == 'json' else 'columnar'
+                for i, user_id in enumerate(chunk.user_ids.tolist()):
+                    f.write(json.dumps({'userId': user_id, 'historicalData': user_history(chunk, i, layout)}))
+                    f.write('\n')
+            elif format == 'csv':
+                if writer is None:
+                    writer = csv.writer(f)
+                    writer.writerow(['userId', 'date', *chunk.columns])
+                n_users = len(chunk.user_ids)
+                user_ids = np.repeat(chunk.user_ids, len(chunk.dates))
+                dates = np.tile(chunk.dates.astype(str), n_users)
+                writer.writerows(zip(user_ids.tolist(), dates.tolist(),
+                                     *(values.ravel().tolist() for values in chunk.columns.values())))
+            else:
+                frame = encode_frame({
+                    'userIds': chunk.user_ids,
+                    'startDay': int(chunk.dates[0].astype(np.int64)),
+                    'columns': {name: values.ravel() for name, values in chunk.columns.items()}
+                })
+                f.write(FRAME_LENGTH.pack(len(frame)))
+                f.write(frame)
+            written += chunk.user_ids.size * len(chunk.dates)
+    return written
+
+
+def read_frames(path):
+    """Yield SyntheticChunks back from a ``frames`` file, as views into a memory map"""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    offset = 0
+    while offset < len(buffer):
+        (length,) = FRAME_LENGTH.unpack_from(buffer, offset)
+        offset += FRAME_LENGTH.size
+        document = decode_frame(memoryview(buffer)[offset:offset + length])
+        offset += length
+        user_ids = document['userIds']
+        days = len(document['columns']['carbonFootprint']) // max(len(user_ids), 1)
+        dates = np.datetime64(document['startDay'], 'D') + np.arange(days)
+        columns = {name: values.reshape(len(user_ids), days) for name, values in document['columns'].items()}
+        yield SyntheticChunk(user_ids, dates, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic carbon footprint dataset')
+    parser.add_argument('output')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', help='last date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--format', choices=FORMATS, default='json')
+    parser.add_argument('--seasonality', type=float, default=0.1)
+    parser.add_argument('--noise', type=float, default=0.1)
+    parser.add_argument('--anomaly-rate', type=float, default=0.02)
+    parser.add_argument('--anomaly-scale', type=float, default=0.5)
+    parser.add_argument('--user-spread', type=float, default=0.3)
+    parser.add_argument('--mix-spread', type=float, default=0.2)
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(
+        users=args.users, days=args.days, seed=args.seed, end_date=args.end_date,
+        seasonality=args.seasonality, noise=args.noise, anomaly_rate=args.anomaly_rate,
+        anomaly_scale=args.anomaly_scale, user_spread=args.user_spread, mix_spread=args.mix_spread
+    )
+    started = datetime.now()
+    written = write_dataset(generator, args.output, args.format)
+    print(f"Wrote {written} user-days to {args.output} in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import json
+import os
+import shutil
+
+import app
+
+
+def test_predictions_honours_requested_horizon(client, sample_data):
+    response = client.post('/predictions', json={'historicalData': sample_data, 'days': 12})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['forecastData']) == 12
+    assert body['modelInfo']['version'] == app.MODEL_VERSION
+
+
+def test_batch_matches_single_predictions(client, sample_data):
+    users = [
+        {'userId': 'a', 'historicalData': sample_data},
+        {'userId': 'b', 'historicalData': sample_data[-40:]},
+    ]
+    response = client.post('/predictions/batch', json={'users': users})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['userId'] for r in results] == ['a', 'b']
+
+    for user, result in zip(users, results):
+        single = client.post('/predictions', json={'historicalData': user['historicalData']}).get_json()
+        for key in ('forecastData', 'insights', 'recommendations', 'anomalies'):
+            assert result[key] == single[key]
+
+
+def test_batch_reports_per_user_errors(client, sample_data):
+    users = [
+        {'userId': 'bad', 'historicalData': [{'date': 'not a date', 'carbonFootprint': 1}]},
+        {'userId': 'missing'},
+        {'userId': 'good', 'historicalData': sample_data},
+    ]
+    response = client.post('/predictions/batch', json={'users': users})
+    assert response.status_code == 200
+    bad, missing, good = response.get_json()['results']
+    assert 'error' in bad and 'forecastData' not in bad
+    assert missing['error'] == 'Missing historical data'
+    assert 'error' not in good and len(good['forecastData']) == app.DEFAULT_FORECAST_DAYS
+
+
+def test_append_matches_full_history_predictions(client, sample_data):
+    seed = client.post('/predictions/append', json={'userId': 'u1', 'historicalData': sample_data[:60]})
+    assert seed.status_code == 200
+    assert seed.get_json()['dataPoints'] == 60
+
+    # Insights come from running aggregates; forecasts from the stored 31-day window
+    for start, end in ((60, 61), (61, 75), (75, 90)):
+        body = client.post('/predictions/append', json={
+            'userId': 'u1', 'newData': sample_data[start:end]
+        }).get_json()
+        full = client.post('/predictions', json={'historicalData': sample_data[:end]}).get_json()
+        assert body['dataPoints'] == end
+        assert body['forecastData'] == full['forecastData']
+        assert body['insights'] == full['insights']
+        new_dates = {point['date'][:10] for point in sample_data[start:end]}
+        assert body['anomalies'] == [a for a in full['anomalies'] if a['date'] in new_dates]
+
+
+def test_append_rejects_unknown_users_and_stale_points(client, sample_data):
+    response = client.post('/predictions/append', json={'userId': 'nobody', 'newData': sample_data[-1:]})
+    assert response.status_code == 409
+
+    client.post('/predictions/append', json={'userId': 'u2', 'historicalData': sample_data})
+    response = client.post('/predictions/append', json={'userId': 'u2', 'newData': sample_data[-1:]})
+    assert response.status_code == 400
+    assert client.get('/state/stats').get_json()['users'] == 1
+
+    # Any id but a missing one names a user, including 0
+    assert client.post('/predictions/append', json={'newData': sample_data[-1:]}).status_code == 400
+    assert client.post('/predictions/append', json={'userId': 0, 'historicalData': sample_data}).status_code == 200
+    assert client.get('/state/stats').get_json()['users'] == 2
+
+
+def test_training_job_publishes_new_model(client, sample_data, monkeypatch):
+    import time
+
+    from training_jobs import TrainingJobs
+
+    jobs = TrainingJobs('models/jobs')
+    monkeypatch.setattr(app, 'training_jobs', jobs)
+    before = app.model_registry.get()
+
+    response = client.post('/train', json={'historicalData': sample_data})
+    assert response.status_code == 202
+    job_id = response.get_json()['jobId']
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        job = client.get(f'/train/{job_id}').get_json()
+        if job['state'] in ('succeeded', 'failed'):
+            break
+        time.sleep(0.2)
+    jobs.shutdown()
+
+    assert job['state'] == 'succeeded', job
+    assert job['progress'] == 1.0
+    assert set(job['timings']) == {'prepare', 'scale', 'fit', 'fit_direct', 'validate', 'publish'}
+    assert isinstance(job['validationScore'], float)
+    assert app.model_registry.reload() is not before
+    assert client.get('/train/not-a-job').status_code == 404
+
+
+def test_detect_anomalies_uses_positions_and_threshold(sample_data):
+    df = app.prepare_data(sample_data)
+    df.loc[60, 'carbonFootprint'] *= 3
+    shifted = df.set_index(df.index + 1000)
+
+    anomalies = app.detect_anomalies(shifted)
+    assert anomalies == app.detect_anomalies(df)
+    assert df['date'].iloc[60].strftime('%Y-%m-%d') in [a['date'] for a in anomalies]
+    assert len(app.detect_anomalies(df, threshold=1.0)) > len(anomalies)
+
+
+def test_serving_import_leaves_training_stack_unloaded():
+    import os
+    import subprocess
+    import sys
+
+    script = "import sys, app; print(sorted(m for m in ('sklearn', 'scipy', 'xgboost') if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, '-c', script], cwd=os.path.dirname(app.__file__),
+        capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == '[]'
+
+
+def test_warm_up_marks_worker_ready(client, monkeypatch):
+    monkeypatch.setattr(app, 'warm_up_report', None)
+    assert client.get('/health').status_code == 503
+
+    timings = app.warm_up()
+    assert set(timings) == {'modelLoad', 'firstPrediction'}
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['warmUp'] == timings
+
+
+def test_test_data_is_sized_and_seeded(client):
+    single = client.get('/test-data?days=45&seed=11')
+    assert single.status_code == 200 and single.headers['X-Seed'] == '11'
+    assert len(single.get_json()) == 45
+    assert client.get('/test-data?days=45&seed=11').get_json() == single.get_json()
+
+    batch = client.get('/test-data?days=40&users=3&seed=11')
+    users = json.loads(batch.get_data())['users']
+    assert [user['userId'] for user in users] == [0, 1, 2]
+    results = client.post('/predictions/batch', json={'users': users}).get_json()['results']
+    assert all('forecastData' in result for result in results)
+
+    assert client.get('/test-data?days=0').status_code == 400
+    assert client.get(f'/test-data?users={app.MAX_TEST_DATA_POINTS}&days=2').status_code == 400
+
+
+def test_cohort_model_serves_its_users_and_others_fall_back(client, trained_model, sample_data):
+    cohort_dir = os.path.join(app.cohort_registry.directory, 'region-eu')
+    os.makedirs(cohort_dir)
+    shutil.copy(trained_model['model_path'], cohort_dir)
+    shutil.copy(trained_model['scaler_path'], cohort_dir)
+
+    eu = client.post('/predictions', json={'historicalData': sample_data, 'cohort': 'region-eu'}).get_json()
+    us = client.post('/predictions', json={'historicalData': sample_data, 'cohort': 'region-us'}).get_json()
+    assert eu['modelInfo']['cohort'] == 'region-eu'
+    assert us['modelInfo']['cohort'] is None
+    assert eu['forecastData'] == us['forecastData']
+    assert client.post('/predictions', json={'historicalData': sample_data, 'cohort': '../x'}).status_code == 400
+
+    stats = client.get('/cohorts/stats').get_json()
+    assert list(stats['resident']) == ['region-eu'] and stats['misses'] == 1
+
+
+def test_forecast_mode_is_selectable_per_request(client, sample_data):
+    direct = client.post('/predictions', json={'historicalData': sample_data, 'days': 30, 'mode': 'direct'})
+    recursive = client.post('/predictions', json={'historicalData': sample_data, 'days': 30})
+    assert direct.status_code == 200
+    assert direct.get_json()['modelInfo']['forecastMode'] == 'direct'
+    assert recursive.get_json()['modelInfo']['forecastMode'] == 'recursive'
+    assert len(direct.get_json()['forecastData']) == 30
+    assert direct.get_json()['forecastData'] != recursive.get_json()['forecastData']
+
+    too_long = client.post('/predictions', json={'historicalData': sample_data, 'days': 31, 'mode': 'direct'})
+    assert too_long.status_code == 400
+    assert client.post('/predictions', json={'historicalData': sample_data, 'mode': 'psychic'}).status_code == 400
+    batch = client.post('/predictions/batch', json={'users': [{'historicalData': sample_data}], 'mode': 'direct'})
+    assert batch.get_json()['results'][0]['forecastData'] == direct.get_json()['forecastData'][:app.DEFAULT_FORECAST_DAYS]
@@ -0,0 +1,49 @@
+import numpy as np
+
+import app
+from backtest import HorizonErrors, backtest_series, forecast_origins, run_backtest
+from forecaster import forecast_recursive
+
+
+def test_batched_origins_match_one_forecast_per_origin(trained_model, sample_data):
+    df = app.prepare_data(sample_data)
+    values, dates = df['carbonFootprint'].to_numpy(dtype=float), df['date'].to_numpy()
+    model, scaler = trained_model['model'], trained_model['scaler']
+    errors = backtest_series([(values, dates)], forecast_recursive, model, scaler, days=5, step=3)
+
+    origins = forecast_origins(len(values), 5, step=3)
+    assert origins[0] == 30 and origins[-1] <= len(values) - 5
+    expected = HorizonErrors(5)
+    for origin in origins:
+        _, predicted = forecast_recursive([values[:origin]], [np.datetime64(dates[origin - 1], 'D')], model, scaler,
+                                          app.FEATURE_COLUMNS, 5)
+        expected.add(predicted, values[None, origin:origin + 5])
+    assert errors.origins == len(origins)
+    np.testing.assert_allclose(errors.abs_error, expected.abs_error)
+    np.testing.assert_allclose(errors.pct_error, expected.pct_error)
+
+
+def test_error_report_skips_zero_actuals_for_mape():
+    errors = HorizonErrors(2)
+    errors.add(np.array([[1.0, 3.0], [2.0, 2.0]]), np.array([[2.0, 0.0], [2.0, np.nan]]))
+    report = errors.report()
+    assert (report['origins'], report['mae'], report['mape']) == (2, 1.3333, 25.0)
+    assert report['horizons'] == [{'day': 1, 'mae': 0.5, 'mape': 25.0, 'count': 2},
+                                  {'day': 2, 'mae': 3.0, 'mape': None, 'count': 1}]
+
+
+def test_backtest_endpoint_and_dataset_runs_agree(client, sample_data):
+    response = client.post('/backtest', json={'historicalData': sample_data, 'days': 7, 'step': 2})
+    assert response.status_code == 200
+    backtest = response.get_json()['backtest']
+    assert backtest['origins'] == len(range(30, 90 - 7 + 1, 2))
+    assert [horizon['day'] for horizon in backtest['horizons']] == list(range(1, 8))
+
+    df = app.prepare_data(sample_data)
+    series = [(df['carbonFootprint'].to_numpy(dtype=float), df['date'].to_numpy())] * 3
+    report = run_backtest(series, 7, step=2, workers=0, batch_series=2)
+    assert (report['series'], report['origins']) == (3, 3 * backtest['origins'])
+    assert report['mae'] == backtest['mae']
+
+    assert client.post('/backtest', json={'historicalData': sample_data[:36], 'days': 7}).status_code == 400
+    assert client.post('/backtest', json={'historicalData': sample_data, 'step': 0}).status_code == 400
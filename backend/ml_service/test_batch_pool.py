@@ -0,0 +1,23 @@
+import pytest
+
+from batch_pool import batches, map_batches
+
+
+def total(batch, offset):
+    if -1 in batch:
+        raise ValueError('bad batch')
+    return sum(batch) + offset
+
+
+def test_batches_are_read_lazily():
+    assert list(batches(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batches([], 3)) == []
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_every_batch_is_mapped_once_in_or_out_of_process(workers):
+    results = list(map_batches(total, range(10), 3, workers, 100))
+    assert sorted(results) == [([0, 1, 2], 103), ([3, 4, 5], 112), ([6, 7, 8], 121), ([9], 109)]
+
+    with pytest.raises(ValueError, match='bad batch'):
+        list(map_batches(total, [1, 2, -1, 3], 2, workers, 0))
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from chunked_training import clean_series, feature_blocks, iter_series, train_model_from_files
+from features import FEATURE_COLUMNS
+from forecaster import forecast_recursive
+from model_registry import ModelRegistry
+from synthetic_data import BLOCK_USERS, SyntheticDataGenerator, write_dataset
+
+
+def test_every_input_format_yields_the_same_series(tmp_path):
+    generator = SyntheticDataGenerator(users=5, days=40, seed=2, end_date='2024-03-01')
+    expected = next(generator.chunks()).columns['carbonFootprint']
+    for format, name in (('json', 'users.jsonl'), ('columnar', 'users.ndjson'), ('csv', 'users.csv'),
+                         ('frames', 'users.frames')):
+        write_dataset(generator, tmp_path / name, format)
+        series = list(iter_series([str(tmp_path / name)]))
+        assert [str(user_id) for user_id, _, _ in series] == ['0', '1', '2', '3', '4'], format
+        for i, (_, dates, values) in enumerate(series):
+            dates, values = clean_series(dates, values)
+            assert dates[0] == np.datetime64('2024-01-22') and len(dates) == 40
+            np.testing.assert_array_equal(values, expected[i])
+
+
+def test_clean_series_interpolates_over_time_and_rejects_bad_series():
+    dates = np.array(['2024-01-03', '2024-01-01', '2024-01-05', '2024-01-04'] +
+                     [f'2024-02-{day:02d}' for day in range(1, 27)])
+    values = np.array([np.nan, 1.0, 5.0, np.nan] + [1.0] * 26)
+    dates, values = clean_series(dates, values)
+    assert dates[0] == np.datetime64('2024-01-01')
+    np.testing.assert_array_equal(values[:3], [1.0, 3.0, 4.0])
+
+    with pytest.raises(ValueError, match='Negative'):
+        clean_series(dates, -values)
+    with pytest.raises(ValueError, match='missing'):
+        clean_series(dates, np.where(np.arange(len(values)) % 3, values, np.nan))
+
+
+def test_model_trained_from_files_serves_forecasts(tmp_path):
+    path = str(tmp_path / 'users.csv')
+    write_dataset(SyntheticDataGenerator(users=BLOCK_USERS, days=120, seed=4, end_date='2024-06-30'), path, 'csv')
+    model_path, scaler_path = str(tmp_path / 'model.joblib'), str(tmp_path / 'scaler.joblib')
+    model, scaler, score, counts = train_model_from_files([path], model_path, scaler_path, '1.0', chunk_rows=1000,
+                                                          rounds=30)
+    assert counts == {'users': BLOCK_USERS, 'skipped': 0, 'training_rows': BLOCK_USERS * 96,
+                      'validation_rows': BLOCK_USERS * 24, 'boosted_rows': BLOCK_USERS * 96}
+    assert score > 0.5
+    assert model.get_booster().num_boosted_rounds() == 30
+
+    # The incrementally fitted scaler matches one fitted on every training row at once
+    X = np.concatenate([X for X, _ in feature_blocks([path], 'training', chunk_rows=10**6)])
+    np.testing.assert_allclose(scaler.mean_, X.mean(axis=0), atol=1e-9)
+    np.testing.assert_allclose(scaler.var_, X.var(axis=0), rtol=1e-9, atol=1e-12)
+
+    loaded = ModelRegistry(model_path, scaler_path).get()
+    history = np.full(60, 20.0)
+    _, forecast = forecast_recursive([history], [np.datetime64('2024-06-30')], *loaded.serving_model(),
+                                     FEATURE_COLUMNS, 7)
+    assert forecast.shape == (1, 7) and np.isfinite(forecast).all()
+
+
+# Trains in a fresh interpreter and samples its anonymous resident memory, which
+# unlike tracemalloc includes XGBoost's native allocations. VmHWM would also count
+# the page cache files XGBoost maps in, which the kernel can drop at any time
+TRAIN_AND_MEASURE = """
+import json, sys, threading, time
+import chunked_training
+
+def anonymous_kib():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('RssAnon:'))
+
+peak_kib, done = [anonymous_kib()], threading.Event()
+def sample():
+    while not done.wait(0.002):
+        peak_kib[0] = max(peak_kib[0], anonymous_kib())
+sampler = threading.Thread(target=sample)
+sampler.start()
+chunked_training.READ_ROWS = 10_000
+model, _, _, counts = chunked_training.train_model_from_files(
+    [sys.argv[1]], sys.argv[2] + '/model.joblib', sys.argv[2] + '/scaler.joblib', '1.0', chunk_rows=2048, rounds=10)
+done.set()
+sampler.join()
+print(json.dumps({'peak_kib': peak_kib[0], 'counts': counts, 'trees': model.get_booster().num_boosted_rounds()}))
+"""
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='needs Linux /proc')
+def test_peak_memory_and_model_size_do_not_grow_with_the_number_of_users(tmp_path):
+    runs = {}
+    for users in (4 * BLOCK_USERS, 16 * BLOCK_USERS):
+        path = str(tmp_path / f'{users}.csv')
+        write_dataset(SyntheticDataGenerator(users=users, days=120, seed=0, end_date='2024-06-30'), path, 'csv')
+        output = subprocess.run([sys.executable, '-c', TRAIN_AND_MEASURE, path, str(tmp_path)],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                                check=True)
+        runs[users] = json.loads(output.stdout.splitlines()[-1])
+    small, large = runs[4 * BLOCK_USERS], runs[16 * BLOCK_USERS]
+    # Four times the users grows the peak only by XGBoost's gradient and label state, well under the features
+    counts = large['counts']
+    feature_bytes = (counts['training_rows'] + counts['validation_rows']) * len(FEATURE_COLUMNS) * 8
+    assert (large['peak_kib'] - small['peak_kib']) * 1024 < feature_bytes / 2
+    # Every tree is boosted over all the training rows
+    assert counts['boosted_rows'] == counts['training_rows']
+    assert small['trees'] == large['trees'] == 10
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+from features import FEATURE_COLUMNS, CalendarTable, calendar_features, compute_calendar_features, load_holidays
+
+
+def legacy_prepare_data(historical_data):
+    """The column-by-column pandas feature pipeline that build_feature_matrix replaced"""
+    df = pd.DataFrame(historical_data)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.set_index('date').sort_index()
+    df['carbonFootprint'] = df['carbonFootprint'].interpolate(method='time')
+    df = df.reset_index()
+    df['day_of_week'] = df['date'].dt.dayofweek
+    df['month'] = df['date'].dt.month
+    df['day_of_month'] = df['date'].dt.day
+    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
+    df['is_holiday'] = df['day_of_week'].isin([0, 6]).astype(int)
+    for lag in [1, 2, 3, 7, 14, 30]:
+        df[f'prev_{lag}d_footprint'] = df['carbonFootprint'].shift(lag).ffill()
+    for window in [3, 7, 14, 30]:
+        rolling = df['carbonFootprint'].rolling(window=window, min_periods=1)
+        df[f'rolling_mean_{window}d'] = rolling.mean().ffill()
+        df[f'rolling_std_{window}d'] = rolling.std().fillna(0.0)
+        df[f'rolling_min_{window}d'] = rolling.min().ffill()
+        df[f'rolling_max_{window}d'] = rolling.max().ffill()
+    df['daily_change'] = df['carbonFootprint'].diff().fillna(0.0)
+    df['weekly_change'] = df['carbonFootprint'].diff(7).fillna(0.0)
+    df['monthly_change'] = df['carbonFootprint'].diff(30).fillna(0.0)
+    df['is_winter'] = df['month'].isin([12, 1, 2]).astype(int)
+    df['is_summer'] = df['month'].isin([6, 7, 8]).astype(int)
+    df = df[['date', 'carbonFootprint'] + FEATURE_COLUMNS]
+    for col in FEATURE_COLUMNS:
+        if df[col].isnull().any():
+            df[col] = df[col].fillna(df[col].mean())
+    return df
+
+
+def assert_same_features(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    assert (actual['date'].to_numpy() == expected['date'].to_numpy()).all()
+    np.testing.assert_allclose(
+        actual[['carbonFootprint'] + FEATURE_COLUMNS].to_numpy(dtype=float),
+        expected[['carbonFootprint'] + FEATURE_COLUMNS].to_numpy(dtype=float),
+        rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+
+
+@pytest.mark.parametrize('days', [1, 2, 10, 30, 31, 365, 3650])
+def test_matches_legacy_pandas_features(days):
+    np.random.seed(days)
+    data = app.generate_sample_data(days=days)
+    assert_same_features(app.prepare_data(data), legacy_prepare_data(data))
+
+
+def test_matches_legacy_with_gaps_constant_runs_and_shuffled_rows():
+    np.random.seed(7)
+    data = app.generate_sample_data(days=120)
+    for i in range(40, 50):
+        data[i]['carbonFootprint'] = 12.5
+    for i in (5, 60, 61, 100):
+        data[i]['carbonFootprint'] = None
+    data = data[::-1]
+    assert_same_features(app.prepare_data(data), legacy_prepare_data(data))
+
+
+def test_calendar_table_matches_computed_features_inside_and_outside_its_range():
+    table = CalendarTable(2020, 2021)
+    for dates in (np.datetime64('2020-01-01') + np.arange(731), np.datetime64('2019-12-25') + np.arange(20)):
+        looked_up = table.features(dates)
+        for name, values in compute_calendar_features(dates).items():
+            np.testing.assert_array_equal(looked_up[name], values)
+            assert looked_up[name].dtype == values.dtype
+    dates = np.datetime64('2024-01-01') + np.arange(366)
+    np.testing.assert_array_equal(calendar_features(dates)['day_of_week'], pd.DatetimeIndex(dates).dayofweek)
+
+
+def test_holiday_calendar_replaces_the_weekend_stand_in(tmp_path):
+    (tmp_path / 'holidays.csv').write_text('date,name\n# fixed dates\n2024-12-25,Christmas\n2025-01-01,New Year\n')
+    (tmp_path / 'holidays.json').write_text('["2025-01-01", {"date": "2024-12-25"}]')
+    holidays = load_holidays(str(tmp_path / 'holidays.csv'))
+    np.testing.assert_array_equal(holidays, load_holidays(str(tmp_path / 'holidays.json')))
+
+    dates = np.datetime64('2024-12-20') + np.arange(20)
+    expected = np.isin(dates, np.array(['2024-12-25', '2025-01-01'], dtype='datetime64[D]')).astype(np.int64)
+    # Same flags from the table and from dates past its last year
+    np.testing.assert_array_equal(CalendarTable(2024, 2025, holidays).features(dates)['is_holiday'], expected)
+    np.testing.assert_array_equal(CalendarTable(2020, 2023, holidays).features(dates)['is_holiday'], expected)
+    assert CalendarTable(2020, 2023, holidays).holiday_id == CalendarTable(2024, 2025, holidays[::-1]).holiday_id
+    assert CalendarTable(2024, 2025, holidays).holiday_id != CalendarTable(2024, 2025).holiday_id == 'weekend'
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+def legacy_predict_future(df, model, scaler, days=5):
+    """The DataFrame-per-step forecaster that forecast_recursive replaced"""
+    last_date = df['date'].max()
+    future_dates = [last_date + timedelta(days=i+1) for i in range(days)]
+    predictions = []
+    current_df = df.copy()
+    for future_date in future_dates:
+        new_row = {
+            'date': future_date,
+            'carbonFootprint': None,
+            'day_of_week': future_date.weekday(),
+            'month': future_date.month,
+            'day_of_month': future_date.day,
+            'is_weekend': 1 if future_date.weekday() >= 5 else 0,
+            'is_holiday': 1 if future_date.weekday() in [0, 6] else 0,
+            'is_winter': 1 if future_date.month in [12, 1, 2] else 0,
+            'is_summer': 1 if future_date.month in [6, 7, 8] else 0
+        }
+        for lag in [1, 2, 3, 7, 14, 30]:
+            if len(current_df) >= lag:
+                new_row[f'prev_{lag}d_footprint'] = current_df['carbonFootprint'].iloc[-lag]
+            else:
+                new_row[f'prev_{lag}d_footprint'] = current_df['carbonFootprint'].iloc[-1]
+        for window in [3, 7, 14, 30]:
+            if len(current_df) >= window:
+                rolling = current_df['carbonFootprint'].rolling(window=window, min_periods=1)
+                new_row[f'rolling_mean_{window}d'] = rolling.mean().iloc[-1]
+                new_row[f'rolling_std_{window}d'] = rolling.std().iloc[-1]
+                new_row[f'rolling_min_{window}d'] = rolling.min().iloc[-1]
+                new_row[f'rolling_max_{window}d'] = rolling.max().iloc[-1]
+            else:
+                last_value = current_df['carbonFootprint'].iloc[-1]
+                new_row[f'rolling_mean_{window}d'] = last_value
+                new_row[f'rolling_std_{window}d'] = 0.0
+                new_row[f'rolling_min_{window}d'] = last_value
+                new_row[f'rolling_max_{window}d'] = last_value
+        new_row['daily_change'] = current_df['carbonFootprint'].diff().iloc[-1] if len(current_df) >= 2 else 0.0
+        new_row['weekly_change'] = current_df['carbonFootprint'].diff(7).iloc[-1] if len(current_df) >= 8 else 0.0
+        new_row['monthly_change'] = current_df['carbonFootprint'].diff(30).iloc[-1] if len(current_df) >= 31 else 0.0
+        X_pred = scaler.transform(pd.DataFrame([new_row])[app.FEATURE_COLUMNS])
+        pred = model.predict(pd.DataFrame(X_pred, columns=app.FEATURE_COLUMNS))[0]
+        predictions.append({'date': future_date.strftime('%Y-%m-%d'), 'predicted': round(float(pred), 2)})
+        current_df = pd.concat([current_df, pd.DataFrame({'date': [future_date], 'carbonFootprint': [pred]})],
+                               ignore_index=True)
+    return predictions
+
+
+@pytest.mark.parametrize('history_days', [5, 20, 31, 90])
+@pytest.mark.parametrize('days', [1, 5, 40])
+def test_matches_legacy_forecaster(trained_model, sample_data, history_days, days):
+    df = app.prepare_data(sample_data[-history_days:])
+    expected = legacy_predict_future(df, trained_model['model'], trained_model['scaler'], days)
+    actual = app.predict_future(df, trained_model['model'], trained_model['scaler'], days)
+    assert actual == expected
+
+
+def test_batched_series_match_individual_forecasts(trained_model, sample_data):
+    from forecaster import forecast_recursive
+
+    frames = [app.prepare_data(sample_data[-n:]) for n in (10, 45, 90)]
+    histories = [f['carbonFootprint'].to_numpy() for f in frames]
+    last_dates = [np.datetime64(f['date'].max(), 'D') for f in frames]
+    _, batched = forecast_recursive(histories, last_dates, trained_model['model'], trained_model['scaler'],
+                                    app.FEATURE_COLUMNS, 7)
+    for row, (history, last_date) in enumerate(zip(histories, last_dates)):
+        _, single = forecast_recursive([history], [last_date], trained_model['model'], trained_model['scaler'],
+                                       app.FEATURE_COLUMNS, 7)
+        np.testing.assert_allclose(batched[row], single[0])
+
+
+@pytest.mark.parametrize('value', [0, -1, app.MAX_FORECAST_DAYS + 1, 'abc', 2.5, True, None])
+def test_invalid_forecast_days_rejected(value):
+    with pytest.raises(ValueError):
+        app.parse_forecast_days(value)
+
+
+def test_direct_forecast_is_one_call_over_every_horizon(trained_model, sample_data):
+    from forecaster import forecast_direct
+    from model_registry import ModelRegistry
+
+    loaded = ModelRegistry(trained_model['model_path'], trained_model['scaler_path']).get()
+    assert loaded.direct_horizon == 30 and loaded.metadata()['forecastModes'] == ['recursive', 'direct']
+
+    calls = []
+    model = loaded.direct_model
+    predict = model.predict
+    model.predict = lambda X: calls.append(len(X)) or predict(X)
+    frames = [app.prepare_data(sample_data[-n:]) for n in (10, 90)]
+    histories = [f['carbonFootprint'].to_numpy() for f in frames]
+    last_dates = [np.datetime64(f['date'].max(), 'D') for f in frames]
+    dates, values = forecast_direct(histories, last_dates, model, loaded.scaler, app.FEATURE_COLUMNS, 30)
+    assert calls == [2] and values.shape == (2, 30)
+    assert dates[1, -1] == last_dates[1] + 30
+
+    # Shorter horizons are prefixes of the full one
+    _, first_week = forecast_direct(histories, last_dates, model, loaded.scaler, app.FEATURE_COLUMNS, 7)
+    np.testing.assert_array_equal(first_week, values[:, :7])
+    with pytest.raises(ValueError):
+        forecast_direct(histories, last_dates, model, loaded.scaler, app.FEATURE_COLUMNS, 31)
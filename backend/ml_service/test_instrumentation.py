@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import app
+from instrumentation import RequestInstrumentation, RequestTimer, ServiceMetrics
+
+
+@pytest.fixture
+def metrics(client, monkeypatch):
+    """Fresh counters for the client's app"""
+    service_metrics = ServiceMetrics(app.service_metrics.endpoints)
+    monkeypatch.setattr(app, 'service_metrics', service_metrics)
+    monkeypatch.setattr(app, 'instrumentation', RequestInstrumentation(service_metrics))
+    return service_metrics
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in response.get_data(as_text=True).splitlines() if not line.startswith('#')
+    }
+
+
+def test_stages_errors_and_sizes_are_exported(client, metrics, sample_data):
+    client.post('/predictions', json={'historicalData': sample_data})
+    client.post('/predictions', json={'historicalData': [{'date': 'not a date', 'carbonFootprint': 1}]})
+    samples = scrape(client)
+
+    assert samples['ml_requests_total{endpoint="/predictions",status="2xx"}'] == 1
+    assert samples['ml_requests_total{endpoint="/predictions",status="4xx"}'] == 1
+    assert samples['ml_request_duration_seconds_count{endpoint="/predictions"}'] == 2
+    for stage in ('parse', 'load_model', 'cache', 'prepare_data', 'predict', 'detect_anomalies',
+                  'generate_insights', 'generate_recommendations', 'serialize'):
+        assert samples[f'ml_stage_duration_seconds_count{{endpoint="/predictions",stage="{stage}"}}'] >= 1, stage
+    assert samples['ml_stage_errors_total{endpoint="/predictions",stage="prepare_data"}'] == 1
+    assert samples['ml_input_points_bucket{endpoint="/predictions",le="90"}'] == 1
+    assert samples['ml_input_points_sum{endpoint="/predictions"}'] == len(sample_data)
+
+
+def test_server_timing_header_and_slow_request_profiles(client, metrics, sample_data, tmp_path, monkeypatch):
+    profile_dir = tmp_path / 'profiles'
+    monkeypatch.setattr(app, 'instrumentation', RequestInstrumentation(
+        metrics, server_timing=True, profile_sample_rate=1.0, profile_slow_seconds=0.0, profile_dir=str(profile_dir)
+    ))
+    response = client.post('/predictions', json={'historicalData': sample_data})
+
+    timing = response.headers['Server-Timing']
+    assert 'prepare_data;dur=' in timing and timing.split(', ')[-1].startswith('total;dur=')
+    assert len(os.listdir(profile_dir)) == 1
+
+
+def test_counters_are_shared_with_forked_workers():
+    metrics = ServiceMetrics(['/predictions'])
+    pid = os.fork()
+    if pid == 0:
+        metrics.observe(RequestTimer('/predictions'), 200)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    metrics.observe(RequestTimer('/predictions'), 500)
+    text = metrics.render_prometheus()
+    assert 'ml_requests_total{endpoint="/predictions",status="2xx"} 1' in text
+    assert 'ml_requests_total{endpoint="/predictions",status="5xx"} 1' in text
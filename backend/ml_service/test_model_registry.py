@@ -0,0 +1,138 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+import model_registry
+from model_registry import CohortModelRegistry, ModelRegistry, cohort_bucket, memory_size
+
+
+def test_artifacts_are_loaded_once(trained_model, monkeypatch):
+    calls = []
+    original_load = joblib.load
+    monkeypatch.setattr(model_registry.joblib, 'load',
+                        lambda path, **kwargs: calls.append(path) or original_load(path, **kwargs))
+
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], check_interval=0)
+    first = registry.get()
+    for _ in range(5):
+        assert registry.get() is first
+    assert len(calls) == 2
+    assert first.version is not None
+    assert 'loadedAt' in first.metadata()
+
+
+def test_changed_artifact_is_swapped_in(trained_model):
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], check_interval=0)
+    reloaded = []
+    registry.add_listener(reloaded.append)
+    old = registry.get()
+
+    model_info = joblib.load(trained_model['model_path'])
+    model_info['version'] = '2.0'
+    joblib.dump(model_info, trained_model['model_path'])
+    stat = os.stat(trained_model['model_path'])
+    os.utime(trained_model['model_path'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    new = registry.get()
+    assert new is not old
+    assert new.version == '2.0'
+    assert reloaded == [old, new]
+    # The old snapshot stays usable for requests that already hold it
+    assert old.model is not None and old.version != '2.0'
+
+
+def test_unreadable_artifact_keeps_previous_model(trained_model):
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], check_interval=0)
+    old = registry.get()
+
+    with open(trained_model['model_path'], 'wb') as f:
+        f.write(b'partial write')
+
+    assert registry.get() is old
+
+
+def test_memory_mapped_artifacts_serve_the_same_model(trained_model):
+    import numpy as np
+
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], mmap_mode='r')
+    loaded = registry.get()
+    assert isinstance(loaded.scaler.mean_, np.memmap)
+    assert loaded.compiled is not None
+
+    X = np.random.default_rng(0).normal(size=(5, trained_model['model'].n_features_in_))
+    expected = trained_model['model'].predict(trained_model['scaler'].transform(X))
+    np.testing.assert_array_equal(loaded.model.predict(loaded.scaler.transform(X)), expected)
+
+
+def test_model_trained_with_another_holiday_calendar_is_refused(trained_model, monkeypatch):
+    import features
+
+    registry = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], check_interval=0)
+    assert joblib.load(trained_model['model_path'])['holiday_calendar'] == 'weekend'
+    assert registry.get() is not None
+
+    holidays = np.array([np.datetime64('2024-12-25', 'D').astype(np.int64)])
+    monkeypatch.setattr(features, 'CALENDAR', features.CalendarTable(2024, 2024, holidays))
+    assert ModelRegistry(trained_model['model_path'], trained_model['scaler_path']).get() is None
+
+    # Republished under the new calendar, the model records it and loads again
+    model_info = joblib.load(trained_model['model_path'])
+    model_registry.publish_artifacts(model_info, trained_model['scaler'], trained_model['model_path'],
+                                     trained_model['scaler_path'])
+    assert joblib.load(trained_model['model_path'])['holiday_calendar'] == features.holiday_calendar_id(holidays)
+    assert ModelRegistry(trained_model['model_path'], trained_model['scaler_path']).get() is not None
+
+
+def make_cohorts(trained_model, directory, names):
+    for name in names:
+        os.makedirs(directory / name)
+        shutil.copy(trained_model['model_path'], directory / name / 'model.joblib')
+        shutil.copy(trained_model['scaler_path'], directory / name / 'scaler.joblib')
+    # Every copy holds about as much memory as the original loaded the same way
+    return ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], mmap_mode='r').get().memory_bytes()
+
+
+def test_memory_size_counts_private_memory_only(trained_model, tmp_path):
+    array = np.zeros(1000)
+    np.save(tmp_path / 'array.npy', array)
+    assert memory_size(np.load(tmp_path / 'array.npy', mmap_mode='r')) == 0
+    assert memory_size([array, array[10:], array]) >= array.nbytes
+    assert memory_size([array, array[10:], array]) < 2 * array.nbytes
+
+    # Unpickled trees, the compiled node table and the direct model all add to the artifact's footprint
+    loaded = ModelRegistry(trained_model['model_path'], trained_model['scaler_path'], mmap_mode='r').get()
+    compiled = sum(getattr(loaded.compiled, name).nbytes for name in ('feature', 'threshold', 'left', 'right', 'value'))
+    assert memory_size(loaded.compiled) >= compiled
+    assert loaded.memory_bytes() >= memory_size(loaded.model) + compiled + memory_size(loaded.direct_model)
+    assert loaded.memory_bytes() > os.path.getsize(trained_model['model_path'])
+
+
+def test_cohort_models_are_evicted_least_recently_used(trained_model, tmp_path):
+    size = make_cohorts(trained_model, tmp_path / 'cohorts', ['region-eu', 'region-us', 'region-asia'])
+    registry = CohortModelRegistry(str(tmp_path / 'cohorts'), max_bytes=int(2.5 * size))
+
+    eu = registry.get('region-eu')
+    assert isinstance(eu.scaler.mean_, np.memmap)
+    assert registry.stats()['resident']['region-eu'] == pytest.approx(size, rel=0.01)
+    registry.get('region-us')
+    assert registry.get('region-eu') is eu
+    registry.get('region-asia')  # Over budget: region-us was used least recently
+
+    stats = registry.stats()
+    assert list(stats['resident']) == ['region-eu', 'region-asia']
+    assert stats['residentBytes'] == sum(stats['resident'].values())
+    assert (stats['loads'], stats['hits'], stats['evictions']) == (3, 1, 1)
+    assert registry.get('region-us') is not None and registry.stats()['loads'] == 4
+
+
+def test_missing_and_invalid_cohorts(trained_model, tmp_path):
+    registry = CohortModelRegistry(str(tmp_path / 'cohorts'), max_bytes=1)
+    assert registry.get('household-family') is None
+    assert registry.stats()['misses'] == 1 and registry.stats()['resident'] == {}
+    with pytest.raises(ValueError):
+        registry.get('../models')
+    assert cohort_bucket('user-1', 16) == cohort_bucket('user-1', 16)
+    assert {cohort_bucket(f'user-{i}', 4) for i in range(100)} == {f'bucket-{i}' for i in range(4)}
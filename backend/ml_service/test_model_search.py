@@ -0,0 +1,54 @@
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+
+import app
+from model_search import budgeted_model_search
+
+
+@pytest.fixture
+def training_frame(sample_data):
+    df = app.prepare_data(sample_data)
+    return df[app.FEATURE_COLUMNS], df['carbonFootprint']
+
+
+def test_search_halves_candidates_and_records_trials(training_frame):
+    X, y = training_frame
+    candidates = [
+        ('linear', LinearRegression()),
+        ('gbr_a', GradientBoostingRegressor(n_estimators=30, random_state=0)),
+        ('gbr_b', GradientBoostingRegressor(n_estimators=30, max_depth=2, random_state=0)),
+    ]
+    model, score, trials = budgeted_model_search(X, y, candidates=candidates)
+
+    assert model.__class__ in (LinearRegression, GradientBoostingRegressor)
+    assert not hasattr(model, 'n_features_in_')  # returned unfitted
+    first_round = [t for t in trials if t['round'] == 0]
+    assert {t['model'] for t in first_round} == {'linear', 'gbr_a', 'gbr_b'}
+    assert len(trials) < 2 * len(candidates)
+    for trial in trials:
+        assert {'score', 'fit_seconds', 'single_row_latency_ms', 'batch_latency_per_row_ms'} <= set(trial)
+    assert score == max(t['score'] for t in trials if t['round'] == trials[-1]['round'])
+
+
+def test_latency_weight_can_change_the_winner(training_frame):
+    X, y = training_frame
+    candidates = [
+        ('gbr', GradientBoostingRegressor(n_estimators=30, random_state=0)),
+        ('linear', LinearRegression()),
+    ]
+    # Fixed latencies, so the outcome depends on the objective and not on the machine
+    for slow, winner in ((GradientBoostingRegressor, LinearRegression), (LinearRegression, GradientBoostingRegressor)):
+        def measure_latency(model, X):
+            return 0.01 if isinstance(model, slow) else 0.0
+
+        model, _, trials = budgeted_model_search(X, y, candidates=candidates, latency_weight=1000.0,
+                                                 measure_latency=measure_latency)
+        assert isinstance(model, winner)
+        assert {t['single_row_latency_ms'] for t in trials} <= {0.0, 10.0}
+
+
+def test_zero_budget_fails_cleanly(training_frame):
+    X, y = training_frame
+    with pytest.raises(ValueError):
+        budgeted_model_search(X, y, budget_seconds=0)
@@ -0,0 +1,56 @@
+import app
+from precompute import PrecomputeStore, data_version, precompute_forecasts
+
+
+def test_store_serves_only_current_entries(tmp_path):
+    store = PrecomputeStore(str(tmp_path / 'store.sqlite3'))
+    assert store.get('u1', 'v1', 'model-a', 5) is None
+    assert not (tmp_path / 'store.sqlite3').exists()
+
+    store.put('u1', 'v1', 'model-a', 5, b'{"forecastData": []}')
+    assert store.get('u1', 'v1', 'model-a', 5) == b'{"forecastData": []}'
+    assert store.get('u1', 'v2', 'model-a', 5) is None
+    assert store.get('u1', 'v1', 'model-b', 5) is None
+    assert store.get('u1', 'v1', 'model-a', 7) is None
+    assert store.stats() == {'path': str(tmp_path / 'store.sqlite3'), 'entries': 1,
+                             'hits': 1, 'misses': 1, 'stale': 3}
+
+
+def test_precomputed_payload_matches_live_prediction(client, sample_data):
+    users = [
+        ('a', sample_data, None),
+        ('b', sample_data[-45:], 'etl-2024-06-01'),
+        ('bad', [{'date': 'not a date', 'carbonFootprint': 1}], None),
+    ]
+    report = precompute_forecasts(users, app.precompute_store, app.DEFAULT_FORECAST_DAYS, workers=0)
+    assert (report['users'], report['stored'], report['failed']) == (3, 2, 1)
+
+    live = client.post('/predictions', json={'historicalData': sample_data}).get_json()
+    hit = client.post('/predictions', json={'userId': 'a', 'dataVersion': data_version(sample_data),
+                                            'historicalData': sample_data})
+    assert hit.headers['X-Precomputed'] == 'HIT'
+    for key in ('forecastData', 'insights', 'recommendations', 'anomalies', 'modelScore'):
+        assert hit.get_json()[key] == live[key]
+
+    # An explicit data version is enough, without resending the history
+    assert client.post('/predictions', json={'userId': 'b', 'dataVersion': 'etl-2024-06-01'}).status_code == 200
+    assert client.post('/predictions', json={'userId': 'b', 'dataVersion': 'etl-2024-06-02'}).status_code == 400
+
+    # Without a data version the store is not consulted, so the history is never hashed for it
+    before = app.precompute_store.stats()
+    response = client.post('/predictions', json={'userId': 'a', 'historicalData': sample_data})
+    assert response.status_code == 200 and 'X-Precomputed' not in response.headers
+    assert app.precompute_store.stats() == before
+
+
+def test_stale_entries_fall_back_to_live_without_writing_the_store(client, sample_data):
+    store = app.precompute_store
+    store.put('a', 'v1', 'old-model', app.DEFAULT_FORECAST_DAYS, b'{}')
+
+    request = {'userId': 'a', 'dataVersion': 'v1', 'historicalData': sample_data}
+    for _ in range(2):
+        response = client.post('/predictions', json=request)
+        assert response.status_code == 200 and 'X-Precomputed' not in response.headers
+    assert response.get_json()['forecastData']
+    assert store.get('a', 'v1', 'old-model', app.DEFAULT_FORECAST_DAYS) == b'{}'
+    assert client.get('/precomputed/stats').get_json()['stale'] == 2
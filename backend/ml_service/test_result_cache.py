@@ -0,0 +1,59 @@
+import os
+
+from result_cache import ResultCache, make_cache_key
+
+
+def test_key_depends_on_content_and_namespace():
+    history = [{'date': '2024-01-01', 'carbonFootprint': 10.0}]
+    reordered = [{'carbonFootprint': 10.0, 'date': '2024-01-01'}]
+    assert make_cache_key('m1', history, days=5) == make_cache_key('m1', reordered, days=5)
+    assert make_cache_key('m1', history, days=5) != make_cache_key('m2', history, days=5)
+    assert make_cache_key('m1', history, days=5) != make_cache_key('m1', history, days=6)
+
+
+def test_lru_eviction_respects_byte_budget():
+    cache = ResultCache(max_bytes=25, ttl=60)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    assert cache.get('a') is not None  # 'b' is now least recently used
+    cache.put('c', b'x' * 10)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 20
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    import result_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now[0])
+    cache = ResultCache(max_bytes=100, ttl=10)
+    cache.put('a', b'value')
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_disk_tier_survives_restart_and_namespace_switch(tmp_path):
+    cache = ResultCache(max_bytes=100, ttl=60, disk_dir=str(tmp_path))
+    cache.set_namespace('model-1')
+    cache.put('a', b'value')
+
+    restarted = ResultCache(max_bytes=100, ttl=60, disk_dir=str(tmp_path))
+    restarted.set_namespace('model-1')
+    assert restarted.get('a') == b'value'
+    assert restarted.stats()['diskHits'] == 1
+
+    restarted.set_namespace('model-2')
+    assert restarted.get('a') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_predictions_are_served_from_cache(client, sample_data):
+    first = client.post('/predictions', json={'historicalData': sample_data})
+    second = client.post('/predictions', json={'historicalData': sample_data})
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert first.get_json() == second.get_json()
+    assert client.get('/cache/stats').get_json()['hits'] == 1
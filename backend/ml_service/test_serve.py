@@ -0,0 +1,53 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_workers_share_one_socket_and_stop_cleanly(trained_model, sample_data, tmp_path):
+    port = free_port()
+    env = dict(os.environ, ML_SERVICE_PORT=str(port), ML_WORKERS='2')
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), 'serve.py')],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                if requests.get(f'{base_url}/health', timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.2)
+
+        # Workers were forked after warm-up, so each one reports ready immediately
+        assert requests.get(f'{base_url}/health', timeout=5).json()['status'] == 'ready'
+        for _ in range(4):
+            response = requests.post(f'{base_url}/predictions', json={'historicalData': sample_data}, timeout=30)
+            assert response.status_code == 200
+
+        # Appends land on either worker, so the user's state has to be shared between them
+        seed = requests.post(f'{base_url}/predictions/append',
+                             json={'userId': 'u1', 'historicalData': sample_data[:60]}, timeout=30)
+        assert seed.status_code == 200
+        for end in range(61, 71):
+            response = requests.post(f'{base_url}/predictions/append',
+                                     json={'userId': 'u1', 'newData': sample_data[end - 1:end]}, timeout=30)
+            assert response.status_code == 200, response.text
+            assert response.json()['dataPoints'] == end
+        assert requests.get(f'{base_url}/state/stats', timeout=5).json()['backend'] == 'sqlite'
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import app
+from service_module import load_service
+
+# A fresh interpreter with the gateway's directory ahead of the service's on
+# sys.path, as pytest arranges when it collects backend/test_ml_client.py too
+LOAD_WITH_GATEWAY_FIRST = """
+import sys
+sys.path[:0] = [sys.argv[1], sys.argv[2]]
+import app as gateway
+from service_module import load_service
+service = load_service()
+print(hasattr(gateway, 'ml_client'), service.__name__, hasattr(service, 'prepare_data'), load_service() is service)
+"""
+
+
+def test_service_is_found_even_when_another_app_comes_first():
+    assert load_service() is app
+
+    service_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, '-c', LOAD_WITH_GATEWAY_FIRST, os.path.dirname(service_dir), service_dir],
+                            capture_output=True, text=True, check=True, cwd=service_dir)
+    assert output.stdout.split() == ['True', 'ml_service_app', 'True', 'True']
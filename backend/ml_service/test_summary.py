@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import app
+from summary import summarize_history
+
+
+@pytest.fixture
+def history(sample_data):
+    # prepare_data keeps only the footprint, so attach a source breakdown afterwards
+    df = app.prepare_data(sample_data)
+    df['transportation'] = df['carbonFootprint'] * 0.5
+    df['energy'] = 4.0 + np.arange(len(df)) % 3
+    return df
+
+
+def test_summary_matches_pandas_statistics(history):
+    summary = summarize_history(history)
+    footprint = history['carbonFootprint']
+    changes = footprint.pct_change()
+
+    assert summary.count == len(history)
+    assert summary.mean == pytest.approx(footprint.mean())
+    assert summary.std == pytest.approx(footprint.std())
+    assert summary.trend == pytest.approx(changes.mean())
+    assert summary.trend_std == pytest.approx(changes.std())
+    assert summary.peak_value == footprint.max()
+    assert summary.peak_date == history.loc[footprint.idxmax(), 'date']
+
+    weekly = history.groupby('day_of_week')['carbonFootprint'].mean()
+    np.testing.assert_allclose(summary.weekday_means[weekly.index.to_numpy()], weekly.to_numpy())
+    weekend = history['day_of_week'].isin([5, 6])
+    assert summary.weekend_mean == pytest.approx(footprint[weekend].mean())
+    assert summary.weekday_mean == pytest.approx(footprint[~weekend].mean())
+
+    monthly = history.groupby('month')['carbonFootprint'].mean()
+    present = ~np.isnan(summary.month_means)
+    np.testing.assert_array_equal(np.flatnonzero(present) + 1, monthly.index.to_numpy())
+    np.testing.assert_allclose(summary.month_means[present], monthly.to_numpy())
+
+    assert list(summary.source_means) == ['transportation', 'energy']
+    assert summary.source_means['energy'] == pytest.approx(history['energy'].mean())
+
+
+def test_summary_is_read_only(history):
+    summary = summarize_history(history)
+    with pytest.raises(ValueError):
+        summary.month_means[0] = 0.0
+    with pytest.raises(TypeError):
+        summary.source_means['food'] = 1.0
+
+
+def test_generators_share_one_summary(history):
+    summary = summarize_history(history)
+    anomalies = app.detect_anomalies(history)
+
+    assert app.generate_insights(history, summary) == app.generate_insights(history)
+    assert (app.generate_recommendations(history, anomalies, summary)
+            == app.generate_recommendations(history, anomalies))
+    assert any('Transportation contributes' in insight for insight in app.generate_insights(history))
@@ -0,0 +1,69 @@
+import csv
+import json
+
+import numpy as np
+
+from synthetic_data import BLOCK_USERS, SyntheticDataGenerator, read_frames, write_dataset
+
+
+def stacked(chunks, name='carbonFootprint'):
+    return np.concatenate([chunk.columns[name] for chunk in chunks])
+
+
+def test_output_depends_on_seed_not_chunking():
+    make = lambda seed: SyntheticDataGenerator(users=3 * BLOCK_USERS + 5, days=40, seed=seed, end_date='2024-03-01')
+    whole = stacked(make(7).chunks(users_per_chunk=10_000))
+    np.testing.assert_array_equal(stacked(make(7).chunks(users_per_chunk=1)), whole)
+    assert whole.shape == (3 * BLOCK_USERS + 5, 40)
+    assert not np.array_equal(stacked(make(8).chunks()), whole)
+
+    # The first users are the same whatever the population size
+    small = SyntheticDataGenerator(users=3, days=40, seed=7, end_date='2024-03-01')
+    np.testing.assert_array_equal(stacked(small.chunks()), whole[:3])
+
+
+def test_calendar_effects_and_anomalies():
+    generator = SyntheticDataGenerator(users=BLOCK_USERS, days=364, seed=1, end_date='2023-12-31',
+                                       noise=0.0, user_spread=0.0, mix_spread=0.0, seasonality=0.0,
+                                       anomaly_rate=0.0)
+    chunk = next(generator.chunks())
+    weekend = (chunk.dates.astype(np.int64) + 3) % 7 >= 5
+    winter = np.isin(chunk.dates.astype('datetime64[M]').astype(np.int64) % 12 + 1, (12, 1, 2))
+    transport, energy = chunk.columns['transportation'][0], chunk.columns['energy'][0]
+    assert set(transport[weekend]) == {7.0} and set(transport[~weekend]) == {5.0}
+    assert set(energy[winter]) == {9.6} and set(energy[~winter]) == {8.0}
+
+    spiky = SyntheticDataGenerator(users=BLOCK_USERS, days=364, seed=1, anomaly_rate=0.1, noise=0.0,
+                                   user_spread=0.0, mix_spread=0.0, seasonality=0.0, end_date='2023-12-31')
+    spiked = next(spiky.chunks()).columns['transportation'] > chunk.columns['transportation']
+    assert 0.08 < spiked.mean() < 0.12
+
+
+def test_histories_match_the_api_layouts():
+    generator = SyntheticDataGenerator(users=2, days=5, seed=3, end_date='2024-01-05')
+    (user_id, rows), _ = list(generator.histories())
+    (_, columnar), _ = list(generator.histories('columnar'))
+    assert user_id == 0
+    assert [row['date'] for row in rows] == ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05']
+    assert columnar['start'] == '2024-01-01'
+    assert columnar['carbonFootprint'] == [row['carbonFootprint'] for row in rows]
+
+
+def test_written_formats_round_trip(tmp_path):
+    generator = SyntheticDataGenerator(users=BLOCK_USERS + 3, days=10, seed=5, end_date='2024-01-10')
+    expected = stacked(generator.chunks())
+
+    assert write_dataset(generator, tmp_path / 'data.frames', 'frames', users_per_chunk=1) == expected.size
+    np.testing.assert_array_equal(stacked(read_frames(tmp_path / 'data.frames')), expected)
+
+    write_dataset(generator, tmp_path / 'data.jsonl', 'json')
+    with open(tmp_path / 'data.jsonl') as f:
+        users = [json.loads(line) for line in f]
+    assert [user['userId'] for user in users] == list(range(BLOCK_USERS + 3))
+    assert [row['carbonFootprint'] for row in users[-1]['historicalData']] == expected[-1].tolist()
+
+    write_dataset(generator, tmp_path / 'data.csv', 'csv')
+    with open(tmp_path / 'data.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == expected.size
+    assert float(rows[-1]['carbonFootprint']) == expected[-1, -1]
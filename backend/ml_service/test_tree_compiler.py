@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+import app
+from tree_compiler import compile_gradient_boosting, fold_scaler_thresholds
+
+
+def sklearn_predict(model, scaler, X):
+    scaled = pd.DataFrame(scaler.transform(pd.DataFrame(X, columns=app.FEATURE_COLUMNS)),
+                          columns=app.FEATURE_COLUMNS)
+    return model.predict(scaled)
+
+
+def test_matches_sklearn_bit_for_bit_on_held_out_data(trained_model):
+    model, scaler = trained_model['model'], trained_model['scaler']
+    compiled = compile_gradient_boosting(model, scaler)
+
+    np.random.seed(123)
+    held_out = app.prepare_data(app.generate_sample_data(days=400))
+    X = held_out[app.FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    np.testing.assert_array_equal(compiled.predict(X), sklearn_predict(model, scaler, X))
+    np.testing.assert_array_equal(compiled.predict(X[0]), sklearn_predict(model, scaler, X[:1]))
+
+
+def test_matches_sklearn_at_split_boundaries(trained_model):
+    model, scaler = trained_model['model'], trained_model['scaler']
+    compiled = compile_gradient_boosting(model, scaler)
+    splits = np.flatnonzero(np.isfinite(compiled.threshold))
+
+    rng = np.random.default_rng(0)
+    base = app.prepare_data(app.generate_sample_data(days=60))[app.FEATURE_COLUMNS].to_numpy(dtype=float)
+    rows = base[rng.integers(len(base), size=3000)].copy()
+    picked = rng.choice(splits, size=len(rows))
+    direction = rng.choice([-np.inf, 0.0, np.inf], size=len(rows))
+    boundary = compiled.threshold[picked]
+    rows[np.arange(len(rows)), compiled.feature[picked]] = np.where(
+        direction == 0.0, boundary, np.nextafter(boundary, direction)
+    )
+
+    np.testing.assert_array_equal(compiled.predict(rows), sklearn_predict(model, scaler, rows))
+
+
+def test_folded_threshold_is_the_exact_boundary():
+    mean, scale = np.array([3.7]), np.array([0.37])
+    threshold = np.array([0.123456789])
+    folded = fold_scaler_thresholds(threshold, mean, scale)
+    scaled = lambda x: np.float32((x - mean[0]) / scale[0])
+    assert scaled(folded[0]) <= threshold[0]
+    assert scaled(np.nextafter(folded[0], np.inf)) > threshold[0]
+
+
+def test_compiled_forecast_matches_sklearn_forecast(trained_model, sample_data):
+    model, scaler = trained_model['model'], trained_model['scaler']
+    df = app.prepare_data(sample_data)
+    compiled = compile_gradient_boosting(model, scaler)
+    assert app.predict_future(df, compiled, None, 30) == app.predict_future(df, model, scaler, 30)
+
+
+def test_only_gradient_boosting_is_compiled():
+    with pytest.raises(ValueError):
+        compile_gradient_boosting(LinearRegression())
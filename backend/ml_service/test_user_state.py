@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import app
+from summary import summarize_history
+from user_state import STATE_WINDOW, MemoryStateStore, SQLiteStateStore, UserState
+
+
+@pytest.fixture
+def history(sample_data):
+    return app.prepare_data(sample_data)
+
+
+def test_chunked_appends_match_full_summary(history):
+    values = history['carbonFootprint'].to_numpy()
+    dates = app.wall_dates(history['date'])
+    state = UserState()
+    for chunk in np.array_split(np.arange(len(values)), [1, 2, 30, 31, 64]):
+        state = state.append(values[chunk], dates[chunk])
+
+    expected = summarize_history(history)
+    actual = state.summary()
+    for field in ('count', 'mean', 'std', 'trend', 'trend_std', 'peak_value', 'weekend_mean', 'weekday_mean'):
+        assert getattr(actual, field) == pytest.approx(getattr(expected, field)), field
+    assert actual.peak_date == expected.peak_date.date()
+    np.testing.assert_allclose(actual.weekday_means, expected.weekday_means)
+    np.testing.assert_allclose(actual.month_means, expected.month_means)
+
+    tail_values, tail_dates = state.tail(STATE_WINDOW)
+    np.testing.assert_array_equal(tail_values, values[-STATE_WINDOW:])
+    np.testing.assert_array_equal(tail_dates, dates[-STATE_WINDOW:].astype('datetime64[D]'))
+
+
+def test_append_returns_new_state_and_validates(history):
+    values = history['carbonFootprint'].to_numpy()
+    dates = app.wall_dates(history['date'])
+    state = UserState.from_history(values[:10], dates[:10])
+    updated = state.append(values[10:12], dates[10:12])
+    assert (state.count, updated.count) == (10, 12)
+
+    with pytest.raises(ValueError):
+        updated.append(values[5:6], dates[5:6])
+    with pytest.raises(ValueError):
+        updated.append([-1.0], dates[20:21])
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStateStore(max_users=2)
+    for user_id in ('a', 'b'):
+        store.update(user_id, lambda current: UserState())
+    store.get('a')
+    store.update('c', lambda current: UserState())
+    assert store.get('b') is None and store.get('a') is not None
+    assert store.stats()['evictions'] == 1
+
+
+def test_sqlite_store_round_trips_state(tmp_path, history):
+    values = history['carbonFootprint'].to_numpy()
+    dates = app.wall_dates(history['date'])
+    store = SQLiteStateStore(str(tmp_path / 'state.sqlite3'))
+    store.update('u', lambda current: UserState.from_history(values[:40], dates[:40]))
+    stored = store.update('u', lambda current: current.append(values[40:], dates[40:]))
+
+    reopened = SQLiteStateStore(str(tmp_path / 'state.sqlite3')).get('u')
+    assert reopened.to_dict() == stored.to_dict()
+    assert reopened.summary().mean == pytest.approx(values.mean())
+
+    # A failing update leaves the stored state untouched
+    with pytest.raises(ValueError):
+        store.update('u', lambda current: current.append(values[:1], dates[:1]))
+    assert store.get('u').count == len(values)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wire_format import (
+    COLUMNAR_BINARY_MIMETYPE, COLUMNAR_JSON_MIMETYPE, concat_histories, decode_frame,
+    encode_frame, history_columns, parse_dates
+)
+
+
+def test_frame_round_trip_is_zero_copy():
+    values = np.arange(10, dtype=np.float32)
+    document = {'days': 5, 'users': [{'userId': 'a', 'historicalData': {'startDay': 19000, 'carbonFootprint': values}}]}
+    frame = encode_frame(document)
+
+    decoded = decode_frame(frame)
+    array = decoded['users'][0]['historicalData']['carbonFootprint']
+    np.testing.assert_array_equal(array, values)
+    assert array.dtype == np.float32 and not array.flags.writeable
+    assert np.shares_memory(array, np.frombuffer(frame, dtype=np.uint8))
+    assert decoded['days'] == 5
+
+
+def test_malformed_frames_are_rejected():
+    with pytest.raises(ValueError):
+        decode_frame(b'nope')
+    with pytest.raises(ValueError):
+        decode_frame(encode_frame({'x': np.zeros(4)})[:-8])
+
+
+def test_history_layouts_produce_the_same_columns():
+    dense = history_columns({'start': '2024-02-27', 'carbonFootprint': [1.0, 2.0, 3.0]})
+    by_day = history_columns({'startDay': 19780, 'carbonFootprint': [1.0, 2.0, 3.0]})
+    np.testing.assert_array_equal(dense['date'], np.array(['2024-02-27', '2024-02-28', '2024-02-29'], dtype='datetime64[D]'))
+    np.testing.assert_array_equal(by_day['date'], dense['date'])
+
+    with pytest.raises(ValueError):
+        history_columns({'date': ['2024-01-01'], 'carbonFootprint': [1.0, 2.0]})
+
+    rows = [{'date': '2024-01-01', 'carbonFootprint': 1.0}]
+    assert history_columns(rows) is rows
+    joined = concat_histories({'start': '2023-12-31', 'carbonFootprint': [2.0]}, rows)
+    assert joined['carbonFootprint'].tolist() == [2.0, 1.0]
+
+
+@pytest.fixture
+def columnar_history(sample_data):
+    return {
+        'start': sample_data[0]['date'],
+        'carbonFootprint': np.array([point['carbonFootprint'] for point in sample_data])
+    }
+
+
+def test_iso_dates_parse_like_pandas():
+    dates = (np.datetime64('1600-01-01') + np.arange(0, 200_000, 7)).astype(str).tolist()
+    parsed = parse_dates(dates)
+    assert parsed.dtype == 'datetime64[s]'  # Fast path
+    assert (parsed == pd.to_datetime(dates)).all()
+    assert (parse_dates(pd.Series(dates)) == parsed).all()
+
+    # Other shapes fall back to pandas, errors and time zones included
+    assert parse_dates(['2024-03-01T12:00']).hour[0] == 12
+    assert str(parse_dates(['2024-03-01T00:00:00+05:00']).tz) == 'UTC+05:00'
+    assert parse_dates(['2024-03-01', None]).isnull().tolist() == [False, True]
+    for invalid in ('2023-02-29', '2024-13-01', '2024-00-10'):
+        with pytest.raises(ValueError):
+            parse_dates(['2024-01-01', invalid])
+
+
+def test_columnar_requests_match_row_requests(client, sample_data, columnar_history):
+    expected = client.post('/predictions', json={'historicalData': sample_data}).get_json()
+
+    as_json = client.post('/predictions', json={'historicalData': dict(
+        columnar_history, carbonFootprint=columnar_history['carbonFootprint'].tolist()
+    )}, headers={'Accept': COLUMNAR_JSON_MIMETYPE})
+    assert as_json.mimetype == COLUMNAR_JSON_MIMETYPE
+    body = as_json.get_json()
+    assert body['forecastData']['start'] == expected['forecastData'][0]['date']
+    assert body['forecastData']['predicted'] == [row['predicted'] for row in expected['forecastData']]
+    assert body['insights'] == expected['insights']
+
+    as_binary = client.post(
+        '/predictions', data=encode_frame({'historicalData': columnar_history}),
+        content_type=COLUMNAR_BINARY_MIMETYPE, headers={'Accept': COLUMNAR_BINARY_MIMETYPE}
+    )
+    assert as_binary.mimetype == COLUMNAR_BINARY_MIMETYPE
+    decoded = decode_frame(as_binary.get_data())
+    np.testing.assert_allclose(decoded['forecastData']['predicted'],
+                               [row['predicted'] for row in expected['forecastData']], rtol=1e-6)
+    assert decoded['anomalies'] == expected['anomalies']
+
+
+def test_binary_batch_requests(client, sample_data, columnar_history):
+    users = [{'userId': 'a', 'historicalData': columnar_history}, {'userId': 'b', 'historicalData': sample_data}]
+    response = client.post('/predictions/batch', data=encode_frame({'users': users}),
+                           content_type=COLUMNAR_BINARY_MIMETYPE)
+    assert response.mimetype == 'application/json'
+    first, second = response.get_json()['results']
+    assert first['forecastData'] == second['forecastData']
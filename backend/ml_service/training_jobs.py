@@ -0,0 +1,153 @@
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Stages reported by a training job, in order
+TRAINING_STAGES = ['prepare', 'scale', 'search', 'fit', 'fit_direct', 'validate', 'publish']
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def write_job_status(jobs_dir, job_id, status):
+    """Atomically write a job's status file so readers never see a partial update"""
+    os.makedirs(jobs_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=jobs_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, os.path.join(jobs_dir, f'{job_id}.json'))
+
+
+def read_job_status(jobs_dir, job_id):
+    """Return a job's status dict, or None if the job is unknown"""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    try:
+        with open(os.path.join(jobs_dir, f'{job_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class JobProgress:
+    """Tracks stage timings for a running job and persists them after every change"""
+
+    def __init__(self, jobs_dir, status):
+        self.jobs_dir = jobs_dir
+        self.status = status
+        self.stages = [stage for stage in TRAINING_STAGES if stage != 'search' or status['search']]
+        self._stage = None
+        self._stage_started = None
+
+    def _save(self):
+        write_job_status(self.jobs_dir, self.status['id'], self.status)
+
+    def _close_stage(self):
+        if self._stage is not None:
+            self.status['timings'][self._stage] = round(time.perf_counter() - self._stage_started, 4)
+            self._stage = None
+
+    def stage(self, name):
+        self._close_stage()
+        self._stage = name
+        self._stage_started = time.perf_counter()
+        self.status['stage'] = name
+        self.status['progress'] = round(self.stages.index(name) / len(self.stages), 2)
+        self._save()
+
+    def finish(self, **fields):
+        self._close_stage()
+        self.status.update(fields, stage=None, finishedAt=_now())
+        self._save()
+
+
+def run_training_job(jobs_dir, job_id, historical_data, search, cohort=None):
+    """Process-pool entry point: prepare data, train, and publish a new model"""
+    # Imported here so the serving process does not pay for it at submit time
+    from service_module import load_service
+
+    app = load_service()
+
+    status = read_job_status(jobs_dir, job_id)
+    status.update(state='running', startedAt=_now())
+    progress = JobProgress(jobs_dir, status)
+    try:
+        progress.stage('prepare')
+        df = app.prepare_data(historical_data)
+        if len(df) < app.MIN_DATA_POINTS:
+            raise ValueError(f"At least {app.MIN_DATA_POINTS} data points are required for training")
+        _, _, validation_score = app.train_model(df, search=search, report=progress.stage, cohort=cohort)
+        progress.finish(state='succeeded', progress=1.0, validationScore=validation_score)
+    except Exception as e:
+        progress.finish(state='failed', error=str(e))
+
+
+class TrainingJobs:
+    """Runs training jobs in a separate process pool and tracks them on disk.
+
+    Job status lives in one JSON file per job under ``jobs_dir``, so any
+    serving worker can report on a job no matter which one accepted it.
+    """
+
+    def __init__(self, jobs_dir, max_workers=1):
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork: forking a threaded web server can deadlock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, historical_data, search=None, cohort=None):
+        """Queue a training job, for the global model or a cohort's, and return its id"""
+        job_id = uuid.uuid4().hex
+        write_job_status(self.jobs_dir, job_id, {
+            'id': job_id,
+            'state': 'queued',
+            'search': search,
+            'cohort': cohort,
+            'stage': None,
+            'progress': 0.0,
+            'timings': {},
+            'validationScore': None,
+            'error': None,
+            'submittedAt': _now(),
+            'dataPoints': len(historical_data)
+        })
+        future = self._pool().submit(run_training_job, self.jobs_dir, job_id, historical_data, search, cohort)
+        future.add_done_callback(lambda f: self._record_crash(job_id, f))
+        return job_id
+
+    def _record_crash(self, job_id, future):
+        """Mark a job failed if its worker process died before it could report"""
+        error = future.exception()
+        if error is None:
+            return
+        status = read_job_status(self.jobs_dir, job_id) or {'id': job_id}
+        status.update(state='failed', error=f'Training worker failed: {str(error)}', finishedAt=_now())
+        write_job_status(self.jobs_dir, job_id, status)
+
+    def status(self, job_id):
+        return read_job_status(self.jobs_dir, job_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,152 @@
+import numpy as np
+
+_MAGNITUDE_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+
+
+def _ordered_keys(values):
+    """Map float64 values to int64 keys with the same ordering"""
+    bits = values.view(np.int64)
+    return np.where(bits < 0, bits ^ _MAGNITUDE_MASK, bits)
+
+
+def _from_ordered_keys(keys):
+    return np.where(keys < 0, keys ^ _MAGNITUDE_MASK, keys).view(np.float64)
+
+
+def fold_scaler_thresholds(thresholds, mean, scale):
+    """Raw-feature thresholds equivalent to splitting on scaled float32 features.
+
+    sklearn trees compare ``float32((x - mean) / scale) <= threshold``. That
+    expression is monotonic in ``x``, so the same decision is ``x <= T`` for the
+    largest float64 ``T`` that still satisfies it. ``T`` is found exactly by
+    bisecting over the ordered bit patterns of float64, so the folded split
+    agrees with the scaled one for every input, not just approximately.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.broadcast_to(np.asarray(mean, dtype=np.float64), thresholds.shape)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), thresholds.shape)
+
+    def goes_left(raw):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((raw - mean) / scale).astype(np.float32) <= thresholds
+
+    # Invariant: lo always goes left (-inf does) and hi always goes right (+inf does)
+    lo = _ordered_keys(np.full(thresholds.shape, -np.inf))
+    hi = _ordered_keys(np.full(thresholds.shape, np.inf))
+    for _ in range(64):
+        active = hi > lo + 1
+        if not active.any():
+            break
+        mid = lo // 2 + hi // 2 + (lo % 2 + hi % 2) // 2
+        left = goes_left(_from_ordered_keys(mid))
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
+    return _from_ordered_keys(lo)
+
+
+class CompiledTreeModel:
+    """A GradientBoostingRegressor flattened into contiguous NumPy arrays.
+
+    All trees share one node table (``feature``, ``threshold``, ``left``,
+    ``right``, ``value``). Leaves point at themselves, so every tree can be
+    walked in lockstep for ``max_depth`` steps over a whole batch. Thresholds
+    are expressed on raw, unscaled features, and predictions are summed in
+    sklearn's stage order so results match ``model.predict`` bit for bit.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, init, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.init = init
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    def predict(self, X):
+        """Predict from raw (unscaled) features, one row or a batch"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            goes_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(goes_left, self.left[nodes], self.right[nodes])
+
+        # Sequential accumulation from the init value reproduces sklearn's rounding
+        contributions = np.empty((X.shape[0], len(self.roots) + 1))
+        contributions[:, 0] = self.init
+        contributions[:, 1:] = self.value[nodes]
+        return np.cumsum(contributions, axis=1)[:, -1]
+
+
+def compile_gradient_boosting(model, scaler=None):
+    """Export a fitted GradientBoostingRegressor (and its StandardScaler) to a CompiledTreeModel"""
+    # Unpickling the model has already imported these; serving never pays for them up front
+    from sklearn.dummy import DummyRegressor
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    if not isinstance(model, GradientBoostingRegressor):
+        raise ValueError(f"Cannot compile {type(model).__name__}")
+    if model.init_ == 'zero':
+        init = 0.0
+    elif isinstance(model.init_, DummyRegressor):
+        init = float(np.asarray(model.init_.constant_, dtype=np.float64).ravel()[0])
+    else:
+        raise ValueError("Only the default init estimator can be compiled")
+    if scaler is not None and not isinstance(scaler, StandardScaler):
+        raise ValueError(f"Cannot fold {type(scaler).__name__} into thresholds")
+
+    n_features = model.n_features_in_
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    if scaler is not None:
+        if scaler.mean_ is not None:
+            mean = scaler.mean_
+        if scaler.scale_ is not None:
+            scale = scaler.scale_
+
+    features, thresholds, leaves, lefts, rights, values, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        is_leaf = tree.children_left == -1
+        own_index = np.arange(n_nodes) + offset
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+        thresholds.append(tree.threshold)
+        leaves.append(is_leaf)
+        lefts.append(np.where(is_leaf, own_index, tree.children_left + offset))
+        rights.append(np.where(is_leaf, own_index, tree.children_right + offset))
+        # Same product sklearn adds per stage: learning_rate * leaf value
+        values.append(model.learning_rate * tree.value[:, 0, 0])
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    feature = np.ascontiguousarray(np.concatenate(features))
+    is_leaf = np.concatenate(leaves)
+    # Fold every split of every tree in one vectorized pass
+    threshold = fold_scaler_thresholds(np.concatenate(thresholds), mean[feature], scale[feature])
+    threshold[is_leaf] = np.inf
+
+    return CompiledTreeModel(
+        feature=feature,
+        threshold=np.ascontiguousarray(threshold),
+        left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+        right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+        value=np.ascontiguousarray(np.concatenate(values)),
+        roots=np.asarray(roots, dtype=np.intp),
+        init=init,
+        max_depth=max_depth,
+        n_features=n_features
+    )
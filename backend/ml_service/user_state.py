@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from features import calendar_features
+from forecaster import HISTORY_WINDOW
+from summary import summary_from_aggregates
+
+# Values kept per user: enough for every forecast feature and the anomaly window
+STATE_WINDOW = HISTORY_WINDOW
+
+
+def _merge_moments(count, mean, m2, values):
+    """Fold a chunk into running count/mean/sum-of-squared-deviations (Chan et al.)"""
+    n = len(values)
+    if n == 0:
+        return count, mean, m2
+    chunk_mean = float(values.mean())
+    chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+    if count == 0:
+        return n, chunk_mean, chunk_m2
+    total = count + n
+    with np.errstate(invalid='ignore', over='ignore'):
+        delta = chunk_mean - mean
+        mean = mean + delta * n / total
+        m2 = m2 + chunk_m2 + delta * delta * count * n / total
+    return total, float(mean), float(m2)
+
+
+def _std(count, m2):
+    return float(np.sqrt(m2 / (count - 1))) if count > 1 else float('nan')
+
+
+class UserState:
+    """Everything needed to serve one user's predictions without their full history.
+
+    Holds the last ``STATE_WINDOW`` values and their days, running moments of
+    the footprint and of its day-over-day percentage change, the peak, and
+    per-weekday and per-month sums. Its size is fixed no matter how long the
+    history grows. ``append`` returns a new state, so a snapshot handed to one
+    request is never changed by another.
+    """
+
+    __slots__ = ('values', 'days', 'count', 'mean', 'm2', 'change_count', 'change_mean',
+                 'change_m2', 'peak_value', 'peak_day', 'day_sums', 'day_counts',
+                 'month_sums', 'month_counts')
+
+    def __init__(self, values=(), days=(), count=0, mean=0.0, m2=0.0, change_count=0,
+                 change_mean=0.0, change_m2=0.0, peak_value=float('nan'), peak_day=None,
+                 day_sums=None, day_counts=None, month_sums=None, month_counts=None):
+        self.values = np.asarray(values, dtype=float)
+        self.days = np.asarray(days, dtype=np.int64)
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.change_count = change_count
+        self.change_mean = change_mean
+        self.change_m2 = change_m2
+        self.peak_value = peak_value
+        self.peak_day = peak_day
+        self.day_sums = np.zeros(7) if day_sums is None else np.asarray(day_sums, dtype=float)
+        self.day_counts = np.zeros(7, dtype=np.int64) if day_counts is None else np.asarray(day_counts, dtype=np.int64)
+        self.month_sums = np.zeros(12) if month_sums is None else np.asarray(month_sums, dtype=float)
+        self.month_counts = np.zeros(12, dtype=np.int64) if month_counts is None else np.asarray(month_counts, dtype=np.int64)
+
+    @classmethod
+    def from_history(cls, values, dates):
+        """State for a full history of values and their ``datetime64`` dates"""
+        values = np.asarray(values, dtype=float)
+        # Leading gaps that interpolation could not fill carry no information
+        valid = ~np.isnan(values)
+        return cls().append(values[valid], np.asarray(dates)[valid])
+
+    @property
+    def last_date(self):
+        return np.datetime64(int(self.days[-1]), 'D') if len(self.days) else None
+
+    def tail(self, n):
+        """The ``n`` most recent values and their ``datetime64[D]`` days"""
+        start = max(len(self.values) - n, 0)
+        return self.values[start:], self.days[start:].astype('datetime64[D]')
+
+    def append(self, values, dates):
+        """New state with ``values`` (in date order, after ``last_date``) folded in"""
+        values = np.asarray(values, dtype=float)
+        days = np.asarray(dates).astype('datetime64[D]')
+        if len(values) != len(days):
+            raise ValueError("Values and dates must have the same length")
+        if len(values) == 0:
+            return self
+        if np.isnan(values).any():
+            raise ValueError("Missing carbon footprint values in new data")
+        if (values < 0).any():
+            raise ValueError("Negative carbon footprint values detected")
+        if (np.diff(days.astype(np.int64)) < 0).any():
+            raise ValueError("New data must be in date order")
+        if self.last_date is not None and days[0] <= self.last_date:
+            raise ValueError(f"New data must start after {self.last_date}")
+
+        # Percentage changes continue from the last stored value
+        chain = np.concatenate((self.values[-1:], values))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            changes = chain[1:] / chain[:-1] - 1
+        changes = changes[~np.isnan(changes)]
+
+        calendar = calendar_features(days)
+        day_of_week = calendar['day_of_week'].astype(np.intp)
+        month = calendar['month'].astype(np.intp) - 1
+
+        peak_position = int(np.argmax(values))
+        peak_value, peak_day = self.peak_value, self.peak_day
+        # Strictly greater keeps the first occurrence of the peak, as idxmax does
+        if peak_day is None or values[peak_position] > peak_value:
+            peak_value = float(values[peak_position])
+            peak_day = int(days[peak_position].astype(np.int64))
+
+        count, mean, m2 = _merge_moments(self.count, self.mean, self.m2, values)
+        change_count, change_mean, change_m2 = _merge_moments(
+            self.change_count, self.change_mean, self.change_m2, changes
+        )
+        return UserState(
+            values=np.concatenate((self.values, values))[-STATE_WINDOW:],
+            days=np.concatenate((self.days, days.astype(np.int64)))[-STATE_WINDOW:],
+            count=count,
+            mean=mean,
+            m2=m2,
+            change_count=change_count,
+            change_mean=change_mean,
+            change_m2=change_m2,
+            peak_value=peak_value,
+            peak_day=peak_day,
+            day_sums=self.day_sums + np.bincount(day_of_week, weights=values, minlength=7),
+            day_counts=self.day_counts + np.bincount(day_of_week, minlength=7),
+            month_sums=self.month_sums + np.bincount(month, weights=values, minlength=12),
+            month_counts=self.month_counts + np.bincount(month, minlength=12),
+        )
+
+    def summary(self):
+        """The HistorySummary of the whole history this state has seen"""
+        return summary_from_aggregates(
+            count=self.count,
+            mean=self.mean if self.count else float('nan'),
+            std=_std(self.count, self.m2),
+            trend=self.change_mean if self.change_count else float('nan'),
+            trend_std=_std(self.change_count, self.change_m2),
+            peak_value=self.peak_value,
+            peak_date=None if self.peak_day is None else np.datetime64(self.peak_day, 'D').astype(object),
+            day_sums=self.day_sums,
+            day_counts=self.day_counts,
+            month_sums=self.month_sums,
+            month_counts=self.month_counts,
+            source_means={},
+        )
+
+    def to_dict(self):
+        return {
+            name: value.tolist() if isinstance(value, np.ndarray) else value
+            for name, value in ((name, getattr(self, name)) for name in self.__slots__)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class MemoryStateStore:
+    """Per-process user states with least-recently-used eviction past ``max_users``"""
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, user_id):
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None:
+                self._states.move_to_end(user_id)
+            return state
+
+    def update(self, user_id, apply):
+        """Replace a user's state with ``apply(current_state_or_None)`` atomically"""
+        with self._lock:
+            state = apply(self._states.get(user_id))
+            self._states[user_id] = state
+            self._states.move_to_end(user_id)
+            while len(self._states) > self.max_users:
+                self._states.popitem(last=False)
+                self._evictions += 1
+            return state
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'users': len(self._states),
+                    'maxUsers': self.max_users, 'evictions': self._evictions}
+
+
+class SQLiteStateStore:
+    """User states in a SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS user_state ('
+                'user_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; update() manages its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._connection().execute(
+            'SELECT state FROM user_state WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return UserState.from_dict(json.loads(row[0])) if row else None
+
+    def update(self, user_id, apply):
+        """Replace a user's state with ``apply(current_state_or_None)`` atomically"""
+        conn = self._connection()
+        # Take the write lock up front so concurrent appends for a user serialize
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT state FROM user_state WHERE user_id = ?', (user_id,)).fetchone()
+            state = apply(UserState.from_dict(json.loads(row[0])) if row else None)
+            conn.execute(
+                'INSERT OR REPLACE INTO user_state (user_id, state, updated_at) VALUES (?, ?, ?)',
+                (user_id, json.dumps(state.to_dict()), time.time())
+            )
+            conn.execute('COMMIT')
+            return state
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        users = self._connection().execute('SELECT COUNT(*) FROM user_state').fetchone()[0]
+        return {'backend': 'sqlite', 'users': users, 'path': self.path}
+
+
+def create_state_store(backend, path=None, max_users=10000):
+    """Build the user state store named by ``backend`` ('memory' or 'sqlite')"""
+    if backend == 'memory':
+        return MemoryStateStore(max_users)
+    if backend == 'sqlite':
+        return SQLiteStateStore(path)
+    raise ValueError(f"Unknown user state backend: {backend}")
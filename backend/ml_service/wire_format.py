@@ -0,0 +1,195 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+JSON_MIMETYPE = 'application/json'
+COLUMNAR_JSON_MIMETYPE = 'application/vnd.ecotrack.columnar+json'
+COLUMNAR_BINARY_MIMETYPE = 'application/vnd.ecotrack.columnar'
+RESPONSE_MIMETYPES = [JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE, COLUMNAR_BINARY_MIMETYPE]
+
+FRAME_MAGIC = b'ECOC'
+FRAME_PREFIX = struct.Struct('<4sI')  # magic, header length
+FRAME_ALIGNMENT = 8
+ARRAY_TAG = '$array'
+ISO_DIGIT_POSITIONS = [0, 1, 2, 3, 5, 6, 8, 9]  # YYYY-MM-DD
+ISO_DASH_POSITIONS = [4, 7]
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+DAYS_BEFORE_MONTH = np.concatenate(([0], np.cumsum(DAYS_IN_MONTH)[:-1]))
+
+
+def _aligned(offset):
+    return -(-offset // FRAME_ALIGNMENT) * FRAME_ALIGNMENT
+
+
+def encode_frame(document):
+    """Serialize a JSON-like document whose NumPy arrays travel as raw bytes.
+
+    Layout: ``b'ECOC'``, a little-endian uint32 header length, the UTF-8 JSON
+    header, then every array's bytes, each aligned to 8 bytes. In the header an
+    array is replaced by ``{"$array": [dtype, offset, length]}`` with ``offset``
+    counted from the start of the data section.
+    """
+    chunks = []
+    size = 0
+
+    def replace(value):
+        nonlocal size
+        if isinstance(value, np.ndarray):
+            array = np.ascontiguousarray(value)
+            if array.dtype.byteorder == '>':
+                array = array.astype(array.dtype.newbyteorder('<'))
+            offset = _aligned(size)
+            chunks.append((offset, array))
+            size = offset + array.nbytes
+            return {ARRAY_TAG: [array.dtype.str, offset, len(array)]}
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [replace(item) for item in value]
+        return value
+
+    header = json.dumps(replace(document), separators=(',', ':')).encode()
+    data_start = _aligned(FRAME_PREFIX.size + len(header))
+    frame = bytearray(data_start + size)
+    FRAME_PREFIX.pack_into(frame, 0, FRAME_MAGIC, len(header))
+    frame[FRAME_PREFIX.size:FRAME_PREFIX.size + len(header)] = header
+    for offset, array in chunks:
+        start = data_start + offset
+        frame[start:start + array.nbytes] = array.tobytes()
+    return bytes(frame)
+
+
+def decode_frame(buffer):
+    """Inverse of encode_frame; arrays are read-only views into ``buffer``, not copies"""
+    try:
+        magic, header_length = FRAME_PREFIX.unpack_from(buffer, 0)
+        if magic != FRAME_MAGIC:
+            raise ValueError("Not a columnar frame")
+        header_end = FRAME_PREFIX.size + header_length
+        document = json.loads(bytes(buffer[FRAME_PREFIX.size:header_end]))
+        data_start = _aligned(header_end)
+    except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Malformed columnar frame: {str(e)}")
+
+    def restore(value):
+        if isinstance(value, dict):
+            if ARRAY_TAG in value:
+                dtype, offset, length = value[ARRAY_TAG]
+                return np.frombuffer(buffer, dtype=np.dtype(dtype), count=length, offset=data_start + offset)
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        return value
+
+    try:
+        return restore(document)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Malformed columnar frame: {str(e)}")
+
+
+def history_columns(history):
+    """Column arrays for ``pd.DataFrame`` from either history layout.
+
+    Row layout (a list of per-day dicts) passes through unchanged. Columnar
+    layout is a dict of parallel arrays: ``date`` with one entry per value, or
+    a dense daily series from ``start`` (ISO date) or ``startDay`` (days since
+    1970-01-01). Array columns are used as they are, without a per-row pass.
+    """
+    if not isinstance(history, dict):
+        return history
+    if 'carbonFootprint' not in history:
+        raise ValueError("Missing required columns in data")
+
+    columns = {name: np.asarray(values) for name, values in history.items()
+               if name not in ('start', 'startDay')}
+    n = len(columns['carbonFootprint'])
+    if 'date' not in columns:
+        if 'startDay' in history:
+            start = np.datetime64(int(history['startDay']), 'D')
+        elif 'start' in history:
+            start = np.datetime64(history['start'], 'D')
+        else:
+            raise ValueError("Missing required columns in data")
+        columns['date'] = start + np.arange(n)
+    if any(len(values) != n for values in columns.values()):
+        raise ValueError("Columns must all have the same length")
+    return columns
+
+
+def _iso_dates(strings):
+    """``datetime64[D]`` for a list of ``YYYY-MM-DD`` strings, or None unless all are valid dates"""
+    try:
+        if set(map(len, strings)) != {10}:
+            return None
+        codes = np.frombuffer(''.join(strings).encode('ascii'), dtype=np.uint8).reshape(len(strings), 10)
+    except (TypeError, UnicodeEncodeError):
+        return None
+    digits = codes[:, ISO_DIGIT_POSITIONS] - np.uint8(ord('0'))  # Non-digits wrap around to large values
+    if not ((digits <= 9).all() and (codes[:, ISO_DASH_POSITIONS] == ord('-')).all()):
+        return None
+    digits = digits.astype(np.int64)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    if not ((month >= 1) & (month <= 12)).all():
+        return None
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month = month - 1
+    if not ((day >= 1) & (day <= DAYS_IN_MONTH[month] + (leap & (month == 1)))).all():
+        return None
+    # Days since 1970-01-01 in the proleptic Gregorian calendar; 477 leap days fall before 1970
+    previous = year - 1
+    leap_days = previous // 4 - previous // 100 + previous // 400 - 477
+    days = (year - 1970) * 365 + leap_days + DAYS_BEFORE_MONTH[month] + (leap & (month > 1)) + day - 1
+    return days.astype('datetime64[D]')
+
+
+def parse_dates(values):
+    """Dates as a ``pd.DatetimeIndex``, parsing plain ISO ``YYYY-MM-DD`` strings without pandas.
+
+    When every value is a string of exactly that shape, the digits are read
+    from one joined byte buffer and turned into days with array arithmetic.
+    Anything else (times, offsets, other formats, missing or impossible dates)
+    goes through ``pd.to_datetime`` as before, so errors and time zones are
+    unchanged.
+    """
+    if isinstance(values, (pd.Series, pd.Index)):
+        values = values.to_numpy()
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind == 'M':
+            return pd.DatetimeIndex(values)
+        strings = values.tolist()
+    else:
+        strings = values
+    dates = _iso_dates(strings) if len(strings) else None
+    if dates is not None:
+        return pd.DatetimeIndex(dates.astype('datetime64[s]'))
+    return pd.DatetimeIndex(pd.to_datetime(values))
+
+
+def concat_histories(*histories):
+    """Join histories given in either layout, in order"""
+    if all(isinstance(history, list) for history in histories):
+        return [row for history in histories for row in history]
+    return pd.concat([pd.DataFrame(history_columns(history)) for history in histories], ignore_index=True)
+
+
+def columnar_forecast(rows, binary=False):
+    """``forecastData`` rows as a start date and dense predictions (float32 in binary frames)"""
+    predicted = [row['predicted'] for row in rows]
+    return {
+        'start': rows[0]['date'] if rows else None,
+        'predicted': np.asarray(predicted, dtype=np.float32) if binary else predicted
+    }
+
+
+def to_columnar(payload, binary=False):
+    """Rewrite every ``forecastData`` in a response payload into columnar form"""
+    payload = dict(payload)
+    if 'forecastData' in payload:
+        payload['forecastData'] = columnar_forecast(payload['forecastData'], binary)
+    if isinstance(payload.get('results'), list):
+        payload['results'] = [to_columnar(result, binary) for result in payload['results']]
+    return payload
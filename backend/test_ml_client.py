@@ -0,0 +1,211 @@
+import importlib.util
+import io
+import os
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+import requests
+
+import ml_client
+from ml_client import BufferedResponse, MLServiceClient, RequestCoalescer
+
+
+def upstream_response(status, body, content_type='application/json', headers=None):
+    """A requests.Response as the session returns it for a streamed call"""
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(body)
+    response.headers.update({'Content-Type': content_type, 'Content-Length': str(len(body)), **(headers or {})})
+    return response
+
+
+@pytest.fixture
+def client():
+    """MLServiceClient whose session is a mock, so no call leaves the process"""
+    client = MLServiceClient('http://ml-service:5001/', connect_timeout=1.0, read_timeout=2.0)
+    client.session = mock.Mock()
+    return client
+
+
+@pytest.fixture
+def gateway(client, monkeypatch):
+    """Test client for the gateway app proxying through ``client``.
+
+    Loaded from its file under its own name, since the ML service's module is
+    also called ``app``.
+    """
+    spec = importlib.util.spec_from_file_location('gateway_app', os.path.join(os.path.dirname(__file__), 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'ml_client', client)
+    return module.app.test_client()
+
+
+def test_post_streams_the_body_and_updates_the_metrics(client):
+    client.session.post.return_value = upstream_response(200, b'{"predictions": []}')
+    status, headers, body = client.post('/predictions', b'{}', accept='application/json')
+
+    args, kwargs = client.session.post.call_args
+    assert args == ('http://ml-service:5001/predictions',)
+    assert kwargs['timeout'] == (1.0, 2.0) and kwargs['stream'] is True
+    assert kwargs['headers'] == {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    assert client.metrics.snapshot()['inFlight'] == 1
+
+    assert status == 200 and headers['Content-Type'] == 'application/json'
+    assert b''.join(body) == b'{"predictions": []}'
+    body.close()  # A second close, as WSGI servers do, is not counted again
+    metrics = client.metrics.snapshot()
+    assert (metrics['requests'], metrics['errors'], metrics['inFlight'], metrics['maxInFlight']) == (1, 0, 0, 1)
+    assert metrics['latencySeconds']['count'] == 1
+    assert metrics['latencySeconds']['buckets'][-1] == {'le': '+Inf', 'count': 1}
+
+
+def test_timeout_maps_to_504_and_counts_as_a_timeout(client, gateway):
+    client.session.post.side_effect = requests.exceptions.ReadTimeout('read timed out')
+    response = gateway.post('/api/ml/predictions', json={'historicalData': []})
+    assert response.status_code == 504
+    assert 'timed out' in response.get_json()['error']
+    metrics = client.metrics.snapshot()
+    assert (metrics['requests'], metrics['errors'], metrics['timeouts'], metrics['inFlight']) == (1, 1, 1, 0)
+
+
+def test_connection_error_maps_to_500(client, gateway):
+    client.session.post.side_effect = requests.exceptions.ConnectionError('connection refused')
+    response = gateway.post('/api/ml/predictions/append', json={'userId': 'u1'})
+    assert response.status_code == 500
+    assert response.get_json()['error'].startswith('Failed to connect to ML service')
+    metrics = client.metrics.snapshot()
+    assert (metrics['errors'], metrics['timeouts'], metrics['inFlight']) == (1, 0, 0)
+
+
+def test_client_errors_pass_through_untouched(client, gateway):
+    body = b'{"error": "At least 30 days of historical data required"}'
+    client.session.post.return_value = upstream_response(400, body)
+    response = gateway.post('/api/ml/predictions', data=b'{"historicalData": []}', content_type='application/json')
+    assert response.status_code == 400
+    assert response.data == body and response.headers['Content-Type'] == 'application/json'
+    metrics = client.metrics.snapshot()
+    assert (metrics['requests'], metrics['errors'], metrics['inFlight']) == (1, 0, 0)
+
+
+def run_concurrently(coalescer, key, fetch, n):
+    """Call ``coalescer.run(key, fetch)`` from ``n`` threads; returns each one's result or exception"""
+    results = [None] * n
+
+    def call(i):
+        try:
+            results[i] = coalescer.run(key, fetch)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def blocking_fetch(coalescer, waiters, result):
+    """Upstream stub that holds its call until ``waiters`` callers are waiting on it"""
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        deadline = time.monotonic() + 10
+        while coalescer.stats()['coalesced'] < waiters and time.monotonic() < deadline:
+            time.sleep(0.001)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fetch, calls
+
+
+def test_concurrent_identical_requests_make_one_upstream_call():
+    coalescer = RequestCoalescer(ttl=5.0)
+    upstream = BufferedResponse(200, 'application/json', {}, b'{"forecastData": []}')
+    fetch, calls = blocking_fetch(coalescer, 7, upstream)
+    threads, results = run_concurrently(coalescer, 'key', fetch, 8)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(calls) == 1
+    assert all(response is upstream for response, _ in results)
+    assert sorted(outcome for _, outcome in results) == ['coalesced'] * 7 + ['forwarded']
+    assert coalescer.run('key', fetch) == (upstream, 'cached') and len(calls) == 1
+
+
+def test_upstream_errors_reach_every_waiter_and_are_not_cached():
+    coalescer = RequestCoalescer(ttl=5.0)
+    error = ConnectionError('connection refused')
+    fetch, calls = blocking_fetch(coalescer, 3, error)
+    threads, results = run_concurrently(coalescer, 'key', fetch, 4)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert len(calls) == 1 and all(result is error for result in results)
+    assert coalescer.stats()['cacheEntries'] == 0
+    # Error statuses are shared with waiters but not cached either
+    failed = BufferedResponse(503, 'application/json', {}, b'{"error": "Model is not available"}')
+    assert coalescer.run('key', lambda: failed) == (failed, 'forwarded')
+    assert coalescer.run('key', lambda: failed) == (failed, 'forwarded')
+    assert coalescer.stats()['cacheEntries'] == 0
+
+
+def test_cached_responses_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ml_client, 'time', SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter))
+    coalescer = RequestCoalescer(ttl=5.0)
+    first = BufferedResponse(200, 'application/json', {}, b'1')
+    second = BufferedResponse(200, 'application/json', {}, b'2')
+
+    assert coalescer.run('key', lambda: first) == (first, 'forwarded')
+    now[0] += 4.9
+    assert coalescer.run('key', lambda: second) == (first, 'cached')
+    now[0] += 0.2
+    assert coalescer.run('key', lambda: second) == (second, 'forwarded')
+    assert coalescer.stats()['cacheBytes'] == 1
+
+
+def test_gateway_passes_ml_service_headers_through(client, gateway):
+    headers = {'X-Cache': 'MISS', 'Server-Timing': 'predict;dur=1.5', 'X-Internal': 'dropped'}
+    client.session.post.side_effect = lambda *args, **kwargs: upstream_response(200, b'{}', headers=headers)
+
+    streamed = gateway.post('/api/ml/predictions/append', json={'userId': 'u1'})
+    assert streamed.headers['X-Cache'] == 'MISS' and streamed.headers['Server-Timing'] == 'predict;dur=1.5'
+    assert 'X-Internal' not in streamed.headers
+
+    client.coalescer = RequestCoalescer(ttl=5.0)
+    for outcome in ('FORWARDED', 'CACHED'):
+        response = gateway.post('/api/ml/predictions', json={'historicalData': []})
+        assert response.headers['X-Gateway-Cache'] == outcome
+        assert response.headers['X-Cache'] == 'MISS' and response.headers['Server-Timing'] == 'predict;dur=1.5'
+        assert 'X-Internal' not in response.headers
+    assert client.session.post.call_count == 2
+
+
+def test_bodies_larger_than_the_budget_are_not_cached():
+    coalescer = RequestCoalescer(ttl=5.0, max_bytes=10)
+    small = BufferedResponse(200, 'application/json', {}, b'12345')
+    large = BufferedResponse(200, 'application/json', {}, b'x' * 11)
+
+    coalescer.run('small', lambda: small)
+    assert coalescer.run('large', lambda: large) == (large, 'forwarded')
+    assert coalescer.run('large', lambda: large) == (large, 'forwarded')
+    # The entry already cached survives
+    assert coalescer.run('small', lambda: None) == (small, 'cached')
+    stats = coalescer.stats()
+    assert (stats['cacheEntries'], stats['cacheBytes'], stats['evictions']) == (1, 5, 0)
+
+
+def test_batch_predictions_stream_without_coalescing(client, gateway):
+    client.coalescer = RequestCoalescer(ttl=5.0)
+    client.session.post.side_effect = lambda *args, **kwargs: upstream_response(200, b'{"results": []}')
+    for _ in range(2):
+        response = gateway.post('/api/ml/predictions/batch', json={'users': []})
+        assert response.status_code == 200 and response.data == b'{"results": []}'
+        assert 'X-Gateway-Cache' not in response.headers
+    assert client.session.post.call_count == 2
+    assert client.coalescer.stats()['forwarded'] == 0